@@ -7,6 +7,7 @@ import azure.functions as func
 
 from shared_code.blob import read_json, write_json, now_iso
 from shared_code.http import json_ok, no_content, text_error
+from shared_code.tracing import traced
 
 CORS_HEADERS = {
     "Access-Control-Allow-Origin": "*",
@@ -32,6 +33,7 @@ def _writes_enabled() -> bool:
     return v in ("true", "1", "yes")
 
 
+@traced("admin/agents")
 def main(req: func.HttpRequest) -> func.HttpResponse:
     logging.info("admin_agents request: %s", req.method)
 
@@ -11,6 +11,7 @@ from typing import Any, Dict, List
 import azure.functions as func
 
 from shared_code.http import json_ok, no_content, text_error
+from shared_code.tracing import traced
 
 
 CORS_HEADERS = {
@@ -223,6 +224,7 @@ PULSE_STAGES = [
 ]
 
 
+@traced("admin-overview")
 def main(req: func.HttpRequest) -> func.HttpResponse:
     logging.info("admin_overview request: %s", req.method)
 
@@ -1,11 +1,11 @@
-import json
 import logging
 from typing import Any
 
 import azure.functions as func
 
-from shared_code.blob import read_json
 from shared_code.http import json_ok, no_content, text_error
+from shared_code.prompt_versions import read_version
+from shared_code.tracing import traced
 
 CORS_HEADERS = {
     "Access-Control-Allow-Origin": "*",
@@ -26,6 +26,7 @@ def _error(msg: str, status: int) -> func.HttpResponse:
     return text_error(msg, status=status, headers=CORS_HEADERS)
 
 
+@traced("admin/prompt/{id}/version/{version}")
 def main(req: func.HttpRequest) -> func.HttpResponse:
     logging.info(
         "admin_prompt_version_item request: %s id=%s version=%s",
@@ -45,8 +46,12 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
     if not pid or not ver:
         return _error("Missing id or version", 400)
 
-    path = f"prompts/{pid}/versions/{ver}.json"
-    doc = read_json(path)
+    try:
+        version = int(ver)
+    except ValueError:
+        return _error("Not found", 404)
+
+    doc = read_version(pid, version)
     if doc is None:
         return _error("Not found", 404)
     logging.info("admin_prompt_version_item get: id=%s version=%s", pid, ver)
@@ -1,11 +1,11 @@
-import json
 import logging
-from typing import Any, List
+from typing import Any, Dict, Optional
 
 import azure.functions as func
 
-from shared_code.blob import list_blob_names, read_json
+from shared_code.prompt_versions import list_versions
 from shared_code.http import json_ok, no_content, text_error
+from shared_code.tracing import traced
 
 CORS_HEADERS = {
     "Access-Control-Allow-Origin": "*",
@@ -26,6 +26,17 @@ def _error(msg: str, status: int) -> func.HttpResponse:
     return text_error(msg, status=status, headers=CORS_HEADERS)
 
 
+def _int_param(req: func.HttpRequest, name: str) -> Optional[int]:
+    raw = (req.params.get(name) or "").strip() if req.params else ""
+    if not raw:
+        return None
+    value = int(raw)
+    if value < 1:
+        raise ValueError(name)
+    return value
+
+
+@traced("admin/prompt/{id}/versions")
 def main(req: func.HttpRequest) -> func.HttpResponse:
     logging.info("admin_prompt_versions request: %s %s", req.method, req.route_params.get("id"))
 
@@ -39,24 +50,15 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
     if not pid:
         return _error("Missing id", 400)
 
-    prefix = f"prompts/{pid}/versions/"
-    names: List[str] = list_blob_names(prefix)
-    versions = []
-    for n in names:
-        if not n.endswith(".json"):
-            continue
-        # n like prompts/<id>/versions/<ver>.json
-        try:
-            ver_str = n.rsplit("/", 1)[-1][:-5]
-            ver = int(ver_str)
-        except Exception:
-            continue
-        doc = read_json(n) or {}
-        versions.append({
-            "version": ver,
-            "updatedAt": doc.get("updatedAt"),
-            "updatedBy": doc.get("updatedBy"),
-        })
-    versions.sort(key=lambda x: int(x.get("version") or 0), reverse=True)
+    try:
+        limit = _int_param(req, "limit")
+        before = _int_param(req, "before")
+    except ValueError:
+        return _error("'limit' and 'before' must be positive integers", 400)
+
+    versions, next_before = list_versions(pid, limit=limit, before=before)
     logging.info("admin_prompt_versions list: id=%s count=%d", pid, len(versions))
-    return _ok({"items": versions})
+    body: Dict[str, Any] = {"items": versions}
+    if next_before is not None:
+        body["nextBefore"] = next_before
+    return _ok(body)
@@ -6,6 +6,7 @@ from typing import Any, Dict
 import azure.functions as func
 
 from shared_code.blob import (
+    BlobConflictError,
     read_json,
     write_json,
     list_blob_names,
@@ -14,6 +15,9 @@ from shared_code.blob import (
     new_prompt_id_from_title,
 )
 from shared_code.http import json_ok, no_content, text_error
+from shared_code.prompt_registry import publish_prompt_changes
+from shared_code.prompt_versions import write_version
+from shared_code.tracing import traced
 
 CORS_HEADERS = {
     "Access-Control-Allow-Origin": "*",
@@ -47,10 +51,6 @@ def _current_blob(id_: str) -> str:
     return f"{CURRENT_PREFIX}{id_}.json"
 
 
-def _version_blob(id_: str, version: int) -> str:
-    return f"{CURRENT_PREFIX}{id_}/versions/{version}.json"
-
-
 def _list_current_prompt_ids():
     names = list_blob_names(CURRENT_PREFIX)
     out = []
@@ -77,6 +77,7 @@ def _summarize_prompt(id_: str):
     }
 
 
+@traced("admin/prompts")
 def main(req: func.HttpRequest) -> func.HttpResponse:
     logging.info("admin_prompts request: %s", req.method)
 
@@ -128,8 +129,13 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             ptype or "system",
             agent_id or None,
         )
-        write_json(_current_blob(pid), obj)
-        write_json(_version_blob(pid, 1), obj)
+        try:
+            # Create-only: a concurrent create with the same id loses instead of overwriting.
+            write_json(_current_blob(pid), obj, create_only=True)
+        except BlobConflictError:
+            return _error("Prompt id already exists", 409)
+        write_version(pid, obj)
+        publish_prompt_changes({pid: 1})
         return _ok(obj, 201)
 
     return _error("Method not allowed", 405)
@@ -5,8 +5,11 @@ from typing import Any, Dict
 
 import azure.functions as func
 
-from shared_code.blob import read_json, write_json, blob_exists, now_iso
+from shared_code.blob import BlobConflictError, read_json, read_json_with_etag, write_json, now_iso
 from shared_code.http import json_ok, no_content, text_error
+from shared_code.prompt_registry import publish_prompt_changes
+from shared_code.prompt_versions import write_version
+from shared_code.tracing import traced
 
 CORS_HEADERS = {
     "Access-Control-Allow-Origin": "*",
@@ -36,10 +39,7 @@ def _current_blob(id_: str) -> str:
     return f"prompts/{id_}.json"
 
 
-def _version_blob(id_: str, version: int) -> str:
-    return f"prompts/{id_}/versions/{version}.json"
-
-
+@traced("admin/prompt/{id}")
 def main(req: func.HttpRequest) -> func.HttpResponse:
     logging.info("admin_prompts_by_id request: %s %s", req.method, req.route_params.get("id"))
 
@@ -62,58 +62,57 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
     if req.method == "PUT":
         if not _writes_enabled():
             return _error("Writes disabled in this environment", 403)
-        current = read_json(cur_path)
+        current, etag = read_json_with_etag(cur_path)
         if current is None:
             return _error("Not found", 404)
         try:
             body: Dict[str, Any] = req.get_json()
         except Exception:
             return _error("Invalid JSON", 400)
-        # soft concurrency check: log version mismatch but do not reject (Phase 3)
         try:
             current_ver = int(current.get("version") or 0)
         except Exception:
             current_ver = 0
+        # Optimistic concurrency: the client echoes the version it edited; reject stale edits.
         client_ver_raw = body.get("version") if isinstance(body, dict) else None
         if client_ver_raw is not None:
             try:
                 client_ver = int(client_ver_raw)
             except Exception:
+                return _error("Invalid version", 400)
+            if client_ver != current_ver:
                 logging.warning(
-                    "admin_prompts_by_id update: id=%s invalid client version %r (current=%s)",
+                    "admin_prompts_by_id update: id=%s version conflict client=%s current=%s",
                     id_,
-                    client_ver_raw,
+                    client_ver,
                     current_ver,
                 )
-            else:
-                if client_ver != current_ver:
-                    logging.warning(
-                        "admin_prompts_by_id update: id=%s version mismatch client=%s current=%s",
-                        id_,
-                        client_ver,
-                        current_ver,
-                    )
+                return _error(f"Version conflict: prompt is at version {current_ver}", 409)
         # merge fields
         updated = dict(current)
         for k in ("title", "type", "agentId", "content"):
             if k in body and body[k] is not None:
                 updated[k] = body[k]
         # version bump
-        ver = int(updated.get("version") or 0) + 1
+        ver = current_ver + 1
         updated["version"] = ver
         updated["updatedAt"] = now_iso()
         updated["updatedBy"] = "dev-operator"
         logging.info(
             "admin_prompts_by_id update: id=%s new_version=%s", id_, ver
         )
-        write_json(cur_path, updated)
-        write_json(_version_blob(id_, ver), updated)
+        try:
+            write_json(cur_path, updated, etag=etag)
+        except BlobConflictError:
+            return _error("Version conflict: prompt was modified concurrently", 409)
+        write_version(id_, updated)
+        publish_prompt_changes({id_: ver})
         return _ok(updated)
 
     if req.method == "DELETE":
         if not _writes_enabled():
             return _error("Writes disabled in this environment", 403)
-        current = read_json(cur_path)
+        current, etag = read_json_with_etag(cur_path)
         if current is None:
             return _error("Not found", 404)
         ver = int(current.get("version") or 0) + 1
@@ -124,8 +123,12 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
         logging.info(
             "admin_prompts_by_id delete: id=%s tombstone_version=%s", id_, ver
         )
-        write_json(cur_path, current)
-        write_json(_version_blob(id_, ver), current)
+        try:
+            write_json(cur_path, current, etag=etag)
+        except BlobConflictError:
+            return _error("Version conflict: prompt was modified concurrently", 409)
+        write_version(id_, current)
+        publish_prompt_changes({id_: ver})
         return _ok({"ok": True})
 
     return _error("Method not allowed", 405)
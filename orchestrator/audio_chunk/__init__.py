@@ -6,24 +6,52 @@ Processes audio chunks from the trainee, performs:
 2. AI response generation using gpt-5-chat
 3. Text-to-speech (TTS) for the response
 4. Avatar video generation using Sora-2 (when available)
+
+Steps 2 and 3 are pipelined (shared_code/voice_pipeline.py): the reply is
+streamed, split into sentences, and each sentence goes to TTS as soon as it
+is complete. When the client sends a turnId with the chunk, segments are also
+stored as they finish so it can play them from /audio/segments while this
+request is still running.
+
+Audio comes back base64 in the JSON body by default; audioDelivery=multipart
+or =url returns raw bytes or blob URLs instead (shared_code/audio_delivery.py).
+
+Clients that stream short chunks send final=false/true with each one; chunks
+are then buffered server-side until the utterance ends (final=true, trailing
+silence, or a size cap) and Whisper sees the whole utterance once
+(shared_code/utterance.py).
+
+If the reply stream fails after some of it was spoken, the partial reply is
+returned and stored flagged "interrupted" (response, segment manifest and the
+assistant message in conversation.json) rather than as a complete turn.
+
+Only one chunk per session runs the LLM at a time
+(shared_code/session_admission.py): overlapping chunks queue, are merged
+into one turn, or get 429, depending on AUDIO_ADMISSION_MODE.
 """
 
 import base64
 import json
 import logging
 import os
-from typing import Any, Dict, Optional
+import time
+import uuid
+from typing import Any, Dict, List, Optional
 
 import azure.functions as func
 
-from shared_code.blob import read_json, write_json, now_iso
+from shared_code import audio_delivery, hedged_stt, session_admission, utterance, vad
+from shared_code.blob import read_json, update_json, now_iso
 from shared_code.http import json_ok, no_content, text_error
+from shared_code.session_meta import get_session_meta
+from shared_code.tracing import span, traced
+from shared_code.voice_pipeline import TurnSegmentStore, run_voice_turn, valid_turn_id
 
 
 CORS_HEADERS = {
     "Access-Control-Allow-Origin": "*",
     "Access-Control-Allow-Methods": "POST, OPTIONS",
-    "Access-Control-Allow-Headers": "Content-Type, Authorization",
+    "Access-Control-Allow-Headers": "Content-Type, Authorization, X-Session-Token",
 }
 
 
@@ -50,9 +78,42 @@ def _audio_processing_enabled() -> bool:
     return value in ("true", "1", "yes")
 
 
-def _get_session_data(session_id: str) -> Optional[Dict[str, Any]]:
-    """Load session data from blob storage."""
-    return read_json(f"sessions/{session_id}/session.json")
+def _streaming_enabled() -> bool:
+    """Stream the completion into TTS; false waits for the full reply (still synthesized per sentence)."""
+    value = os.getenv("AUDIO_STREAMING_ENABLED", "true").strip().lower()
+    return value in ("true", "1", "yes")
+
+
+def _tts_concurrency() -> int:
+    try:
+        return max(1, int(os.getenv("AUDIO_TTS_CONCURRENCY", "3")))
+    except ValueError:
+        return 3
+
+
+def _form_value(req: func.HttpRequest, name: str) -> Optional[str]:
+    value = req.form.get(name) if req.form else None
+    return value or (req.params.get(name) if req.params else None)
+
+
+def _file_extension(upload: Any) -> Optional[str]:
+    filename = getattr(upload, "filename", None) or ""
+    return filename.rsplit(".", 1)[-1].lower() if "." in filename else None
+
+
+def _float_or_none(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+FALLBACK_REPLY = "I'm sorry, I didn't catch that. Could you repeat?"
+
+
+def _get_session_data(session_id: str, token: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Session metadata from the signed token, the in-process cache, or blob storage."""
+    return get_session_meta(session_id, token)
 
 
 def _get_conversation_history(session_id: str) -> list:
@@ -61,13 +122,20 @@ def _get_conversation_history(session_id: str) -> list:
     return history.get("messages", []) if history else []
 
 
-def _save_conversation_history(session_id: str, messages: list) -> None:
-    """Save conversation history to blob storage."""
-    write_json(f"sessions/{session_id}/conversation.json", {
-        "session_id": session_id,
-        "messages": messages,
-        "updated_at": now_iso(),
-    })
+def _append_conversation_exchange(session_id: str, exchange: List[Dict[str, str]]) -> None:
+    """Append one user/assistant exchange to the stored conversation history.
+
+    Conditional write with retry, so a chunk processed while another request
+    for the same session is in flight does not overwrite its messages.
+    """
+    def append(doc: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "session_id": session_id,
+            "messages": ((doc or {}).get("messages") or []) + exchange,
+            "updated_at": now_iso(),
+        }
+
+    update_json(f"sessions/{session_id}/conversation.json", append)
 
 
 def _determine_emotion(response_text: str, persona_type: str) -> str:
@@ -88,6 +156,7 @@ def _determine_emotion(response_text: str, persona_type: str) -> str:
         return "neutral"
 
 
+@traced("audio/chunk")
 def main(req: func.HttpRequest) -> func.HttpResponse:
     logging.info("audio_chunk request: %s", req.method)
 
@@ -111,17 +180,37 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
     if not session_id:
         return _error("Missing sessionId", 400)
 
+    # Streaming clients send final=false/true with each chunk and the server
+    # assembles utterances (shared_code/utterance.py); without it every chunk
+    # is a complete utterance. The final chunk may be empty.
+    final_value = _form_value(req, "final")
+    utterance_mode = final_value is not None
+    final = (final_value or "").strip().lower() in ("true", "1", "yes")
+
     # Get audio chunk from form data
     audio_file = req.files.get("chunk") if req.files else None
-    if not audio_file:
+    if not audio_file and not final:
         return _error("Missing audio chunk", 400)
 
-    audio_data = audio_file.read()
-    if not audio_data:
+    received_at = time.perf_counter()
+    audio_data = audio_file.read() if audio_file else b""
+    if not audio_data and not final:
         return _error("Empty audio chunk", 400)
 
     logging.info("audio_chunk: processing chunk for session=%s, size=%d bytes", session_id, len(audio_data))
 
+    # Optional client-generated id for progressive delivery via /audio/segments
+    turn_id = req.form.get("turnId") if req.form else None
+    if not turn_id:
+        turn_id = req.params.get("turnId") if req.params else None
+    if turn_id and not valid_turn_id(turn_id):
+        return _error("Invalid turnId", 400)
+
+    delivery = audio_delivery.requested_delivery(req)
+    if delivery == audio_delivery.URL and not turn_id:
+        # URL delivery serves the stored segments, so the turn is always stored.
+        turn_id = uuid.uuid4().hex
+
     # Check if audio processing is enabled
     if not _audio_processing_enabled():
         return _ok({
@@ -131,30 +220,68 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
         })
 
     # Load session data to get persona type
-    session_data = _get_session_data(session_id)
+    session_data = _get_session_data(session_id, _form_value(req, "sessionToken") or req.headers.get("X-Session-Token"))
     if not session_data:
         return _error(f"Session {session_id} not found", 404)
 
     persona_type = session_data.get("persona") or "Relater"
+    admission = None
     
     try:
         # Import here to avoid circular imports and allow graceful degradation
         from shared_code.openai_client import (
-            transcribe_audio,
             generate_speech,
             generate_conversation_response,
+            stream_conversation_response,
         )
         from shared_code.avatar_service import (
             generate_avatar_video,
             is_avatar_service_available,
-            transcribe_audio_speech_services,
         )
         
+        declared_format = _form_value(req, "audioFormat") or _file_extension(audio_file)
+        duration_ms = _float_or_none(_form_value(req, "durationMs"))
+        sample_rate = int(_float_or_none(_form_value(req, "sampleRate")) or 16000)
+
+        # Buffer streamed chunks until the utterance ends, then transcribe it whole
+        if utterance_mode:
+            with span("utterance") as sp:
+                assembled = utterance.submit(session_id, audio_data, declared_format, duration_ms, sample_rate, final=final)
+                sp.set(ready=assembled["ready"], reason=assembled["reason"], chunks=assembled["state"]["chunks"])
+            if not assembled["ready"]:
+                return _ok({
+                    "partialTranscript": None,
+                    "message": "Chunk buffered" if assembled["reason"] == "buffered" else "No speech detected in utterance",
+                    "sessionId": session_id,
+                    "buffered": assembled["reason"] == "buffered",
+                    "utterance": dict(assembled["state"], reason=assembled["reason"]),
+                })
+            logging.info("audio_chunk: utterance ready (%s), %d bytes", assembled["reason"], len(assembled["audio"]))
+            audio_data = assembled["audio"]
+            declared_format = assembled["format"]
+            duration_ms = assembled["duration_ms"]
+
+        # Step 0: Voice activity gate - skip Whisper for silent chunks, trim PCM/WAV
+        with span("vad") as sp:
+            speech = vad.gate(audio_data, declared_format=declared_format, duration_ms=duration_ms, sample_rate=sample_rate)
+            sp.set(speech=speech["speech"], reason=speech["reason"], format=speech["format"])
+        if not speech["speech"]:
+            logging.info("audio_chunk: VAD skipped chunk (%s), no transcription", speech["reason"])
+            return _ok({
+                "partialTranscript": None,
+                "message": "No speech detected in audio chunk",
+                "sessionId": session_id,
+                "vad": speech["reason"],
+            })
+        
         # Step 1: Transcribe audio (STT) - Use Whisper (webm format supported)
-        # Note: Azure Speech Services REST API doesn't support webm/opus well
+        # Note: Azure Speech Services REST API doesn't support webm/opus well, so
+        # it is only a hedge (STT_HEDGE_ENABLED): an empty answer from it never wins.
         transcript = None
         try:
-            transcript = transcribe_audio(audio_data, audio_format="webm")
+            with span("stt") as sp:
+                transcript = hedged_stt.transcribe(speech["audio"], audio_format=speech["format"])
+                sp.set(chars=len(transcript or ""))
             logging.info("audio_chunk: Whisper transcribed: %s", transcript[:100] if transcript else "(empty)")
         except Exception as stt_exc:
             logging.exception("audio_chunk: Whisper STT failed: %s", stt_exc)
@@ -167,6 +294,26 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
                 "sessionId": session_id,
             })
         
+        # One LLM turn per session at a time; overlapping chunks queue, merge or are refused
+        with span("admission", mode=session_admission.mode()) as sp:
+            admission = session_admission.admit(session_id, transcript)
+            sp.set(status=admission["status"], waited_ms=admission["waited_ms"], merged=admission["merged"])
+        if admission["status"] == session_admission.REJECTED:
+            logging.info("audio_chunk: session=%s busy, chunk rejected (%s)", session_id, admission["reason"])
+            return text_error(
+                "Another turn is in progress for this session",
+                status=429,
+                headers={**CORS_HEADERS, "Retry-After": "1"},
+            )
+        if admission["status"] == session_admission.COALESCED:
+            return _ok({
+                "partialTranscript": transcript,
+                "message": "Transcript merged into a concurrent turn for this session",
+                "sessionId": session_id,
+                "coalesced": True,
+            })
+        transcript = admission["transcript"]
+        
         # Step 2: Load conversation history and generate AI response
         conversation_history = _get_conversation_history(session_id)
         
@@ -176,39 +323,88 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             "content": transcript,
         })
         
-        # Generate AI response
-        try:
-            ai_response = generate_conversation_response(
-                user_message=transcript,
-                persona_type=persona_type,
-                conversation_history=conversation_history[:-1],  # Exclude current message
-                session_context={
-                    "session_id": session_id,
-                    "persona": persona_type,
-                },
+        # Steps 2+3: stream the AI response and synthesize it sentence by sentence
+        llm_args = {
+            "user_message": transcript,
+            "persona_type": persona_type,
+            "conversation_history": conversation_history[:-1],  # Exclude current message
+            "session_context": {
+                "session_id": session_id,
+                "persona": persona_type,
+            },
+        }
+        store = TurnSegmentStore(session_id, turn_id, transcript) if turn_id else None
+        if store is not None:
+            try:
+                store.start()
+            except Exception as store_exc:  # noqa: BLE001
+                logging.warning("audio_chunk: segment store unavailable, returning audio inline only: %s", store_exc)
+                store = None
+        
+        def synthesize(text: str) -> bytes:
+            return generate_speech(text, voice="alloy")
+        
+        def reply_deltas():
+            if _streaming_enabled():
+                return stream_conversation_response(**llm_args)
+            return iter([generate_conversation_response(**llm_args)])
+        
+        with span("voice_turn", streaming=_streaming_enabled()) as sp:
+            try:
+                turn = run_voice_turn(
+                    reply_deltas(),
+                    synthesize,
+                    on_segment=store.publish if store is not None else None,
+                    max_workers=_tts_concurrency(),
+                )
+            except Exception as llm_exc:  # noqa: BLE001
+                logging.exception("audio_chunk: LLM response failed: %s", llm_exc)
+                turn = {"text": "", "segments": [], "error": str(llm_exc), "first_audio_at": None, "llm_s": None}
+            if not turn["text"]:
+                logging.warning("audio_chunk: no AI response (%s); using fallback reply", turn["error"])
+                turn = run_voice_turn(
+                    iter([FALLBACK_REPLY]),
+                    synthesize,
+                    on_segment=store.publish if store is not None else None,
+                )
+            # Chunk received (end of speech) to first playable segment, including STT.
+            first_audio_ms = (
+                round((turn["first_audio_at"] - received_at) * 1000, 1) if turn["first_audio_at"] is not None else None
             )
-            logging.info("audio_chunk: AI response: %s", ai_response[:100] if ai_response else "(empty)")
-        except Exception as llm_exc:
-            logging.exception("audio_chunk: LLM response failed: %s", llm_exc)
-            ai_response = "I'm sorry, I didn't catch that. Could you repeat?"
+            sp.set(segments=len(turn["segments"]), first_audio_ms=first_audio_ms)
+        
+        ai_response = turn["text"]
+        interrupted = bool(turn["error"])
+        if interrupted:
+            logging.warning("audio_chunk: reply stream failed partway (%s); keeping the spoken part", turn["error"])
+        logging.info(
+            "audio_chunk: AI response in %d segment(s), first audio after %s ms: %s",
+            len(turn["segments"]), first_audio_ms, ai_response[:100],
+        )
+        
+        if store is not None:
+            try:
+                store.finish(ai_response, interrupted=interrupted)
+            except Exception as store_exc:  # noqa: BLE001
+                logging.warning("audio_chunk: failed to finish segment manifest: %s", store_exc)
         
         # Add AI response to history
-        conversation_history.append({
+        assistant_message: Dict[str, Any] = {
             "role": "assistant",
             "content": ai_response,
-        })
+        }
+        if interrupted:
+            assistant_message["interrupted"] = True
+        conversation_history.append(assistant_message)
         
-        # Save updated conversation history
-        _save_conversation_history(session_id, conversation_history)
+        # Append this exchange to the stored conversation history
+        _append_conversation_exchange(session_id, conversation_history[-2:])
+        session_admission.release(admission)
         
-        # Step 3: Generate speech (TTS)
-        audio_base64 = None
-        try:
-            speech_audio = generate_speech(ai_response, voice="alloy")
-            audio_base64 = base64.b64encode(speech_audio).decode("utf-8")
-            logging.info("audio_chunk: generated speech, size=%d bytes", len(speech_audio))
-        except Exception as tts_exc:
-            logging.exception("audio_chunk: TTS failed: %s", tts_exc)
+        segment_audio = [seg["audio"] for seg in turn["segments"]]
+        audio_bytes = sum(len(a) for a in segment_audio if a is not None)
+        if audio_bytes:
+            logging.info("audio_chunk: generated speech, size=%d bytes", audio_bytes)
         
         # Step 4: Generate avatar video (if Sora-2 is available)
         avatar_video = None
@@ -221,28 +417,56 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
                     emotion=emotion,
                     duration_seconds=min(len(ai_response) / 15, 10.0),  # Rough estimate
                     session_id=session_id,
+                    sentences=[seg["text"] for seg in turn["segments"]],
                 )
                 if avatar_result and not avatar_result.get("placeholder"):
                     avatar_video = {
                         "url": avatar_result.get("video_url"),
                         "base64": avatar_result.get("video_base64"),
                         "emotion": avatar_result.get("emotion"),
+                        "ssml": avatar_result.get("ssml"),
                     }
             except Exception as avatar_exc:
                 logging.exception("audio_chunk: avatar generation failed: %s", avatar_exc)
         
         # Build response
+        segment_entries = [
+            {"seq": seg["seq"], "text": seg["text"], "bytes": len(seg["audio"] or b"")}
+            for seg in turn["segments"]
+        ]
+        urls_attached = (
+            delivery == audio_delivery.URL
+            and store is not None
+            and audio_delivery.attach_urls(segment_entries, store.prefix)
+        )
+        if delivery == audio_delivery.URL and not urls_attached:
+            logging.info("audio_chunk: blob URLs unavailable, returning audio as base64")
+            delivery = audio_delivery.BASE64
+        
         response_data: Dict[str, Any] = {
             "sessionId": session_id,
             "partialTranscript": transcript,
             "aiResponse": ai_response,
-            "audioBase64": audio_base64,
-            "avatarState": "speaking" if audio_base64 else "idle",
+            "audioBase64": None,
+            "audioDelivery": delivery,
+            "avatarState": "speaking" if audio_bytes else "idle",
+            "audioSegments": segment_entries,
+            "firstAudioMs": first_audio_ms,
+            "interrupted": interrupted,
         }
+        if turn_id:
+            response_data["turnId"] = turn_id
         
         if avatar_video:
             response_data["avatarVideo"] = avatar_video
         
+        if delivery == audio_delivery.MULTIPART:
+            return audio_delivery.multipart_response(response_data, segment_entries, segment_audio, CORS_HEADERS)
+        if delivery == audio_delivery.BASE64 and audio_bytes:
+            # MP3 segments concatenate into one playable stream.
+            speech_audio = b"".join(a for a in segment_audio if a is not None)
+            response_data["audioBase64"] = base64.b64encode(speech_audio).decode("utf-8")
+        
         return _ok(response_data)
         
     except ImportError as imp_exc:
@@ -255,3 +479,5 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
     except Exception as exc:
         logging.exception("audio_chunk: unexpected error: %s", exc)
         return _error(f"Audio processing failed: {exc}", 500)
+    finally:
+        session_admission.release(admission)
@@ -0,0 +1,138 @@
+"""
+Progressive audio for a voice turn.
+
+/audio/chunk, when the client sends a turnId with the chunk, stores each
+synthesized sentence of the persona's reply as soon as it is ready. The
+client polls this endpoint while the /audio/chunk request is still running
+and plays segments in order, so first audio arrives after the first sentence
+instead of after the whole reply.
+
+GET /audio/segments/{sessionId}/{turnId}?after=N&wait=MS
+    after  first segment number wanted (default 0)
+    wait   long-poll up to MS milliseconds (max 5000) for a new segment or
+           the end of the turn before answering; storage is polled every
+           150 ms at first, backing off to once a second
+
+The session token from /session/start (X-Session-Token header or
+sessionToken query parameter) is required when SESSION_TOKEN_SECRET is set:
+a missing or invalid token is 401. Without a secret the session only has to
+exist (404 otherwise), as for /audio/chunk.
+
+Response: {"sessionId", "turnId", "found", "done", "interrupted", "transcript",
+"aiResponse", "segments": [{"seq", "text", "bytes", "audioBase64"}], "next"};
+pass "next" as `after` on the following poll. found is false until the turn
+has started; interrupted is true when the reply stream failed partway, so the
+segments (and aiResponse) end mid-reply.
+audioDelivery=multipart or =url (or Accept: multipart/mixed) returns the
+audio as binary parts or blob URLs instead of audioBase64; see
+shared_code/audio_delivery.py.
+"""
+
+import base64
+import logging
+import os
+import time
+
+import azure.functions as func
+
+from shared_code import audio_delivery
+from shared_code.http import json_ok, no_content, text_error
+from shared_code.session_meta import get_session_meta, tokens_enabled, verify_token
+from shared_code.tracing import traced
+from shared_code.voice_pipeline import read_turn_segments, valid_turn_id
+
+
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET, OPTIONS",
+    "Access-Control-Allow-Headers": "Content-Type, Authorization, X-Session-Token",
+}
+
+MAX_WAIT_MS = 5000
+POLL_INTERVAL_S = 0.15
+MAX_POLL_INTERVAL_S = 1.0
+
+
+def _orchestrator_enabled() -> bool:
+    value = os.getenv("TRAINING_ORCHESTRATOR_ENABLED", "false").strip().lower()
+    return value in ("true", "1", "yes")
+
+
+def _int_param(req: func.HttpRequest, name: str, default: int) -> int:
+    try:
+        return int(req.params.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+@traced("audio/segments")
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    if req.method == "OPTIONS":
+        return no_content(headers=CORS_HEADERS)
+
+    if req.method != "GET":
+        return text_error("Method not allowed", status=405, headers=CORS_HEADERS)
+
+    if not _orchestrator_enabled():
+        return text_error(
+            "Training orchestrator is disabled in this environment. "
+            "Set TRAINING_ORCHESTRATOR_ENABLED to true to enable.",
+            status=503,
+            headers=CORS_HEADERS,
+        )
+
+    session_id = req.route_params.get("sessionId")
+    turn_id = req.route_params.get("turnId")
+    if not session_id or not valid_turn_id(turn_id):
+        return text_error("Missing or invalid sessionId/turnId", status=400, headers=CORS_HEADERS)
+
+    token = req.headers.get("X-Session-Token") or req.params.get("sessionToken")
+    if verify_token(token, session_id) is None:
+        if tokens_enabled():
+            return text_error("Missing or invalid session token", status=401, headers=CORS_HEADERS)
+        if get_session_meta(session_id) is None:
+            return text_error(f"Session {session_id} not found", status=404, headers=CORS_HEADERS)
+
+    after = max(0, _int_param(req, "after", 0))
+    deadline = time.monotonic() + min(max(0, _int_param(req, "wait", 0)), MAX_WAIT_MS) / 1000.0
+
+    delivery = audio_delivery.requested_delivery(req)
+    with_audio = delivery != audio_delivery.URL
+
+    turn = read_turn_segments(session_id, turn_id, after, with_audio=with_audio)
+    interval = POLL_INTERVAL_S
+    while not turn["segments"] and not turn["done"] and time.monotonic() < deadline:
+        time.sleep(max(0.0, min(interval, deadline - time.monotonic())))
+        interval = min(interval * 2, MAX_POLL_INTERVAL_S)
+        turn = read_turn_segments(session_id, turn_id, after, with_audio=with_audio)
+
+    entries = [{"seq": s["seq"], "text": s["text"], "bytes": s["bytes"]} for s in turn["segments"]]
+    if delivery == audio_delivery.URL and not audio_delivery.attach_urls(entries, turn["prefix"]):
+        # Storage cannot sign URLs (memory backend, no account key): send the bytes inline.
+        delivery = audio_delivery.BASE64
+        turn = read_turn_segments(session_id, turn_id, after)
+        entries = [{"seq": s["seq"], "text": s["text"], "bytes": s["bytes"]} for s in turn["segments"]]
+    logging.info(
+        "audio_segments: session=%s turn=%s after=%d returned=%d done=%s",
+        session_id, turn_id, after, len(entries), turn["done"],
+    )
+    body = {
+        "sessionId": session_id,
+        "turnId": turn_id,
+        "found": turn["found"],
+        "done": turn["done"],
+        "interrupted": turn["interrupted"],
+        "transcript": turn["transcript"],
+        "aiResponse": turn["aiResponse"],
+        "audioDelivery": delivery,
+        "segments": entries,
+        "next": entries[-1]["seq"] + 1 if entries else after,
+    }
+    headers = {**CORS_HEADERS, "Cache-Control": "no-store"}
+    if delivery == audio_delivery.MULTIPART:
+        return audio_delivery.multipart_response(body, entries, [s["audio"] for s in turn["segments"]], headers)
+    if delivery == audio_delivery.BASE64:
+        for entry, segment in zip(entries, turn["segments"]):
+            audio = segment["audio"]
+            entry["audioBase64"] = base64.b64encode(audio).decode("ascii") if audio is not None else None
+    return json_ok(body, headers=headers)
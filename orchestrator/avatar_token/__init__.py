@@ -12,6 +12,7 @@ import azure.functions as func
 
 from shared_code.avatar_service import get_avatar_token, get_avatar_config
 from shared_code.http import json_ok, no_content, text_error
+from shared_code.tracing import traced
 
 
 CORS_HEADERS = {
@@ -26,6 +27,7 @@ def _orchestrator_enabled() -> bool:
     return value in ("true", "1", "yes")
 
 
+@traced("avatar/token")
 def main(req: func.HttpRequest) -> func.HttpResponse:
     logging.info("avatar_token request: %s", req.method)
 
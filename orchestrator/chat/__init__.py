@@ -7,7 +7,6 @@ It's faster than the audio_chunk endpoint since it skips the STT step.
 Also tracks PULSE selling methodology progress based on trainee behaviors.
 """
 
-import json
 import logging
 import os
 import re
@@ -15,6 +14,9 @@ from typing import Any, Dict, List, Optional, Tuple
 
 import azure.functions as func
 
+from shared_code import codec
+from shared_code.tracing import span, traced
+
 
 # Sale outcome states
 SALE_OUTCOMES = {
@@ -29,6 +31,13 @@ TRUST_WIN_THRESHOLD = 7  # Trust >= 7 at Stage 5 = sale won
 TRUST_LOSS_THRESHOLD = 2  # Trust <= 2 = sale lost
 INITIAL_TRUST = 5  # Starting trust score
 
+# Limit conversation history to last 10 exchanges (20 messages) to avoid token limits
+MAX_HISTORY_MESSAGES = 20
+
+# "regex" (default) or "hybrid": when the regex rules don't advance, ask the
+# local stage classifier (shared_code/stage_classifier.py) before giving up.
+STAGE_DETECTOR = os.getenv("PULSE_STAGE_DETECTOR", "regex").strip().lower()
+
 # Critical missteps that can lose the sale
 CRITICAL_MISSTEPS = {
     "pushy_early_close": {
@@ -117,7 +126,7 @@ PULSE_STAGES = {
 
 def _ok(data: Dict[str, Any]) -> func.HttpResponse:
     return func.HttpResponse(
-        body=json.dumps(data),
+        body=codec.dumps(data),
         status_code=200,
         mimetype="application/json",
     )
@@ -125,7 +134,7 @@ def _ok(data: Dict[str, Any]) -> func.HttpResponse:
 
 def _error(message: str, status_code: int = 400) -> func.HttpResponse:
     return func.HttpResponse(
-        body=json.dumps({"error": message}),
+        body=codec.dumps({"error": message}),
         status_code=status_code,
         mimetype="application/json",
     )
@@ -246,10 +255,40 @@ def _analyze_pulse_stage_quick(trainee_messages: List[str], current_stage: int)
                         pattern, current_stage, next_stage)
             return next_stage, detected_behaviors
     
+    # Paraphrases the patterns miss; the classifier (and numpy) load on first use.
+    if STAGE_DETECTOR == "hybrid":
+        from shared_code.stage_classifier import get_classifier
+
+        classifier = get_classifier()
+        if classifier is not None and next_stage in classifier.predict(latest_message):
+            detected_behaviors.append(next_stage_info["behavior"])
+            logging.info("PULSE: Classifier detected stage %d, advancing from stage %d", next_stage, current_stage)
+            return next_stage, detected_behaviors
+    
     # No advancement - stay at current stage
     return current_stage, detected_behaviors
 
 
+def _score_turn(
+    trainee_messages: List[str],
+    message: str,
+    current_stage: int,
+) -> Tuple[int, List[str], List[Dict[str, Any]], int]:
+    """
+    Rule analysis for one trainee turn.
+    Returns (detected_stage, detected_behaviors, missteps, trust_change).
+    """
+    # Analyze PULSE stage based on trainee's messages
+    new_stage, detected_behaviors = _analyze_pulse_stage_quick(trainee_messages, current_stage)
+    
+    # Detect missteps in the current message
+    current_missteps = _detect_missteps(message, current_stage)
+    
+    # Calculate trust change
+    trust_change = _calculate_trust_change(current_stage, new_stage, detected_behaviors, current_missteps)
+    return new_stage, detected_behaviors, current_missteps, trust_change
+
+
 def _detect_missteps(message: str, current_stage: int) -> List[Dict[str, Any]]:
     """
     Detect critical missteps in trainee's message that could lose the sale.
@@ -342,6 +381,15 @@ def _determine_sale_outcome(
     return "in_progress"
 
 
+def _initial_sale_state() -> Dict[str, Any]:
+    return {
+        "trust_score": INITIAL_TRUST,
+        "outcome": "in_progress",
+        "missteps": [],
+        "total_missteps": 0,
+    }
+
+
 def _get_sale_state_from_session(session_id: str) -> Dict[str, Any]:
     """Load sale state (trust score, outcome, missteps) from session storage."""
     try:
@@ -353,21 +401,49 @@ def _get_sale_state_from_session(session_id: str) -> Dict[str, Any]:
         pass
     
     # Default initial state
+    return _initial_sale_state()
+
+
+def _next_sale_state(
+    state: Optional[Dict[str, Any]],
+    trust_change: int,
+    current_missteps: List[Dict[str, Any]],
+    current_stage: int,
+) -> Dict[str, Any]:
+    """Sale state after applying one turn's trust delta and missteps to `state`."""
+    state = state or _initial_sale_state()
+    trust_score = state.get("trust_score", INITIAL_TRUST)
+    trust_score = max(0, min(10, trust_score + trust_change))  # Clamp to 0-10
+    missteps = list(state.get("missteps") or []) + list(current_missteps)
     return {
-        "trust_score": INITIAL_TRUST,
-        "outcome": "in_progress",
-        "missteps": [],
-        "total_missteps": 0,
+        "trust_score": trust_score,
+        "outcome": _determine_sale_outcome(trust_score, current_stage, missteps),
+        "missteps": missteps,
+        "total_missteps": len(missteps),
     }
 
 
-def _save_sale_state_to_session(session_id: str, state: Dict[str, Any]) -> None:
-    """Save sale state to session storage."""
+def _apply_sale_turn(
+    session_id: str,
+    trust_change: int,
+    current_missteps: List[Dict[str, Any]],
+    current_stage: int,
+) -> Dict[str, Any]:
+    """Merge this turn's trust delta and missteps into the stored sale state.
+
+    Applied as a conditional read-modify-write so overlapping requests for the
+    same session each contribute their delta instead of overwriting each other.
+    Returns the merged state.
+    """
+    def merge(state: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        return _next_sale_state(state, trust_change, current_missteps, current_stage)
+
     try:
-        from shared_code.blob import write_json
-        write_json(f"sessions/{session_id}/sale_state.json", state)
+        from shared_code.blob import update_json
+        return update_json(f"sessions/{session_id}/sale_state.json", merge) or merge(None)
     except Exception as e:
         logging.warning("chat: failed to save sale state: %s", e)
+        return merge(_get_sale_state_from_session(session_id))
 
 
 def _generate_scorecard(
@@ -483,6 +559,42 @@ def _generate_scorecard(
     return scorecard
 
 
+def _replay_conversation(session_id: str, conversation_history: List[Dict[str, str]]) -> Dict[str, Any]:
+    """
+    Re-run the per-turn stage/trust/outcome rules over a stored conversation.
+    
+    Mirrors what main() does turn by turn, without storage. Returns the final
+    stage and sale state, plus the scorecard main() would have saved last
+    (None when the sale never concluded).
+    """
+    stage = 1
+    state = _initial_sale_state()
+    scorecard = None
+    trainee_messages: List[str] = []
+    for i, msg in enumerate(conversation_history):
+        if msg.get("role") != "user":
+            continue
+        message = str(msg.get("content") or "").strip()
+        trainee_messages.append(message)
+        new_stage, _, missteps, trust_change = _score_turn(trainee_messages, message, stage)
+        stage = max(stage, new_stage)
+        state = _next_sale_state(state, trust_change, missteps, stage)
+        if state["outcome"] in ("won", "lost"):
+            # main() scores the history up to and including the customer's reply to this turn
+            end = i + 1
+            if end < len(conversation_history) and conversation_history[end].get("role") != "user":
+                end += 1
+            scorecard = _generate_scorecard(
+                session_id=session_id,
+                pulse_stage=stage,
+                trust_score=state["trust_score"],
+                sale_outcome=state["outcome"],
+                missteps=state["missteps"],
+                conversation_history=conversation_history[:end],
+            )
+    return {"pulse_stage": stage, "sale_state": state, "scorecard": scorecard}
+
+
 def _save_scorecard(session_id: str, scorecard: Dict[str, Any]) -> None:
     """Save scorecard to session storage for feedback page."""
     try:
@@ -522,17 +634,28 @@ def _get_pulse_stage_from_session(session_id: str) -> int:
         return 1
 
 
-def _save_pulse_stage_to_session(session_id: str, stage: int, behaviors: List[str]) -> None:
-    """Save PULSE stage to session storage."""
-    try:
-        from shared_code.blob import write_json
-        write_json(f"sessions/{session_id}/pulse_state.json", {
+def _save_pulse_stage_to_session(session_id: str, stage: int, behaviors: List[str]) -> int:
+    """Advance the stored PULSE stage to `stage` unless it is already further along.
+
+    Returns the stage now stored, which may be ahead of `stage` when an
+    overlapping request advanced it first.
+    """
+    def advance(state: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if state and state.get("current_stage", 1) >= stage:
+            return None
+        return {
             "current_stage": stage,
             "stage_name": PULSE_STAGES[stage]["name"],
             "detected_behaviors": behaviors,
-        })
+        }
+
+    try:
+        from shared_code.blob import update_json
+        state = update_json(f"sessions/{session_id}/pulse_state.json", advance)
+        return max(stage, (state or {}).get("current_stage", 1))
     except Exception as e:
         logging.warning("chat: failed to save PULSE stage: %s", e)
+        return stage
 
 
 def _get_conversation_history(session_id: str) -> list:
@@ -546,15 +669,28 @@ def _get_conversation_history(session_id: str) -> list:
         return []
 
 
-def _save_conversation_history(session_id: str, history: list) -> None:
-    """Save conversation history to blob storage."""
+def _append_conversation_exchange(session_id: str, exchange: List[Dict[str, str]]) -> Optional[list]:
+    """Append one user/assistant exchange to the stored conversation history.
+
+    Uses a conditional write with retry so pipelined requests for the same
+    session append in turn rather than dropping each other's messages. The
+    stored history keeps the most recent MAX_HISTORY_MESSAGES plus this
+    exchange. Returns the merged history, or None if it could not be saved.
+    """
+    def append(doc: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        messages = (doc or {}).get("messages") or []
+        return {"messages": (messages + exchange)[-(MAX_HISTORY_MESSAGES + len(exchange)):]}
+
     try:
-        from shared_code.blob import write_json
-        write_json(f"sessions/{session_id}/conversation.json", {"messages": history})
+        from shared_code.blob import update_json
+        doc = update_json(f"sessions/{session_id}/conversation.json", append)
+        return (doc or {}).get("messages")
     except Exception as e:
         logging.warning("chat: failed to save conversation history: %s", e)
+        return None
 
 
+@traced("chat")
 def main(req: func.HttpRequest) -> func.HttpResponse:
     """
     Handle chat requests with text input.
@@ -610,8 +746,6 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
         # Load conversation history
         conversation_history = _get_conversation_history(session_id)
         
-        # Limit conversation history to last 10 exchanges (20 messages) to avoid token limits
-        MAX_HISTORY_MESSAGES = 20
         if len(conversation_history) > MAX_HISTORY_MESSAGES:
             conversation_history = conversation_history[-MAX_HISTORY_MESSAGES:]
             logging.info("chat: trimmed conversation history to %d messages", MAX_HISTORY_MESSAGES)
@@ -642,51 +776,37 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             "content": ai_response,
         })
         
-        # Save updated history
-        _save_conversation_history(session_id, conversation_history)
+        # Append this exchange to the stored history (merged with any overlapping turn)
+        merged_history = _append_conversation_exchange(session_id, conversation_history[-2:])
+        if merged_history:
+            conversation_history = merged_history
         
         # Determine emotion based on persona and response
         emotion = _determine_emotion(persona_type, ai_response)
         
-        # Load current PULSE and sale state
+        # Load current PULSE stage
         current_stage = _get_pulse_stage_from_session(session_id)
-        sale_state = _get_sale_state_from_session(session_id)
-        trust_score = sale_state.get("trust_score", INITIAL_TRUST)
-        all_missteps = sale_state.get("missteps", [])
-        
-        # Analyze PULSE stage based on trainee's messages
-        trainee_messages = [m["content"] for m in conversation_history if m["role"] == "user"]
-        new_stage, detected_behaviors = _analyze_pulse_stage_quick(trainee_messages, current_stage)
-        
-        # Detect missteps in the current message
-        current_missteps = _detect_missteps(message, current_stage)
-        all_missteps.extend(current_missteps)
         
-        # Calculate trust change
-        trust_change = _calculate_trust_change(current_stage, new_stage, detected_behaviors, current_missteps)
-        trust_score = max(0, min(10, trust_score + trust_change))  # Clamp to 0-10
-        
-        logging.info("chat: Trust score: %d (change: %+d), missteps this turn: %d", 
-                    trust_score, trust_change, len(current_missteps))
+        with span("pulse_analysis"):
+            trainee_messages = [m["content"] for m in conversation_history if m["role"] == "user"]
+            new_stage, detected_behaviors, current_missteps, trust_change = _score_turn(
+                trainee_messages, message, current_stage
+            )
         
         # Only advance stage, never go backwards
         if new_stage > current_stage:
             logging.info("chat: PULSE stage advanced from %d to %d, behaviors: %s", 
                         current_stage, new_stage, detected_behaviors)
-            _save_pulse_stage_to_session(session_id, new_stage, detected_behaviors)
-            current_stage = new_stage
+            current_stage = _save_pulse_stage_to_session(session_id, new_stage, detected_behaviors)
         
-        # Determine sale outcome
-        sale_outcome = _determine_sale_outcome(trust_score, current_stage, all_missteps)
+        # Merge trust change and missteps into the stored sale state, then read back the outcome
+        sale_state = _apply_sale_turn(session_id, trust_change, current_missteps, current_stage)
+        trust_score = sale_state["trust_score"]
+        sale_outcome = sale_state["outcome"]
+        all_missteps = sale_state["missteps"]
         
-        # Save updated sale state
-        sale_state = {
-            "trust_score": trust_score,
-            "outcome": sale_outcome,
-            "missteps": all_missteps,
-            "total_missteps": len(all_missteps),
-        }
-        _save_sale_state_to_session(session_id, sale_state)
+        logging.info("chat: Trust score: %d (change: %+d), missteps this turn: %d", 
+                    trust_score, trust_change, len(current_missteps))
         
         logging.info("chat: Sale outcome: %s, stage: %d, trust: %d", sale_outcome, current_stage, trust_score)
         
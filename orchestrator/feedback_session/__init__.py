@@ -4,10 +4,11 @@ import os
 from typing import Any, Dict, List, Optional
 
 import azure.functions as func
-import requests
-
 from shared_code.blob import read_json
 from shared_code.http import json_ok, no_content, text_error
+from shared_code.openai_client import post_chat
+from shared_code.prompt_registry import get_registry
+from shared_code.tracing import traced
 
 # Optional imports - may not be available in all environments
 try:
@@ -143,24 +144,20 @@ def _load_scorecard(session_id: str) -> Dict[str, Any]:
 
 
 def _load_evaluator_prompt() -> str | None:
-    """Load the PULSE evaluator system prompt from blob storage.
+    """Load the PULSE evaluator system prompt via the prompt registry.
 
     Prompts are managed via the Admin UI and stored in the same container as
-    other prompt content. We expect a document at `prompts/{id}.json` with a
-    `content` field containing the system prompt markdown/text.
+    other prompt content (`prompts/{id}.json` with a `content` field). The
+    registry keeps the compiled prompt in memory and reloads it when the
+    prompt manifest changes, so this does not touch storage per request.
     """
 
     prompt_id = os.getenv("PULSE_EVALUATOR_PROMPT_ID", "pulse-evaluator-v1")
-    path = f"prompts/{prompt_id}.json"
-    doc = read_json(path)
-    if not isinstance(doc, dict):
+    tmpl = get_registry().get(prompt_id)
+    if tmpl is None:
         logging.warning("feedback_session: evaluator prompt %s not found", prompt_id)
         return None
-    content = doc.get("content")
-    if not isinstance(content, str) or not content.strip():
-        logging.warning("feedback_session: evaluator prompt %s missing content", prompt_id)
-        return None
-    return content
+    return tmpl.text
 
 
 def _call_openai_pulse_evaluator(
@@ -212,10 +209,8 @@ def _call_openai_pulse_evaluator(
         "api-key": api_key,
     }
 
-    resp = requests.post(url, headers=headers, json=payload, timeout=30)
-    resp.raise_for_status()
+    data = post_chat(url, headers, payload, deployment, timeout=30)
 
-    data = resp.json()
     choices = data.get("choices") or []
     if not choices:
         raise RuntimeError("No choices returned from Azure OpenAI for evaluator")
@@ -228,6 +223,7 @@ def _call_openai_pulse_evaluator(
     return json.loads(content)
 
 
+@traced("feedback/{sessionId}")
 def main(req: func.HttpRequest) -> func.HttpResponse:
     logging.info("feedback_session request: %s", req.method)
 
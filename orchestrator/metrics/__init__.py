@@ -0,0 +1,22 @@
+"""
+Prometheus scrape endpoint for the in-process metrics registry.
+
+Protected by a function key (scrapers pass it as `?code=` or the
+`x-functions-key` header). Values are per worker process; see
+shared_code/metrics.py.
+"""
+
+import azure.functions as func
+
+from shared_code.metrics import render
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    return func.HttpResponse(
+        body=render(),
+        status_code=200,
+        headers={"Content-Type": CONTENT_TYPE, "Cache-Control": "no-store"},
+    )
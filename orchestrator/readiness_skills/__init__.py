@@ -6,6 +6,7 @@ import azure.functions as func
 
 from shared_code.http import json_ok, no_content, text_error
 from shared_code.analytics_db import get_connection
+from shared_code.tracing import traced
 
 
 CORS_HEADERS = {
@@ -32,6 +33,7 @@ def _orchestrator_enabled() -> bool:
     return value in ("true", "1", "yes")
 
 
+@traced("readiness/{userId}/skills")
 def main(req: func.HttpRequest) -> func.HttpResponse:
     logging.info("readiness_skills request: %s", req.method)
 
@@ -0,0 +1,87 @@
+"""
+Benchmark blob compression for session documents.
+
+Simulates a voice session turn by turn. Every turn reads conversation.json,
+appends an exchange and writes it back, as /chat and /audio/chunk do. For each
+encoding it reports the bytes moved per turn (download + upload) and the CPU
+time spent encoding/decoding. No storage account is needed; the payloads are
+the exact bytes write_json would upload.
+
+Usage (from orchestrator/):
+    python scripts/bench_blob_compression.py [--turns 60] [--words 45]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from shared_code import compression  # noqa: E402
+
+_VOCAB = (
+    "mattress sleep comfort support firmness back pain partner temperature cooling foam hybrid "
+    "adjustable base trial warranty price budget financing delivery pillow side sleeper "
+    "really think maybe need want looking usually night morning wake tired honestly"
+).split()
+
+
+def _utterance(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_VOCAB) for _ in range(words)).capitalize() + "."
+
+
+def _session(turns: int, words: int, seed: int = 7):
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(turns):
+        messages.append({"role": "user", "content": _utterance(rng, words)})
+        messages.append({"role": "assistant", "content": _utterance(rng, words)})
+        yield {"session_id": "bench", "messages": list(messages), "updated_at": "2025-01-01T00:00:00+00:00"}
+
+
+def _run(encoding, turns: int, words: int):
+    moved = 0
+    cpu = 0.0
+    previous = b""
+    for doc in _session(turns, words):
+        start = time.process_time()
+        if previous:
+            json.loads(compression.decompress(previous))
+        raw = json.dumps(doc, ensure_ascii=False).encode("utf-8")
+        if encoding is None or len(raw) < compression._MIN_BYTES:
+            payload = raw
+        else:
+            payload = compression.compress(raw, encoding)
+            if len(payload) >= len(raw):
+                payload = raw
+        cpu += time.process_time() - start
+        moved += len(previous) + len(payload)
+        previous = payload
+    return moved, cpu, len(previous), len(raw)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=60)
+    parser.add_argument("--words", type=int, default=45, help="words per utterance")
+    args = parser.parse_args()
+
+    encodings = [None, compression.GZIP]
+    if compression.zstandard is not None:
+        encodings.append(compression.ZSTD)
+
+    print(f"turns={args.turns} words/utterance={args.words} threshold={compression._MIN_BYTES}B")
+    print(f"{'encoding':<10}{'final size':>12}{'bytes/turn':>14}{'cpu ms/turn':>14}")
+    for encoding in encodings:
+        moved, cpu, final, raw = _run(encoding, args.turns, args.words)
+        print(
+            f"{encoding or 'none':<10}{final:>12,}{moved / args.turns:>14,.0f}{cpu * 1000 / args.turns:>14.3f}"
+        )
+    print(f"(uncompressed final document: {raw:,} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Accuracy and latency of the PULSE stage classifier against the regex rules.
+
+Both detectors label each message of a held-out set with every PULSE stage it
+exhibits. The regex engine is asked once per stage
+(chat._analyze_pulse_stage_quick with current_stage = stage - 1, which is how
+/chat checks whether a turn advances to that stage); the classifier scores all
+five stages at once. "hybrid" is the union, which is what
+PULSE_STAGE_DETECTOR=hybrid does in /chat for the next stage.
+
+The default eval set, scripts/data/pulse_stage_eval.jsonl, is hand-written
+and shares no sentences with the training seed corpus, so it measures how
+well each detector handles paraphrases rather than the phrases it was built
+from.
+
+Latency is reported per message for the regex engine (all five stages), the
+classifier scoring one message, and the classifier scoring a whole
+transcript in one batch call.
+
+Usage (from orchestrator/):
+    python scripts/bench_stage_classifier.py
+    python scripts/bench_stage_classifier.py --eval labeled.jsonl --model /tmp/model.npz --json out.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List, Sequence
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+DEFAULT_EVAL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "pulse_stage_eval.jsonl")
+STAGES = (1, 2, 3, 4, 5)
+
+
+def regex_stages(message: str) -> List[int]:
+    import chat
+
+    return [stage for stage in STAGES if chat._analyze_pulse_stage_quick([message], stage - 1)[0] == stage]
+
+
+def evaluate(predictions: Sequence[List[int]], labels: Sequence[List[int]]) -> Dict[str, Any]:
+    """Exact-match accuracy plus per-stage and micro precision/recall/F1."""
+    per_stage = {}
+    total_tp = total_fp = total_fn = 0
+    for stage in STAGES:
+        tp = sum(1 for p, y in zip(predictions, labels) if stage in p and stage in y)
+        fp = sum(1 for p, y in zip(predictions, labels) if stage in p and stage not in y)
+        fn = sum(1 for p, y in zip(predictions, labels) if stage not in p and stage in y)
+        total_tp, total_fp, total_fn = total_tp + tp, total_fp + fp, total_fn + fn
+        per_stage[stage] = {
+            "precision": round(tp / (tp + fp), 3) if tp + fp else 0.0,
+            "recall": round(tp / (tp + fn), 3) if tp + fn else 0.0,
+            "f1": round(2 * tp / (2 * tp + fp + fn), 3) if tp else 0.0,
+        }
+    exact = sum(1 for p, y in zip(predictions, labels) if sorted(p) == sorted(y))
+    return {
+        "exact_match": round(exact / max(len(labels), 1), 3),
+        "micro_f1": round(2 * total_tp / (2 * total_tp + total_fp + total_fn), 3) if total_tp else 0.0,
+        "per_stage": per_stage,
+    }
+
+
+def time_per_item(fn: Callable[[], Any], items: int, min_time: float) -> float:
+    """Best-of-five microseconds per item for `fn`, which processes `items` items per call."""
+    fn()
+    calls, elapsed = 1, 0.0
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / 5:
+            break
+        calls *= 2
+    best = elapsed
+    for _ in range(4):
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return best / (calls * items) * 1e6
+
+
+def run(eval_path: str, model_path: str, min_time: float) -> Dict[str, Any]:
+    from shared_code import stage_classifier as sc
+    from train_stage_classifier import load_examples
+
+    examples = load_examples(eval_path)
+    texts = [t for t, _ in examples]
+    labels = [s for _, s in examples]
+    model = sc.StageClassifier.load(model_path)
+
+    regex_preds = [regex_stages(t) for t in texts]
+    model_preds = model.predict_batch(texts)
+    hybrid_preds = [sorted(set(r) | set(m)) for r, m in zip(regex_preds, model_preds)]
+
+    transcript = [{"role": "user", "content": t} for t in texts]
+    latency = {
+        "regex_us_per_message": time_per_item(lambda: [regex_stages(t) for t in texts], len(texts), min_time),
+        "classifier_us_per_message": time_per_item(lambda: [model.scores(t) for t in texts], len(texts), min_time),
+        "classifier_batch_us_per_message": time_per_item(
+            lambda: model.score_transcript(transcript), len(texts), min_time
+        ),
+    }
+    return {
+        "eval": os.path.basename(eval_path),
+        "examples": len(examples),
+        "model": model.meta,
+        "accuracy": {
+            "regex": evaluate(regex_preds, labels),
+            "classifier": evaluate(model_preds, labels),
+            "hybrid": evaluate(hybrid_preds, labels),
+        },
+        "latency": {k: round(v, 2) for k, v in latency.items()},
+    }
+
+
+def main() -> int:
+    from shared_code import stage_classifier as sc
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--eval", default=DEFAULT_EVAL, help="Labeled JSONL (default: %(default)s)")
+    parser.add_argument("--model", default=sc.DEFAULT_MODEL_PATH, help="Model .npz (default: %(default)s)")
+    parser.add_argument("--min-time", type=float, default=1.0, help="Seconds per latency measurement")
+    parser.add_argument("--json", help="Also write the report as JSON")
+    args = parser.parse_args()
+
+    if not sc.available():
+        print("numpy is required for the stage classifier (pip install numpy)", file=sys.stderr)
+        return 2
+
+    report = run(args.eval, args.model, args.min_time)
+    print(f"{report['examples']} examples from {report['eval']}")
+    print(f"{'detector':<12}{'exact':>8}{'micro F1':>10}  " + "  ".join(f"F1 s{s}" for s in STAGES))
+    for name, acc in report["accuracy"].items():
+        stage_f1 = "  ".join(f"{acc['per_stage'][s]['f1']:>5.2f}" for s in STAGES)
+        print(f"{name:<12}{acc['exact_match']:>8.3f}{acc['micro_f1']:>10.3f}  {stage_f1}")
+    for name, value in report["latency"].items():
+        print(f"{name:<34}{value:>10.2f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2, default=str)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,433 @@
+"""
+Offline load test: concurrent synthetic trainees against the orchestrator.
+
+Each trainee runs a full session through the function entry points
+in-process:
+
+    session/start -> chat (one turn per PULSE step attempt) -> session/complete
+    -> feedback/{sessionId}
+
+Trainee utterances are scripted per PULSE stage, so sessions advance the way
+the rule-based stage analysis in /chat expects. Storage is the in-memory
+backend (BLOB_BACKEND=memory, optionally with a per-call delay), and Azure
+OpenAI is replaced by a stand-in session with log-normal latency and a
+configurable completion-length distribution, or by the mock server in
+scripts/mock_openai_server.py (--openai-endpoint). No Azure resources are
+touched.
+
+Scenario presets follow docs/capacityplan.md:
+
+    --scenario 100     100 trainees, Core Chat quota 150K TPM
+    --scenario 1200    1,200 trainees, Core Chat quota 600K TPM
+
+with one exchange per trainee every ~3 s (--think-ms). The report gives
+throughput and p50/p95/p99 per endpoint, and the Core Chat token demand
+compared with the scenario's quota.
+
+All trainees share one Python process, i.e. one Functions worker. Latencies
+are dominated by the stand-in delays you configure; what the run shows is how
+queueing, storage conflicts and token demand grow with concurrency.
+
+Usage (from orchestrator/):
+    python scripts/loadtest.py --scenario 100
+    python scripts/loadtest.py --users 40 --turns 8 --openai-latency-ms 400 --json report.json
+
+    # Over HTTP against the mock server, with a quota that throttles:
+    python scripts/mock_openai_server.py --port 8089 --tpm 150000 &
+    python scripts/loadtest.py --scenario 100 --openai-endpoint http://127.0.0.1:8089
+"""
+
+import argparse
+import importlib
+import json
+import logging
+import math
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+SCRIPTS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(SCRIPTS, "..")
+sys.path[:0] = [ROOT, SCRIPTS]
+
+from mock_openai_server import TRANSCRIPTS, chat_reply, estimate_tokens  # noqa: E402
+
+SCENARIOS: Dict[str, Dict[str, Any]] = {
+    # docs/capacityplan.md, "Scaling Scenario: 100 Concurrent Users"
+    "100": {"users": 100, "core_chat_tpm": 150_000},
+    # docs/capacityplan.md, "Scaling Scenario: 1,200 Concurrent Users" (Core Chat, all regions)
+    "1200": {"users": 1200, "core_chat_tpm": 600_000},
+}
+
+PERSONAS = ("Director", "Relater", "Socializer", "Thinker")
+
+CORE_CHAT_DEPLOYMENT = "loadtest-core-chat"
+HIGH_REASONING_DEPLOYMENT = "loadtest-high-reasoning"
+
+# One line per attempt to move to the given stage; each matches that stage's patterns in chat.
+TRAINEE_SCRIPT: Dict[int, Tuple[str, ...]] = {
+    2: (
+        "So you're saying your back gets stiff by the morning?",
+        "It sounds like your partner sleeps hotter than you do.",
+        "Let me make sure I understand: comfort matters more than price today.",
+    ),
+    3: (
+        "Since you mentioned the hip pain, the adjustable base will take pressure off it.",
+        "Based on what you shared, the cooling layer helps with the night sweats.",
+        "Given what you said about your partner, dual firmness addresses both of you.",
+    ),
+    4: (
+        "I'd recommend the i8 with the adjustable base.",
+        "My recommendation would be the mid-range model to keep it simple.",
+        "The best option for you would be the split king.",
+    ),
+    5: (
+        "Would you like to try it for a few minutes?",
+        "Are you ready to set up delivery for next week?",
+        "Does that work for you if we schedule it now?",
+    ),
+}
+SMALL_TALK = (
+    "Thanks for coming in today.",
+    "Take your time looking around.",
+    "We have a few models on the floor.",
+    "Happy to answer anything as it comes up.",
+)
+
+EVALUATOR_PROMPT = "You are the PULSE 0-3 evaluator. Score each PULSE step and return JSON."
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(math.ceil(pct / 100.0 * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+class _Response:
+    def __init__(self, status_code: int = 200, payload: Any = None, text: str = "", content: bytes = b"") -> None:
+        self.status_code = status_code
+        self._payload = payload
+        self.text = text
+        self.content = content
+        self.headers: Dict[str, str] = {}
+
+    def json(self) -> Any:
+        return self._payload
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            import requests
+
+            raise requests.HTTPError(f"{self.status_code} from stand-in", response=self)
+
+
+class StandInOpenAI:
+    """Stands in for the shared requests.Session (http_client.get_session) and answers Azure OpenAI calls."""
+
+    def __init__(self, latency_ms: float, sigma: float, completion_tokens: Tuple[int, int], seed: int) -> None:
+        self.median_s = latency_ms / 1000.0
+        self.sigma = sigma
+        self.completion_tokens = completion_tokens
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _sample(self) -> Tuple[float, int]:
+        with self._lock:
+            latency = self._rng.lognormvariate(math.log(self.median_s), self.sigma) if self.median_s > 0 else 0.0
+            return latency, self._rng.randint(*self.completion_tokens)
+
+    def _count(self) -> None:
+        with self._lock:
+            self.calls += 1
+
+    def post(self, url: str, json: Optional[Dict[str, Any]] = None, **kwargs: Any) -> _Response:
+        latency, completion_tokens = self._sample()
+        time.sleep(latency)
+        deployment = url.split("/deployments/", 1)[1].split("/", 1)[0] if "/deployments/" in url else ""
+        self._count()
+
+        if "/audio/transcriptions" in url:
+            return _Response(text=TRANSCRIPTS[0])
+        if "/audio/speech" in url:
+            return _Response(content=b"\xff\xfb\x90\x64" + b"\x00" * 2048)
+
+        payload = json or {}
+        prompt_tokens = sum(estimate_tokens(str(m.get("content") or "")) for m in payload.get("messages") or [])
+        return _Response(
+            payload={
+                "choices": [
+                    {"index": 0, "message": {"role": "assistant", "content": chat_reply(payload)}, "finish_reason": "stop"}
+                ],
+                "model": deployment,
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            }
+        )
+
+
+class Results:
+    def __init__(self) -> None:
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.outcomes: Dict[str, int] = {}
+        self.exchanges = 0
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, ms: float, ok: bool) -> None:
+        with self._lock:
+            self.latencies.setdefault(endpoint, []).append(ms)
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def finish_session(self, outcome: str, exchanges: int) -> None:
+        with self._lock:
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            self.exchanges += exchanges
+
+
+def _configure_environment(args: argparse.Namespace) -> None:
+    os.environ["BLOB_BACKEND"] = "memory"
+    os.environ["BLOB_MEMORY_LATENCY_MS"] = str(args.storage_latency_ms)
+    os.environ["TRAINING_ORCHESTRATOR_ENABLED"] = "true"
+    os.environ["PULSE_EVALUATOR_ENABLED"] = "true"
+    os.environ["OPENAI_ENDPOINT"] = args.openai_endpoint or "https://openai.loadtest.invalid"
+    os.environ["OPENAI_API_VERSION"] = "2024-12-01-preview"
+    os.environ["AZURE_OPENAI_API_KEY"] = "loadtest"
+    os.environ["OPENAI_DEPLOYMENT_PERSONA_CORE_CHAT"] = CORE_CHAT_DEPLOYMENT
+    os.environ["OPENAI_DEPLOYMENT_PERSONA_HIGH_REASONING"] = HIGH_REASONING_DEPLOYMENT
+    # Leave the analytics DB and Speech unconfigured so those paths take their disabled branches.
+    for name in ("PULSE_ANALYTICS_DB_HOST", "AZURE_SPEECH_KEY"):
+        os.environ.pop(name, None)
+
+
+class Trainee:
+    def __init__(self, index: int, args: argparse.Namespace, endpoints: Dict[str, Any], results: Results) -> None:
+        self.persona = PERSONAS[index % len(PERSONAS)]
+        self.args = args
+        self.endpoints = endpoints
+        self.results = results
+        self.rng = random.Random(args.seed * 100_003 + index)
+
+    def _call(self, name: str, method: str, body: Optional[Dict[str, Any]] = None, route_params=None) -> Dict[str, Any]:
+        import azure.functions as func
+
+        req = func.HttpRequest(
+            method=method,
+            url=f"/api/{name}",
+            headers={"Content-Type": "application/json"},
+            params={},
+            route_params=route_params or {},
+            body=json.dumps(body).encode("utf-8") if body is not None else b"",
+        )
+        start = time.perf_counter()
+        resp = self.endpoints[name].main(req)
+        ms = (time.perf_counter() - start) * 1000.0
+        ok = resp.status_code < 400
+        self.results.record(name, ms, ok)
+        payload = resp.get_body()
+        return json.loads(payload) if ok and payload else {}
+
+    def _think(self) -> None:
+        if self.args.think_ms > 0:
+            time.sleep(self.rng.uniform(0.5, 1.5) * self.args.think_ms / 1000.0)
+
+    def run(self) -> None:
+        started = self._call("session_start", "POST", {"persona": self.persona})
+        session_id = started.get("sessionId")
+        if not session_id:
+            self.results.finish_session("failed_start", 0)
+            return
+
+        stage, outcome, exchanges, transcript = 1, "in_progress", 0, []
+        for _ in range(self.args.turns):
+            self._think()
+            if stage < 5 and self.rng.random() < self.args.advance_probability:
+                message = self.rng.choice(TRAINEE_SCRIPT[stage + 1])
+            else:
+                message = self.rng.choice(SMALL_TALK)
+            reply = self._call("chat", "POST", {"sessionId": session_id, "message": message, "persona": self.persona})
+            exchanges += 1
+            transcript.append(f"Trainee: {message}")
+            if reply:
+                transcript.append(f"Customer: {reply.get('aiResponse', '')}")
+                stage = int(reply.get("pulseStage") or stage)
+                outcome = (reply.get("saleOutcome") or {}).get("status") or outcome
+            if outcome in ("won", "lost"):
+                break
+
+        self._call("session_complete", "POST", {"sessionId": session_id, "transcript": transcript})
+        self._call("feedback_session", "GET", route_params={"sessionId": session_id})
+        self.results.finish_session(outcome, exchanges)
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    _configure_environment(args)
+    from shared_code import blob, http_client, metrics
+    from shared_code.prompt_registry import get_registry
+
+    if not args.openai_endpoint:
+        http_client._session = StandInOpenAI(
+            args.openai_latency_ms, args.openai_latency_sigma, tuple(args.completion_tokens), args.seed
+        )
+    get_registry().register_default(os.getenv("PULSE_EVALUATOR_PROMPT_ID", "pulse-evaluator-v1"), EVALUATOR_PROMPT)
+    endpoints = {
+        name: importlib.import_module(name) for name in ("session_start", "chat", "session_complete", "feedback_session")
+    }
+
+    results = Results()
+    trainees = [Trainee(i, args, endpoints, results) for i in range(args.users)]
+    ramp_step = args.ramp_s / max(1, args.users)
+
+    def start(trainee: Trainee, delay: float) -> None:
+        time.sleep(delay)
+        try:
+            trainee.run()
+        except Exception as exc:  # noqa: BLE001
+            results.finish_session(f"crashed:{type(exc).__name__}", 0)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        for i, trainee in enumerate(trainees):
+            pool.submit(start, trainee, i * ramp_step)
+    elapsed = time.perf_counter() - started
+
+    endpoints_report = {}
+    for name, values in sorted(results.latencies.items()):
+        values.sort()
+        endpoints_report[name] = {
+            "requests": len(values),
+            "errors": results.errors.get(name, 0),
+            "rps": round(len(values) / elapsed, 2),
+            "p50_ms": round(_percentile(values, 50), 1),
+            "p95_ms": round(_percentile(values, 95), 1),
+            "p99_ms": round(_percentile(values, 99), 1),
+            "max_ms": round(values[-1], 1),
+        }
+
+    tokens: Dict[str, int] = {}
+    for (deployment, _kind), child in metrics.OPENAI_TOKENS.children().items():
+        tokens[deployment] = tokens.get(deployment, 0) + int(child.value)
+    core_tokens = tokens.get(CORE_CHAT_DEPLOYMENT, 0)
+    container = blob.get_container_client()
+    return {
+        "config": {
+            "users": args.users,
+            "turns": args.turns,
+            "think_ms": args.think_ms,
+            "ramp_s": args.ramp_s,
+            "openai_endpoint": args.openai_endpoint,
+            "openai_latency_ms": args.openai_latency_ms,
+            "openai_latency_sigma": args.openai_latency_sigma,
+            "completion_tokens": list(args.completion_tokens),
+            "storage_latency_ms": args.storage_latency_ms,
+            "seed": args.seed,
+        },
+        "elapsed_s": round(elapsed, 2),
+        "endpoints": endpoints_report,
+        "sessions": dict(sorted(results.outcomes.items())),
+        "openai": {
+            "endpoint": args.openai_endpoint or "stand-in",
+            "calls": sum(child.count for child in metrics.OPENAI_LATENCY.children().values()),
+            "tokens": tokens,
+            "core_chat_tokens_per_exchange": round(core_tokens / results.exchanges, 1) if results.exchanges else None,
+            "core_chat_tpm": round(core_tokens / elapsed * 60.0),
+            "core_chat_quota_tpm": args.core_chat_tpm,
+        },
+        "storage": {
+            **blob.get_write_stats(),
+            "blobs": len(container),
+            "bytes": container.total_bytes,
+        },
+    }
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    cfg = report["config"]
+    print(
+        f"users={cfg['users']} turns<={cfg['turns']} think={cfg['think_ms']:.0f}ms "
+        f"openai={report['openai']['endpoint'] if cfg['openai_endpoint'] else format(cfg['openai_latency_ms'], '.0f') + 'ms'} "
+        f"storage={cfg['storage_latency_ms']:.0f}ms   elapsed {report['elapsed_s']:.1f}s\n"
+    )
+    print(f"{'endpoint':<20}{'requests':>9}{'errors':>8}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for name, row in report["endpoints"].items():
+        print(
+            f"{name:<20}{row['requests']:>9}{row['errors']:>8}{row['rps']:>8.1f}"
+            f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{row['max_ms']:>9.1f}"
+        )
+    print(f"\nsessions: {', '.join(f'{k}={v}' for k, v in report['sessions'].items())}")
+
+    openai = report["openai"]
+    line = f"core chat: {openai['core_chat_tpm']:,} TPM, {openai['core_chat_tokens_per_exchange']} tokens/exchange"
+    if openai["core_chat_quota_tpm"]:
+        share = openai["core_chat_tpm"] / openai["core_chat_quota_tpm"] * 100.0
+        line += f" ({share:.0f}% of {openai['core_chat_quota_tpm']:,} TPM quota)"
+    print(line)
+    storage = report["storage"]
+    print(
+        f"storage: {storage['writes']} writes, {storage['skipped']} skipped as unchanged, "
+        f"{storage['blobs']} blobs / {storage['bytes'] / 1024:.0f} KiB held"
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), help="preset from docs/capacityplan.md")
+    parser.add_argument("--users", type=int, help="concurrent trainees (default: scenario's, else 20)")
+    parser.add_argument("--turns", type=int, default=12, help="maximum chat turns per session")
+    parser.add_argument("--think-ms", type=float, default=3000.0, help="mean trainee think time between turns")
+    parser.add_argument("--ramp-s", type=float, default=None, help="spread session starts over this many seconds")
+    parser.add_argument("--advance-probability", type=float, default=0.6, help="chance a turn attempts the next stage")
+    parser.add_argument(
+        "--openai-endpoint",
+        help="send OpenAI calls to this server (e.g. scripts/mock_openai_server.py) instead of the in-process stand-in",
+    )
+    parser.add_argument("--openai-latency-ms", type=float, default=900.0, help="median stand-in completion latency")
+    parser.add_argument("--openai-latency-sigma", type=float, default=0.35, help="log-normal sigma of that latency")
+    parser.add_argument(
+        "--completion-tokens", type=int, nargs=2, default=(40, 120), metavar=("MIN", "MAX"),
+        help="uniform range of completion tokens per response",
+    )
+    parser.add_argument("--storage-latency-ms", type=float, default=8.0, help="delay added to each storage call")
+    parser.add_argument("--core-chat-tpm", type=int, default=None, help="Core Chat quota to compare demand against")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="exit non-zero above this error rate")
+    parser.add_argument("-v", "--verbose", action="store_true", help="show function logging")
+    args = parser.parse_args()
+
+    preset = SCENARIOS.get(args.scenario or "", {})
+    args.users = args.users or preset.get("users", 20)
+    args.core_chat_tpm = args.core_chat_tpm or preset.get("core_chat_tpm")
+    if args.ramp_s is None:
+        args.ramp_s = min(30.0, args.users / 40.0)
+
+    if args.verbose:
+        logging.basicConfig(level=logging.INFO)
+    else:
+        logging.disable(logging.CRITICAL)
+
+    report = run(args)
+    _print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+
+    total = sum(row["requests"] for row in report["endpoints"].values())
+    errors = sum(row["errors"] for row in report["endpoints"].values())
+    if total and errors / total > args.max_error_rate:
+        print(f"\nerror rate {errors / total:.1%} exceeds {args.max_error_rate:.1%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,471 @@
+"""
+Local stand-in for the Azure OpenAI data-plane routes the orchestrator calls.
+
+Implements, under /openai/deployments/{deployment}/:
+
+    chat/completions      JSON and streaming (server-sent events) responses
+    audio/transcriptions  multipart upload; text or JSON response
+    audio/speech          MP3-shaped bytes sized to the input text
+
+Replies are canned and deterministic: a persona reply is picked by hashing
+the conversation, so the same request always gets the same answer. Requests
+with `response_format: json_object` (trainer, evaluator) get a JSON document
+of the shape those callers parse.
+
+Timing and throttling are configurable:
+- time to first token is log-normal around --latency-ms (--latency-sigma),
+  then tokens are produced at --tokens-per-second;
+- --rate-429 rejects that fraction of requests, and --tpm enforces a
+  per-deployment tokens-per-minute budget like an Azure quota;
+- throttled responses carry Retry-After / retry-after-ms
+  (--retry-after-s; a negative value omits the headers).
+
+GET /stats returns request, throttle and token counters.
+
+Usage (from orchestrator/):
+    python scripts/mock_openai_server.py --port 8089 --latency-ms 600 --tpm 150000
+    OPENAI_ENDPOINT=http://127.0.0.1:8089 AZURE_OPENAI_API_KEY=mock ... func start
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+_ROUTE = re.compile(r"^/openai/deployments/([^/]+)/(chat/completions|audio/transcriptions|audio/speech)$")
+
+PERSONAS = ("Director", "Relater", "Socializer", "Thinker")
+
+PERSONA_REPLIES: Dict[str, Tuple[str, ...]] = {
+    "Director": (
+        "Get to the point. What does it cost and how long does delivery take?",
+        "Fine. Is that the best price you can do today?",
+        "I don't have all afternoon. Give me the bottom line.",
+        "That's more like it. What's the total with the base?",
+    ),
+    "Relater": (
+        "That's kind of you. I'd want to talk it over with my husband first, though.",
+        "I'm not sure. My old bed has been with us a long time.",
+        "It does sound nice. Would it really help with my hip?",
+        "You've been very patient with me. Maybe I could try lying on it.",
+    ),
+    "Socializer": (
+        "Oh, my friend Dana has one of these and she won't stop talking about it!",
+        "Fun! Does it come in any other colors? I just redid my bedroom.",
+        "Ha, that's great. Anyway, have you been to the new place across the street?",
+        "Okay, okay, I'm sold on the idea. Tell me about the fun extras.",
+    ),
+    "Thinker": (
+        "What is the warranty coverage on the air chambers, specifically?",
+        "How is the sleep data collected, and where is it stored?",
+        "I read a comparison online. How does the foam density differ from the competitors?",
+        "That is consistent with what I read. What are the trial terms, exactly?",
+    ),
+}
+
+TRANSCRIPTS = (
+    "So you're saying your back gets stiff by the morning?",
+    "What brings you in today?",
+    "I'd recommend the adjustable base for that.",
+    "Would you like to try it for a few minutes?",
+)
+
+TRAINER_REPLY: Dict[str, Any] = {
+    "mode": "ask_followup",
+    "diagnosis": {
+        "understanding_level": "developing",
+        "primary_error_type": "missing_depth",
+        "brief_explanation": "The answer names a need but does not confirm it with the customer.",
+    },
+    "next_question": {
+        "text": "How would you check that you understood the customer's main concern?",
+        "purpose": "Deepen reflection before linking.",
+        "difficulty": "intermediate",
+    },
+    "micro_fortification": {
+        "enabled": True,
+        "summary_to_learner": "Reflect the need back in the customer's words before recommending.",
+        "quick_check_question": "What would you say back to them?",
+    },
+    "mastery_estimate": {"pulse_step": "Understand", "status": "developing", "evidence": ["Named the need"]},
+    "trainer_change_log": {
+        "emit": False,
+        "observed_pattern": "",
+        "suspected_root_cause": "",
+        "proposed_rubric_changes": [],
+        "proposed_prompt_changes": [],
+        "proposed_scenario_changes": [],
+        "examples_and_tips_for_trainers": [],
+    },
+}
+
+EVALUATOR_REPLY: Dict[str, Any] = {
+    "overall": {"score": 2, "summary": "Solid discovery; commitment ask came late."},
+    "steps": {"probe": 2, "understand": 2, "link": 2, "simplify": 1, "earn": 1},
+}
+
+
+def estimate_tokens(text: str) -> int:
+    # Same heuristic as shared_code.prompt_registry.estimate_tokens (~4 characters per token).
+    return int(math.ceil(len(text) / 4.0)) if text else 0
+
+
+def _digest(*parts: Any) -> int:
+    h = hashlib.blake2b(digest_size=8)
+    for part in parts:
+        h.update(str(part).encode("utf-8"))
+    return int.from_bytes(h.digest(), "big")
+
+
+def persona_reply(messages: List[Dict[str, Any]]) -> str:
+    """Pick a deterministic in-character reply for a persona conversation."""
+    system = str(messages[0].get("content", "")) if messages else ""
+    persona = next((p for p in PERSONAS if f'"persona": "{p}"' in system or f"role of a **{p}**" in system), "Relater")
+    replies = PERSONA_REPLIES[persona]
+    last_user = next((str(m.get("content", "")) for m in reversed(messages) if m.get("role") == "user"), "")
+    return replies[_digest(persona, len(messages), last_user) % len(replies)]
+
+
+def chat_reply(payload: Dict[str, Any]) -> str:
+    messages = payload.get("messages") or []
+    if (payload.get("response_format") or {}).get("type") == "json_object":
+        system = str(messages[0].get("content", "")) if messages else ""
+        return json.dumps(TRAINER_REPLY if "Training Coach" in system else EVALUATOR_REPLY)
+    return persona_reply(messages)
+
+
+class MockConfig:
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        latency_sigma: float = 0.0,
+        tokens_per_second: float = 0.0,
+        rate_429: float = 0.0,
+        retry_after_s: float = 1.0,
+        tpm: Optional[int] = None,
+        api_key: Optional[str] = None,
+        seed: int = 1,
+    ) -> None:
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.tokens_per_second = tokens_per_second
+        self.rate_429 = rate_429
+        self.retry_after_s = retry_after_s
+        self.tpm = tpm
+        self.api_key = api_key
+        self.seed = seed
+
+
+class _TokenBudget:
+    """Per-deployment tokens-per-minute budget, refilled continuously like Azure's quota."""
+
+    def __init__(self, tpm: int) -> None:
+        self.tpm = tpm
+        self._available: Dict[str, float] = {}
+        self._updated: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def take(self, deployment: str, tokens: int) -> float:
+        """Consume `tokens`; return 0, or the seconds to wait when the budget is exhausted."""
+        now = time.monotonic()
+        rate = self.tpm / 60.0
+        with self._lock:
+            available = min(
+                float(self.tpm),
+                self._available.get(deployment, float(self.tpm)) + (now - self._updated.get(deployment, now)) * rate,
+            )
+            self._updated[deployment] = now
+            if tokens > available:
+                self._available[deployment] = available
+                return (tokens - available) / rate
+            self._available[deployment] = available - tokens
+            return 0.0
+
+
+class MockState:
+    def __init__(self, config: MockConfig) -> None:
+        self.config = config
+        self.budget = _TokenBudget(config.tpm) if config.tpm else None
+        self._rng = random.Random(config.seed)
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Any] = {"requests": 0, "throttled": 0, "tokens": {}, "routes": {}}
+
+    def first_token_delay(self) -> float:
+        cfg = self.config
+        if cfg.latency_ms <= 0:
+            return 0.0
+        with self._lock:
+            if cfg.latency_sigma <= 0:
+                return cfg.latency_ms / 1000.0
+            return self._rng.lognormvariate(math.log(cfg.latency_ms / 1000.0), cfg.latency_sigma)
+
+    def token_interval(self) -> float:
+        return 1.0 / self.config.tokens_per_second if self.config.tokens_per_second > 0 else 0.0
+
+    def throttle(self, deployment: str, tokens: int) -> Optional[float]:
+        """Return a retry-after in seconds when the request should get a 429."""
+        with self._lock:
+            injected = self.config.rate_429 > 0 and self._rng.random() < self.config.rate_429
+        if injected:
+            return max(0.0, self.config.retry_after_s)
+        if self.budget is not None:
+            wait = self.budget.take(deployment, tokens)
+            if wait > 0:
+                return wait
+        return None
+
+    def count(self, route: str, deployment: str, tokens: int = 0, throttled: bool = False) -> None:
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["routes"][route] = self.stats["routes"].get(route, 0) + 1
+            if throttled:
+                self.stats["throttled"] += 1
+            elif tokens:
+                self.stats["tokens"][deployment] = self.stats["tokens"].get(deployment, 0) + tokens
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return json.loads(json.dumps(self.stats))
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    server_version = "MockAzureOpenAI/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def state(self) -> MockState:
+        return self.server.state  # type: ignore[attr-defined]
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if getattr(self.server, "verbose", False):
+            super().log_message(format, *args)
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("apim-request-id", str(uuid.uuid4()))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, obj: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        self._send(status, json.dumps(obj).encode("utf-8"), "application/json", headers)
+
+    def _send_error(self, status: int, code: str, message: str, headers: Optional[Dict[str, str]] = None) -> None:
+        self._send_json(status, {"error": {"code": code, "message": message}}, headers)
+
+    def _send_throttled(self, route: str, retry_after: float) -> None:
+        headers: Dict[str, str] = {}
+        if self.state.config.retry_after_s >= 0:
+            headers["Retry-After"] = str(max(1, int(math.ceil(retry_after))))
+            headers["retry-after-ms"] = str(int(retry_after * 1000))
+        self._send_error(
+            429,
+            "429",
+            f"Requests to the {route} operation have exceeded the rate limit. "
+            f"Please retry after {headers.get('Retry-After', 'some')} seconds.",
+            headers,
+        )
+
+    def do_GET(self) -> None:
+        if self.path.split("?", 1)[0] == "/stats":
+            self._send_json(200, self.state.snapshot())
+        else:
+            self._send_error(404, "404", "Resource not found")
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        match = _ROUTE.match(self.path.split("?", 1)[0])
+        if not match:
+            self._send_error(404, "DeploymentNotFound", "The API deployment for this resource does not exist.")
+            return
+        api_key = self.state.config.api_key
+        if api_key is not None and self.headers.get("api-key") != api_key:
+            self._send_error(401, "401", "Access denied due to invalid subscription key.")
+            return
+
+        deployment, route = match.group(1), match.group(2)
+        if route == "chat/completions":
+            self._chat(deployment, body)
+        elif route == "audio/transcriptions":
+            self._transcription(deployment, body)
+        else:
+            self._speech(deployment, body)
+
+    def _chat(self, deployment: str, body: bytes) -> None:
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            self._send_error(400, "BadRequest", "Request body is not valid JSON.")
+            return
+        messages = payload.get("messages") or []
+        content = chat_reply(payload)
+        prompt_tokens = sum(estimate_tokens(str(m.get("content") or "")) for m in messages)
+        completion_tokens = estimate_tokens(content)
+        retry_after = self.state.throttle(deployment, prompt_tokens + completion_tokens)
+        if retry_after is not None:
+            self.state.count("chat", deployment, throttled=True)
+            self._send_throttled("ChatCompletions_Create", retry_after)
+            return
+        self.state.count("chat", deployment, prompt_tokens + completion_tokens)
+
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        time.sleep(self.state.first_token_delay())
+        if payload.get("stream"):
+            include_usage = bool((payload.get("stream_options") or {}).get("include_usage"))
+            self._stream(completion_id, deployment, content, usage if include_usage else None)
+            return
+        time.sleep(self.state.token_interval() * completion_tokens)
+        self._send_json(
+            200,
+            {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": deployment,
+                "choices": [
+                    {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+                ],
+                "usage": usage,
+            },
+        )
+
+    def _stream(self, completion_id: str, deployment: str, content: str, usage: Optional[Dict[str, int]]) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(obj: Any) -> None:
+            data = b"data: " + (obj if isinstance(obj, bytes) else json.dumps(obj).encode("utf-8")) + b"\n\n"
+            self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> Dict[str, Any]:
+            return {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": deployment,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+
+        interval = self.state.token_interval()
+        event(chunk({"role": "assistant", "content": ""}))
+        # Roughly one token per piece: words with their leading space.
+        for piece in re.findall(r"\s*\S+", content):
+            if interval:
+                time.sleep(interval * max(1, estimate_tokens(piece)))
+            event(chunk({"content": piece}))
+        event(chunk({}, "stop"))
+        if usage is not None:
+            event({"id": completion_id, "object": "chat.completion.chunk", "choices": [], "usage": usage})
+        event(b"[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _transcription(self, deployment: str, body: bytes) -> None:
+        retry_after = self.state.throttle(deployment, 0)
+        if retry_after is not None:
+            self.state.count("transcription", deployment, throttled=True)
+            self._send_throttled("Transcriptions_Create", retry_after)
+            return
+        self.state.count("transcription", deployment)
+        time.sleep(self.state.first_token_delay())
+        text = TRANSCRIPTS[_digest(len(body), body[-64:]) % len(TRANSCRIPTS)]
+        if re.search(rb'name="response_format"\r\n\r\ntext\r\n', body):
+            self._send(200, text.encode("utf-8"), "text/plain; charset=utf-8")
+        else:
+            self._send_json(200, {"text": text})
+
+    def _speech(self, deployment: str, body: bytes) -> None:
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            self._send_error(400, "BadRequest", "Request body is not valid JSON.")
+            return
+        text = str(payload.get("input") or "")
+        retry_after = self.state.throttle(deployment, 0)
+        if retry_after is not None:
+            self.state.count("speech", deployment, throttled=True)
+            self._send_throttled("AudioSpeech_Create", retry_after)
+            return
+        self.state.count("speech", deployment)
+        time.sleep(self.state.first_token_delay())
+        # One silent MPEG-1 Layer III frame (128 kbps, 44.1 kHz) per ~26 ms of audio, at ~14 characters/second.
+        frame = b"\xff\xfb\x90\x64" + b"\x00" * 413
+        frames = max(1, int(len(text) / 14.0 / 0.026))
+        self._send(200, frame * frames, "audio/mpeg")
+
+
+def make_server(host: str = "127.0.0.1", port: int = 0, config: Optional[MockConfig] = None, verbose: bool = False):
+    """Create (but do not start) the mock server; port 0 picks a free port (see server.server_address)."""
+    server = ThreadingHTTPServer((host, port), MockOpenAIHandler)
+    server.daemon_threads = True
+    server.state = MockState(config or MockConfig())  # type: ignore[attr-defined]
+    server.verbose = verbose  # type: ignore[attr-defined]
+    return server
+
+
+def start_in_thread(config: Optional[MockConfig] = None, host: str = "127.0.0.1"):
+    """Start the mock server on a free port in a daemon thread. Returns (server, base_url)."""
+    server = make_server(host, 0, config)
+    threading.Thread(target=server.serve_forever, name="mock-openai", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=600.0, help="median time to first token")
+    parser.add_argument("--latency-sigma", type=float, default=0.35, help="log-normal sigma of that latency (0 = fixed)")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0, help="generation speed (0 = instant)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="fraction of requests rejected with 429")
+    parser.add_argument("--retry-after-s", type=float, default=1.0, help="Retry-After for injected 429s (<0 omits)")
+    parser.add_argument("--tpm", type=int, default=None, help="tokens-per-minute budget per deployment")
+    parser.add_argument("--api-key", default=None, help="require this api-key header")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("-v", "--verbose", action="store_true", help="log each request")
+    args = parser.parse_args()
+
+    config = MockConfig(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        tokens_per_second=args.tokens_per_second,
+        rate_429=args.rate_429,
+        retry_after_s=args.retry_after_s,
+        tpm=args.tpm,
+        api_key=args.api_key,
+        seed=args.seed,
+    )
+    server = make_server(args.host, args.port, config, verbose=args.verbose)
+    print(f"mock Azure OpenAI listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
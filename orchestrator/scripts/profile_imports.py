@@ -0,0 +1,102 @@
+"""
+Import-time profile of every function entry point.
+
+Each function package is imported in a fresh interpreter with
+`python -X importtime`, after `azure.functions` (which the Python worker has
+already loaded before any function module is imported). The report shows the
+cold import cost attributable to the function itself and the heaviest
+top-level packages it pulls in.
+
+Usage (from orchestrator/):
+    python scripts/profile_imports.py [--top 5] [--budget-ms 150] [--function chat ...]
+
+With --budget-ms the script exits non-zero when any entry point exceeds the
+budget, so it can gate CI.
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def entry_points() -> List[str]:
+    return sorted(
+        name
+        for name in os.listdir(ROOT)
+        if os.path.isfile(os.path.join(ROOT, name, "function.json"))
+        and os.path.isfile(os.path.join(ROOT, name, "__init__.py"))
+    )
+
+
+def profile(function: str, runs: int) -> Tuple[float, Dict[str, float]]:
+    """Return (best total ms, {top-level package: cumulative ms}) for importing `function`."""
+    best_total = None
+    best_packages: Dict[str, float] = {}
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import azure.functions; import {function}"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"import {function} failed:\n{proc.stderr[-2000:]}")
+        total = 0.0
+        packages: Dict[str, float] = {}
+        started = False
+        for line in proc.stderr.splitlines():
+            m = _LINE.match(line)
+            if not m:
+                continue
+            cumulative_us, indent, module = int(m.group(2)), len(m.group(3)), m.group(4)
+            if indent == 1 and module == "azure.functions":
+                started = True
+                continue
+            if not started:
+                continue
+            if indent == 1:
+                total += cumulative_us / 1000.0
+            top = module.split(".")[0]
+            if top != function:
+                # Keep the outermost import of each package (its cumulative time includes the rest).
+                packages.setdefault(top, 0.0)
+                packages[top] = max(packages[top], cumulative_us / 1000.0)
+        if best_total is None or total < best_total:
+            best_total, best_packages = total, packages
+    return best_total or 0.0, best_packages
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--function", action="append", help="entry point(s) to profile (default: all)")
+    parser.add_argument("--top", type=int, default=4, help="heaviest packages to list per entry point")
+    parser.add_argument("--runs", type=int, default=3, help="runs per entry point; the fastest is reported")
+    parser.add_argument("--budget-ms", type=float, default=None, help="fail if any entry point exceeds this")
+    args = parser.parse_args()
+
+    over_budget = []
+    for function in args.function or entry_points():
+        total, packages = profile(function, args.runs)
+        heaviest = sorted(packages.items(), key=lambda kv: kv[1], reverse=True)[: args.top]
+        detail = ", ".join(f"{name} {ms:.0f}" for name, ms in heaviest)
+        flag = ""
+        if args.budget_ms is not None and total > args.budget_ms:
+            over_budget.append(function)
+            flag = "  OVER BUDGET"
+        print(f"{function:<28}{total:>8.1f} ms   {detail}{flag}")
+
+    if over_budget:
+        print(f"\n{len(over_budget)} entry point(s) over {args.budget_ms:.0f} ms: {', '.join(over_budget)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,329 @@
+"""
+Batch re-scoring of stored sessions against the current /chat rules.
+
+Replays every stored conversation turn by turn through the same stage,
+misstep, trust and outcome logic /chat runs live (chat._replay_conversation),
+and compares the resulting scorecard with the one stored at
+sessions/{id}/scorecard.json. Use it to see how a change to
+CRITICAL_MISSTEPS, the stage patterns or the trust thresholds would shift
+historical results before shipping it.
+
+Sources:
+    --source blob   sessions/*/conversation.json (default)
+    --source db     analytics.session_transcripts (latest row per session)
+
+Sessions are processed in batches on a process pool (--workers, default one
+per core); inside each worker, storage reads and writes run on a small thread
+pool (--io-threads) because they are round-trip bound. --workers 1 runs
+everything in this process (required for BLOB_BACKEND=memory).
+
+Outputs:
+- a summary (counts, outcome transitions, mean score change) on stdout;
+- --report FILE: one JSON line per changed session (all sessions with
+  --report-all) with the field-level diff;
+- --write: new scorecards under rescoring/{run_id}/sessions/{id}/scorecard.json;
+  add --apply to overwrite sessions/{id}/scorecard.json instead.
+
+Stored conversations keep the most recent MAX_HISTORY_MESSAGES (+1 exchange),
+so replays of longer sessions start mid-conversation; those results are
+marked "history_truncated".
+
+Usage (from orchestrator/):
+    python scripts/rescore_sessions.py --report rescore.jsonl
+    python scripts/rescore_sessions.py --source db --workers 8 --write
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+# (path into the scorecard, label) pairs compared between stored and replayed scorecards.
+DIFF_FIELDS: Tuple[Tuple[str, ...], ...] = (
+    ("overall", "score"),
+    ("overall", "passed"),
+    ("bce", "score"),
+    ("bce", "passed"),
+    ("mcf", "score"),
+    ("mcf", "passed"),
+    ("cpo", "score"),
+    ("cpo", "passed"),
+    ("pulse_details", "final_stage"),
+    ("pulse_details", "trust_score"),
+    ("pulse_details", "sale_outcome"),
+    ("pulse_details", "missteps"),
+)
+
+_USER_PREFIXES = ("trainee:", "user:", "associate:", "sales associate:")
+
+
+def transcript_to_messages(lines: Iterable[str]) -> List[Dict[str, str]]:
+    """Turn "Trainee: ..." / "Customer: ..." transcript lines into chat messages."""
+    messages = []
+    for line in lines:
+        if not isinstance(line, str) or ":" not in line:
+            continue
+        speaker, content = line.split(":", 1)
+        role = "user" if f"{speaker.strip().lower()}:" in _USER_PREFIXES else "assistant"
+        messages.append({"role": role, "content": content.strip()})
+    return messages
+
+
+def _field(doc: Optional[Dict[str, Any]], path: Tuple[str, ...]) -> Any:
+    value: Any = doc
+    for key in path:
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+
+def diff_scorecards(old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> Tuple[str, Dict[str, Any]]:
+    """Return (status, {field: [old, new]}); status is unchanged, changed, new, removed or not_concluded."""
+    if old is None and new is None:
+        return "not_concluded", {}
+    changes = {
+        ".".join(path): [_field(old, path), _field(new, path)]
+        for path in DIFF_FIELDS
+        if _field(old, path) != _field(new, path)
+    }
+    if old is None:
+        return "new", changes
+    if new is None:
+        return "removed", changes
+    return ("changed" if changes else "unchanged"), changes
+
+
+def rescore(session_id: str, messages: List[Dict[str, str]], existing: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    import chat
+
+    replay = chat._replay_conversation(session_id, messages)
+    status, changes = diff_scorecards(existing, replay["scorecard"])
+    return {
+        "session_id": session_id,
+        "status": status,
+        "changes": changes,
+        "old_outcome": _field(existing, ("pulse_details", "sale_outcome")),
+        "new_outcome": replay["sale_state"]["outcome"],
+        "old_score": _field(existing, ("overall", "score")),
+        "new_score": _field(replay["scorecard"], ("overall", "score")),
+        "history_truncated": len(messages) >= chat.MAX_HISTORY_MESSAGES + 2,
+        "scorecard": replay["scorecard"],
+    }
+
+
+def _worker_init() -> None:
+    logging.disable(logging.CRITICAL)
+
+
+def _load_and_rescore(session_id: str, messages: Optional[List[Dict[str, str]]], opts: Dict[str, Any]) -> Dict[str, Any]:
+    from shared_code.blob import read_json, write_json
+
+    try:
+        if messages is None:
+            doc = read_json(f"sessions/{session_id}/conversation.json") or {}
+            messages = doc.get("messages") or []
+        existing = read_json(f"sessions/{session_id}/scorecard.json")
+        result = rescore(session_id, messages, existing)
+        scorecard = result["scorecard"]
+        if opts["write"] and scorecard is not None and result["status"] in ("changed", "new"):
+            if opts["apply"]:
+                write_json(f"sessions/{session_id}/scorecard.json", scorecard)
+            else:
+                write_json(f"rescoring/{opts['run_id']}/sessions/{session_id}/scorecard.json", scorecard)
+        return result
+    except Exception as exc:  # noqa: BLE001
+        return {"session_id": session_id, "status": "error", "error": f"{type(exc).__name__}: {exc}"}
+
+
+def process_batch(items: List[Tuple[str, Optional[List[Dict[str, str]]]]], opts: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Rescore a batch of (session_id, messages or None to read from blob); runs inside a pool worker."""
+    with ThreadPoolExecutor(max_workers=opts["io_threads"]) as io:
+        results = list(io.map(lambda item: _load_and_rescore(item[0], item[1], opts), items))
+    for result in results:
+        result.pop("scorecard", None)
+    return results
+
+
+def iter_blob_sessions() -> Iterator[Tuple[str, None]]:
+    from shared_code.blob import list_blob_names
+
+    for name in list_blob_names("sessions/"):
+        parts = name.split("/")
+        if len(parts) == 3 and parts[2] == "conversation.json":
+            yield parts[1], None
+
+
+def iter_db_transcripts(fetch_size: int = 1000) -> Iterator[Tuple[str, List[Dict[str, str]]]]:
+    from shared_code.analytics_db import get_connection
+
+    with get_connection() as conn:
+        # Server-side cursor: rows stream in fetch_size pages instead of loading the table.
+        with conn.transaction(), conn.cursor(name="rescore_transcripts") as cur:
+            cur.itersize = fetch_size
+            cur.execute(
+                """
+                SELECT DISTINCT ON (session_id)
+                    session_id::text,
+                    transcript_lines
+                FROM analytics.session_transcripts
+                ORDER BY session_id, updated_at DESC
+                """
+            )
+            for session_id, lines in cur:
+                yield session_id, transcript_to_messages(lines or [])
+
+
+def _batches(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    batch: List[Any] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Summary:
+    def __init__(self) -> None:
+        self.counts: Dict[str, int] = {}
+        self.transitions: Dict[str, int] = {}
+        self.score_deltas: List[float] = []
+        self.truncated = 0
+        self.errors: List[str] = []
+
+    def add(self, result: Dict[str, Any]) -> None:
+        status = result["status"]
+        self.counts[status] = self.counts.get(status, 0) + 1
+        if status == "error":
+            if len(self.errors) < 20:
+                self.errors.append(f"{result['session_id']}: {result['error']}")
+            return
+        self.truncated += bool(result.get("history_truncated"))
+        if result["old_outcome"] != result["new_outcome"]:
+            key = f"{result['old_outcome'] or '-'} -> {result['new_outcome']}"
+            self.transitions[key] = self.transitions.get(key, 0) + 1
+        if isinstance(result.get("old_score"), (int, float)) and isinstance(result.get("new_score"), (int, float)):
+            self.score_deltas.append(result["new_score"] - result["old_score"])
+
+    def to_dict(self, elapsed: float) -> Dict[str, Any]:
+        total = sum(self.counts.values())
+        changed = [d for d in self.score_deltas if d]
+        return {
+            "sessions": total,
+            "elapsed_s": round(elapsed, 2),
+            "sessions_per_s": round(total / elapsed, 1) if elapsed > 0 else None,
+            "counts": dict(sorted(self.counts.items())),
+            "outcome_transitions": dict(sorted(self.transitions.items(), key=lambda kv: -kv[1])),
+            "mean_score_change": round(sum(self.score_deltas) / len(self.score_deltas), 2) if self.score_deltas else None,
+            "scores_changed": len(changed),
+            "history_truncated": self.truncated,
+            "errors": self.errors,
+        }
+
+
+def run(
+    source: str,
+    workers: int,
+    batch_size: int = 200,
+    io_threads: int = 8,
+    write: bool = False,
+    apply: bool = False,
+    report_path: Optional[str] = None,
+    report_all: bool = False,
+    limit: Optional[int] = None,
+    run_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    opts = {
+        "write": write,
+        "apply": apply,
+        "io_threads": io_threads,
+        "run_id": run_id or time.strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:6],
+    }
+    items: Iterable[Tuple[str, Any]] = iter_db_transcripts() if source == "db" else iter_blob_sessions()
+    if limit:
+        items = (item for i, item in zip(range(limit), items))
+
+    summary = Summary()
+    report = open(report_path, "w", encoding="utf-8") if report_path else None
+
+    def collect(results: List[Dict[str, Any]]) -> None:
+        for result in results:
+            summary.add(result)
+            if report is not None and (report_all or result["status"] not in ("unchanged", "not_concluded")):
+                report.write(json.dumps(result) + "\n")
+
+    started = time.perf_counter()
+    try:
+        if workers <= 1:
+            for batch in _batches(items, batch_size):
+                collect(process_batch(batch, opts))
+        else:
+            ctx = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_worker_init) as pool:
+                pending: Set[Future] = set()
+                for batch in _batches(items, batch_size):
+                    pending.add(pool.submit(process_batch, batch, opts))
+                    # Bound in-flight batches so a large source streams instead of queueing whole.
+                    if len(pending) >= workers * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            collect(future.result())
+                for future in pending:
+                    collect(future.result())
+    finally:
+        if report is not None:
+            report.close()
+
+    result = summary.to_dict(time.perf_counter() - started)
+    result["run_id"] = opts["run_id"]
+    result["written_to"] = (
+        None if not write else "sessions/{id}/scorecard.json" if apply else f"rescoring/{opts['run_id']}/sessions/"
+    )
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", choices=("blob", "db"), default="blob")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes (1 = in-process)")
+    parser.add_argument("--io-threads", type=int, default=8, help="concurrent storage calls per worker")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=None, help="stop after this many sessions")
+    parser.add_argument("--report", help="write per-session diffs (JSON lines) here")
+    parser.add_argument("--report-all", action="store_true", help="include unchanged sessions in the report")
+    parser.add_argument("--write", action="store_true", help="write replayed scorecards under rescoring/{run_id}/")
+    parser.add_argument("--apply", action="store_true", help="with --write, overwrite sessions/{id}/scorecard.json")
+    parser.add_argument("-v", "--verbose", action="store_true", help="show function logging")
+    args = parser.parse_args()
+
+    if args.apply and not args.write:
+        parser.error("--apply requires --write")
+    if not args.verbose:
+        logging.disable(logging.CRITICAL)
+
+    summary = run(
+        source=args.source,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        io_threads=args.io_threads,
+        write=args.write,
+        apply=args.apply,
+        report_path=args.report,
+        report_all=args.report_all,
+        limit=args.limit,
+    )
+    print(json.dumps(summary, indent=2))
+    return 1 if summary["counts"].get("error") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
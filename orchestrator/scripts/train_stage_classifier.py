@@ -0,0 +1,273 @@
+"""
+Train the hashed n-gram PULSE stage classifier (shared_code/stage_classifier.py).
+
+Training data is JSONL, one labeled trainee message per line:
+
+    {"text": "So it sounds like your back is the main issue?", "stages": [2]}
+    {"text": "Thanks for waiting, I'll be right with you.", "stages": []}
+
+"stages" lists every PULSE stage the message exhibits (1 Probe, 2 Understand,
+3 Link, 4 Simplify, 5 Earn); an empty list is small talk. A single "stage"
+integer (0 for none) is accepted too. Without --data the script trains on the
+built-in seed corpus below: phrase templates per stage combined with product
+and customer-need slots, plus multi-stage combinations and off-stage lines
+(greetings, product facts, pressure tactics). Add --data files with labeled
+lines from real transcripts to extend it; --no-seed trains on those alone.
+
+The trained model is written as .npz (float16 weights, per-stage thresholds,
+n-gram range and training metadata). Per-stage thresholds are tuned for F1 on
+a held-out 20% of the training set before the final fit on everything.
+
+Usage (from orchestrator/):
+    python scripts/train_stage_classifier.py
+    python scripts/train_stage_classifier.py --data labeled.jsonl --out /tmp/model.npz
+"""
+
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+from typing import Dict, List, Sequence, Tuple
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+Example = Tuple[str, List[int]]
+
+_PRODUCTS = (
+    "the split king", "the adjustable base", "this mattress", "the cooling topper", "our memory foam model",
+    "the firm hybrid", "the queen set", "this pillow", "the smart bed", "the plush model",
+)
+_NEEDS = (
+    "your back pain", "sleeping hot", "your partner's snoring", "waking up stiff", "the sagging in the middle",
+    "tossing and turning", "your shoulder", "staying asleep", "the budget you mentioned", "getting up at night",
+)
+_BENEFITS = (
+    "keeps you cooler", "supports your lower back", "takes pressure off your hips", "lets you each pick a firmness",
+    "stops the motion transfer", "lifts your head to ease the snoring", "fits the budget", "won't sag",
+)
+
+_TEMPLATES: Dict[int, Sequence[str]] = {
+    1: (
+        "What brings you in today?",
+        "How have you been sleeping lately?",
+        "What does a typical night look like for you?",
+        "Can you tell me about your current mattress?",
+        "How long have you had your bed?",
+        "What matters most to you in a new bed?",
+        "Why are you thinking about replacing it now?",
+        "Who else shares the bed with you?",
+        "How do you usually sleep, on your side or your back?",
+        "What would make mornings better for you?",
+        "Is there anything about {need} you can tell me more about?",
+        "When did you first notice {need}?",
+        "Could you describe what happens with {need}?",
+        "What have you tried so far for {need}?",
+        "Where do you feel it most when you wake up?",
+        "Which part of the night is the hardest?",
+    ),
+    2: (
+        "So you're saying {need} is the biggest issue.",
+        "It sounds like {need} keeps you up.",
+        "I hear you, {need} is wearing you down.",
+        "Let me make sure I understand, {need} started last year?",
+        "You mentioned {need}, is that right?",
+        "If I heard you correctly, {need} is the main thing.",
+        "What I'm hearing is that {need} matters more than price.",
+        "So the real problem is {need}.",
+        "Just to check I've got it, {need} happens every night.",
+        "In other words, {need} is what you want to fix.",
+        "Okay, so {need} and a tight budget.",
+        "That makes sense, you're dealing with {need}.",
+    ),
+    3: (
+        "Since you mentioned {need}, {product} {benefit}.",
+        "Because you said {need}, {product} is a good match.",
+        "Based on what you shared about {need}, {product} {benefit}.",
+        "That's exactly why {product} {benefit}.",
+        "Given {need}, {product} {benefit}.",
+        "For someone with {need}, {product} {benefit}.",
+        "{product} {benefit}, which speaks to {need}.",
+        "This is where {product} helps with {need}.",
+        "With {need} in mind, {product} {benefit}.",
+        "Remember {need}? {product} {benefit}.",
+    ),
+    4: (
+        "I'd recommend {product}.",
+        "My recommendation would be {product}.",
+        "The best option for you would be {product}.",
+        "To keep it simple, {product} is the one.",
+        "Out of everything here, I'd go with {product}.",
+        "Let's narrow it down to {product}.",
+        "The difference between these two is mostly price, so {product} makes sense.",
+        "If I were you I'd pick {product}.",
+        "There's really one choice here, {product}.",
+        "Let's skip the rest and focus on {product}.",
+    ),
+    5: (
+        "Would you like to try {product}?",
+        "Shall we get started on the paperwork?",
+        "Are you ready to set up delivery?",
+        "Let's schedule the delivery for Saturday.",
+        "Can I set that up for you today?",
+        "Does that sound good for you?",
+        "Want to lie down on {product} for a few minutes?",
+        "What do you say, should we go ahead?",
+        "Should I put {product} on hold for you?",
+        "How about we get it delivered this week?",
+        "Can I book the delivery for you?",
+        "Is there anything stopping us from moving forward?",
+    ),
+}
+
+# Trainee lines that show no PULSE behavior: greetings, filler, product facts and pressure.
+_OFF_STAGE = (
+    "Hi, welcome in.",
+    "Thanks for coming by.",
+    "Give me one second.",
+    "Okay.",
+    "Sure thing.",
+    "Great, thanks.",
+    "{product} comes with a ten year warranty.",
+    "{product} is on sale this week.",
+    "We have financing for twelve months.",
+    "The showroom closes at nine.",
+    "You need to decide today, this deal ends tonight.",
+    "Everyone buys {product}, trust me.",
+    "Our most popular model is {product}.",
+    "Actually you're wrong about that.",
+    "That's not a real problem.",
+    "Let me grab my manager.",
+    "Sorry, I didn't catch that.",
+    "We also carry sheets and frames.",
+    "Honestly I don't know.",
+    "The price is the price.",
+)
+
+
+def _fill(template: str, rng: random.Random) -> str:
+    text = template.format(product=rng.choice(_PRODUCTS), need=rng.choice(_NEEDS), benefit=rng.choice(_BENEFITS))
+    text = text[0].upper() + text[1:]
+    return text.lower() if rng.random() < 0.2 else text
+
+
+def seed_corpus(per_template: int = 6, seed: int = 7) -> List[Example]:
+    """Template-generated examples; deterministic for a given seed."""
+    rng = random.Random(seed)
+    examples: List[Example] = []
+    for stage, templates in _TEMPLATES.items():
+        for template in templates:
+            for _ in range(per_template):
+                examples.append((_fill(template, rng), [stage]))
+    for template in _OFF_STAGE:
+        for _ in range(per_template):
+            examples.append((_fill(template, rng), []))
+    # Multi-stage turns: a reflection followed by a question, a link that closes, etc.
+    for first, second in ((2, 1), (3, 5), (4, 5), (2, 3), (3, 4)):
+        for _ in range(per_template * 4):
+            examples.append((
+                _fill(rng.choice(_TEMPLATES[first]), rng) + " " + _fill(rng.choice(_TEMPLATES[second]), rng),
+                [first, second],
+            ))
+    rng.shuffle(examples)
+    return examples
+
+
+def load_examples(path: str) -> List[Example]:
+    examples: List[Example] = []
+    with open(path, "r", encoding="utf-8") as fh:
+        for line_no, line in enumerate(fh, 1):
+            line = line.strip()
+            if not line:
+                continue
+            doc = json.loads(line)
+            if "stages" in doc:
+                stages = [int(s) for s in doc["stages"]]
+            else:
+                stages = [int(doc["stage"])] if int(doc.get("stage") or 0) else []
+            if any(s not in (1, 2, 3, 4, 5) for s in stages):
+                raise ValueError(f"{path}:{line_no}: stages must be 1-5, got {stages}")
+            examples.append((doc["text"], stages))
+    return examples
+
+
+def tune_thresholds(probs, labels: Sequence[List[int]]) -> List[float]:
+    """Per-stage threshold maximizing F1 on held-out probabilities."""
+    thresholds = []
+    for col in range(probs.shape[1]):
+        truth = [col + 1 in stages for stages in labels]
+        best_t, best_f1 = 0.5, -1.0
+        for t in [x / 20 for x in range(2, 19)]:
+            tp = sum(1 for p, y in zip(probs[:, col], truth) if p >= t and y)
+            fp = sum(1 for p, y in zip(probs[:, col], truth) if p >= t and not y)
+            fn = sum(1 for p, y in zip(probs[:, col], truth) if p < t and y)
+            f1 = 2 * tp / (2 * tp + fp + fn) if tp else 0.0
+            if f1 > best_f1:
+                best_t, best_f1 = t, f1
+        thresholds.append(best_t)
+    return thresholds
+
+
+def main() -> int:
+    from shared_code import stage_classifier as sc
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", action="append", default=[], help="Labeled JSONL file (repeatable)")
+    parser.add_argument("--no-seed", action="store_true", help="Skip the built-in seed corpus")
+    parser.add_argument("--out", default=sc.DEFAULT_MODEL_PATH, help="Model path (default: %(default)s)")
+    parser.add_argument("--features", type=int, default=sc.N_FEATURES, help="Hash buckets (default: %(default)s)")
+    parser.add_argument("--epochs", type=int, default=300)
+    parser.add_argument("--l2", type=float, default=1e-4)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    if not sc.available():
+        print("numpy is required to train the stage classifier (pip install numpy)", file=sys.stderr)
+        return 2
+
+    examples: List[Example] = [] if args.no_seed else seed_corpus(seed=args.seed)
+    for path in args.data:
+        examples.extend(load_examples(path))
+    if len(examples) < 20:
+        print(f"need at least 20 labeled examples, got {len(examples)}", file=sys.stderr)
+        return 2
+
+    rng = random.Random(args.seed)
+    shuffled = examples[:]
+    rng.shuffle(shuffled)
+    split = len(shuffled) // 5
+    held_out, train = shuffled[:split], shuffled[split:]
+
+    fit_kwargs = {"n_features": args.features, "epochs": args.epochs, "l2": args.l2}
+    probe = sc.StageClassifier.fit([t for t, _ in train], [s for _, s in train], **fit_kwargs)
+    held_labels = [s for _, s in held_out]
+    thresholds = tune_thresholds(probe.scores_batch([t for t, _ in held_out]), held_labels)
+    held_hits = (probe.scores_batch([t for t, _ in held_out]) >= thresholds).tolist()
+    exact = sum(
+        1 for row, stages in zip(held_hits, held_labels)
+        if [i + 1 for i, hit in enumerate(row) if hit] == sorted(stages)
+    )
+
+    model = sc.StageClassifier.fit(
+        [t for t, _ in examples],
+        [s for _, s in examples],
+        meta={
+            "trained_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "sources": (["seed"] if not args.no_seed else []) + [os.path.basename(p) for p in args.data],
+        },
+        **fit_kwargs,
+    )
+    model.thresholds = sc.np.asarray(thresholds, dtype=sc.np.float32)
+    model.save(args.out)
+
+    print(f"examples: {len(examples)} (held out {len(held_out)} for threshold tuning)")
+    print(f"held-out exact-match accuracy: {exact / max(len(held_out), 1):.3f}")
+    print("thresholds: " + ", ".join(f"stage {i + 1}={t:.2f}" for i, t in enumerate(thresholds)))
+    print(f"wrote {args.out} ({os.path.getsize(args.out) / 1024:.1f} KiB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,6 +13,8 @@ import azure.functions as func
 
 from shared_code.blob import write_json, read_json, now_iso
 from shared_code.http import json_ok, no_content, text_error
+from shared_code.prompt_registry import publish_prompt_changes
+from shared_code.tracing import traced
 
 
 CORS_HEADERS = {
@@ -284,6 +286,26 @@ Return the stage number (1-5) and confidence level.""",
 ]
 
 
+def _keep_timestamp_if_unchanged(obj: Dict[str, Any], existing: Any) -> Dict[str, Any]:
+    """Reuse the stored updatedAt when nothing else changed.
+
+    With the timestamp stable, re-seeding produces identical documents and
+    _seed_write skips them.
+    """
+    if isinstance(existing, dict) and existing.get("updatedAt"):
+        if {k: v for k, v in existing.items() if k != "updatedAt"} == {k: v for k, v in obj.items() if k != "updatedAt"}:
+            obj["updatedAt"] = existing["updatedAt"]
+    return obj
+
+
+def _seed_write(path: str, obj: Dict[str, Any]) -> None:
+    existing = read_json(path)
+    obj = _keep_timestamp_if_unchanged(obj, existing)
+    if obj != existing:
+        write_json(path, obj)
+
+
+@traced("seed-admin-data")
 def main(req: func.HttpRequest) -> func.HttpResponse:
     logging.info("seed_admin_data request: %s", req.method)
 
@@ -304,6 +326,7 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
 
     now = now_iso()
     results = {"personas": 0, "agents": 0, "prompts": 0}
+    published: Dict[str, int] = {}
 
     try:
         # Save personas as prompts
@@ -324,10 +347,15 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
                 "updatedAt": now,
                 "updatedBy": "seed-admin-data",
             }
-            write_json(f"prompts/persona-{persona['id']}.json", prompt_obj)
+            _seed_write(f"prompts/persona-{persona['id']}.json", prompt_obj)
+            published[prompt_obj["id"]] = prompt_obj["version"]
             results["personas"] += 1
 
         # Save agents
+        existing_agents = read_json("agents.json") or {}
+        existing_by_id = {
+            a.get("id"): a for a in existing_agents.get("agents") or [] if isinstance(a, dict)
+        }
         agents_list = []
         for agent in AGENTS:
             agent_obj = {
@@ -341,7 +369,7 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
                 "updatedAt": now,
                 "updatedBy": "seed-admin-data",
             }
-            agents_list.append(agent_obj)
+            agents_list.append(_keep_timestamp_if_unchanged(agent_obj, existing_by_id.get(agent["id"])))
             
             # Also save agent prompt
             prompt_obj = {
@@ -354,10 +382,11 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
                 "updatedAt": now,
                 "updatedBy": "seed-admin-data",
             }
-            write_json(f"prompts/agent-{agent['id']}.json", prompt_obj)
+            _seed_write(f"prompts/agent-{agent['id']}.json", prompt_obj)
+            published[prompt_obj["id"]] = prompt_obj["version"]
             results["agents"] += 1
 
-        write_json("agents.json", {"agents": agents_list})
+        _seed_write("agents.json", {"agents": agents_list})
 
         # Save prompts
         for prompt in PROMPTS:
@@ -372,9 +401,12 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
                 "updatedAt": now,
                 "updatedBy": "seed-admin-data",
             }
-            write_json(f"prompts/{prompt['id']}.json", prompt_obj)
+            _seed_write(f"prompts/{prompt['id']}.json", prompt_obj)
+            published[prompt_obj["id"]] = prompt_obj["version"]
             results["prompts"] += 1
 
+        publish_prompt_changes(published)
+
         logging.info("seed_admin_data: seeded %d personas, %d agents, %d prompts", 
                     results["personas"], results["agents"], results["prompts"])
 
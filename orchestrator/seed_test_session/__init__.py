@@ -14,6 +14,7 @@ import azure.functions as func
 
 from shared_code.blob import write_json, read_json
 from shared_code.http import json_ok, no_content, text_error
+from shared_code.tracing import traced
 
 
 CORS_HEADERS = {
@@ -123,6 +124,7 @@ def _create_test_transcript() -> Dict[str, Any]:
     }
 
 
+@traced("seed-test-session")
 def main(req: func.HttpRequest) -> func.HttpResponse:
     logging.info("seed_test_session request: %s", req.method)
 
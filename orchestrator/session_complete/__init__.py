@@ -3,11 +3,12 @@ import os
 from typing import Any, Dict, List
 
 import azure.functions as func
-from psycopg.types.json import Json
 
 from shared_code.blob import read_json, write_json, now_iso
 from shared_code.http import json_ok, no_content, text_error
-from shared_code.analytics_db import get_connection
+from shared_code.analytics_db import get_connection, json_param
+from shared_code.session_meta import remember
+from shared_code.tracing import traced
 
 
 CORS_HEADERS = {
@@ -43,6 +44,7 @@ def _extract_transcript_lines(body: Dict[str, Any]) -> List[str]:
     return []
 
 
+@traced("session/complete")
 def main(req: func.HttpRequest) -> func.HttpResponse:
     logging.info("session_complete request: %s", req.method)
 
@@ -78,6 +80,7 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
     except Exception as exc:  # noqa: BLE001
         logging.exception("Failed to persist session completion: %s", exc)
         return _error("Failed to complete session", 500)
+    remember(session_id, doc)
 
     # Optionally persist the final transcript when provided. This is best-effort
     # and does not affect the session completion response.
@@ -123,7 +126,7 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
                             "user_id": user_id,
                             "session_id": session_id,
                             "lines": lines,
-                            "json": Json(transcript_doc),
+                            "json": json_param(transcript_doc),
                         },
                     )
         except Exception as exc:  # noqa: BLE001
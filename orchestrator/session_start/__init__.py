@@ -13,6 +13,8 @@ import azure.functions as func
 
 from shared_code.blob import write_json, now_iso
 from shared_code.http import json_ok, no_content, text_error
+from shared_code.session_meta import issue_token, remember
+from shared_code.tracing import traced
 
 
 CORS_HEADERS = {
@@ -106,6 +108,7 @@ def _generate_intro_avatar(persona: str, session_id: str) -> Dict[str, Any]:
         return {"avatarUrl": _get_persona_avatar_url(persona), "avatarVideoUrl": None}
 
 
+@traced("session/start")
 def main(req: func.HttpRequest) -> func.HttpResponse:
     logging.info("session_start request: %s", req.method)
 
@@ -150,6 +153,7 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
     except Exception as exc:  # noqa: BLE001
         logging.exception("Failed to persist session start: %s", exc)
         return _error("Failed to start session", 500)
+    remember(session_id, doc)
 
     # Generate intro avatar video (async-friendly, non-blocking on failure)
     avatar_data = _generate_intro_avatar(persona, session_id)
@@ -162,6 +166,10 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
         },
         **avatar_data,
     }
+    session_token = issue_token(session_id, doc)
+    if session_token:
+        # Lets /audio/chunk resolve the persona without reading session.json.
+        response_data["sessionToken"] = session_token
 
     return _ok(response_data)
 
@@ -1,15 +1,16 @@
+import importlib.util
 import logging
 import os
 from contextlib import contextmanager
-from typing import Iterator, Any
+from typing import Any, Iterator, Optional, Tuple
 
-# Make psycopg optional to avoid breaking the entire function app
-try:
-    import psycopg
-    PSYCOPG_AVAILABLE = True
-except ImportError:
-    psycopg = None  # type: ignore
-    PSYCOPG_AVAILABLE = False
+from .metrics import DB_LATENCY
+from .tracing import span
+
+# Make psycopg optional to avoid breaking the entire function app. It is only
+# imported when a connection is opened: importing it costs >100 ms of cold start
+# for every function that merely imports this module.
+PSYCOPG_AVAILABLE = importlib.util.find_spec("psycopg") is not None
 
 
 _logger = logging.getLogger(__name__)
@@ -33,25 +34,70 @@ def _build_dsn() -> str:
     return f"postgresql://{user}:{password}@{host}:{port}/{name}"
 
 
+_cursor_factories: Optional[Tuple[type, type]] = None
+
+
+def _timed_cursor_factories() -> Tuple[type, type]:
+    """Cursor classes that time each execute() as a db_query span and DB_LATENCY{phase="query"}.
+
+    Built on first use so psycopg stays off the import path.
+    """
+    global _cursor_factories
+    if _cursor_factories is None:
+        import psycopg
+
+        class TimedCursor(psycopg.Cursor):
+            def execute(self, query: Any, params: Any = None, **kwargs: Any) -> Any:
+                with span("db_query"), DB_LATENCY.labels("query").time():
+                    return super().execute(query, params, **kwargs)
+
+            def executemany(self, query: Any, params_seq: Any, **kwargs: Any) -> None:
+                with span("db_query", many=True), DB_LATENCY.labels("query").time():
+                    return super().executemany(query, params_seq, **kwargs)
+
+        class TimedServerCursor(psycopg.ServerCursor):
+            def execute(self, query: Any, params: Any = None, **kwargs: Any) -> Any:
+                with span("db_query"), DB_LATENCY.labels("query").time():
+                    return super().execute(query, params, **kwargs)
+
+        _cursor_factories = (TimedCursor, TimedServerCursor)
+    return _cursor_factories
+
+
 @contextmanager
 def get_connection() -> Iterator[Any]:
     """Yield a psycopg connection to the analytics database.
 
     Connections are opened on demand using env configuration and closed after
     use. Autocommit is enabled because callers typically perform single-row
-    inserts or short read/write transactions.
+    inserts or short read/write transactions. Cursors (conn.cursor(),
+    conn.cursor(name=...) and conn.execute()) time each query.
     """
     if not PSYCOPG_AVAILABLE:
         raise RuntimeError(
             "psycopg is not installed. Install with: pip install psycopg[binary]"
         )
 
+    import psycopg
+
     dsn = _build_dsn()
-    conn = psycopg.connect(dsn, autocommit=True)
-    try:
-        yield conn
-    finally:
+    cursor_factory, server_cursor_factory = _timed_cursor_factories()
+    # The "db" span groups the connection's queries in the trace; latency metrics are per connect and per query.
+    with span("db"):
+        with span("db_connect"), DB_LATENCY.labels("connect").time():
+            conn = psycopg.connect(dsn, autocommit=True, cursor_factory=cursor_factory)
+        conn.server_cursor_factory = server_cursor_factory
         try:
-            conn.close()
-        except Exception:  # noqa: BLE001
-            _logger.exception("analytics_db: failed to close connection")
+            yield conn
+        finally:
+            try:
+                conn.close()
+            except Exception:  # noqa: BLE001
+                _logger.exception("analytics_db: failed to close connection")
+
+
+def json_param(value: Any) -> Any:
+    """Wrap a value for a json/jsonb query parameter (psycopg's Json adapter)."""
+    from psycopg.types.json import Json
+
+    return Json(value)
@@ -2,8 +2,6 @@ import logging
 from datetime import datetime, timezone
 from typing import Any, Dict
 
-from psycopg.types.json import Json
-
 from . import analytics_db
 
 
@@ -48,7 +46,7 @@ def record_session_scorecard_event(session_id: str, session_doc: Dict[str, Any],
         "pulse_step": "session_end",
         "skill_tag": "overall",
         "score": float(score),
-        "raw_metrics": Json(scorecard),
+        "raw_metrics": analytics_db.json_param(scorecard),
         "notes": None,
     }
 
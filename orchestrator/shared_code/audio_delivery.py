@@ -0,0 +1,99 @@
+"""
+How synthesized audio gets back to the client.
+
+Three modes, chosen per request with an `audioDelivery` form field or query
+parameter (or `Accept: multipart/mixed`):
+
+- base64     audio inside the JSON body (default, what existing clients read)
+- multipart  multipart/mixed: the JSON body as the first part, then one
+             audio/mpeg part per segment, raw bytes (no ~33% base64 inflation
+             and no bytes -> b64 -> str -> JSON copies)
+- url        audio stays in blob storage; each segment carries a short-lived
+             read-only SAS URL (AUDIO_URL_TTL_SECONDS, default 300). Falls back
+             to base64 when storage cannot sign URLs (memory backend, no
+             account key).
+
+In multipart mode each JSON segment entry gets a "part" index (1-based, part
+0 is the JSON) and each audio part carries Content-ID <segment-{seq}> and
+X-Segment-Seq headers.
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+import azure.functions as func
+
+from .http import multipart_mixed, json_part, wants_multipart
+
+
+BASE64 = "base64"
+MULTIPART = "multipart"
+URL = "url"
+DELIVERY_MODES = (BASE64, MULTIPART, URL)
+
+
+def requested_delivery(req: func.HttpRequest) -> str:
+    value = (req.form.get("audioDelivery") if req.form else None) or req.params.get("audioDelivery") or ""
+    value = value.strip().lower()
+    if value in DELIVERY_MODES:
+        return value
+    return MULTIPART if wants_multipart(req) else BASE64
+
+
+def url_ttl_seconds() -> int:
+    try:
+        return max(30, int(os.getenv("AUDIO_URL_TTL_SECONDS", "300")))
+    except ValueError:
+        return 300
+
+
+def attach_urls(entries: List[Dict[str, Any]], prefix: str) -> bool:
+    """
+    Add "url" to every entry with audio ({prefix}/{seq}.mp3) and return True,
+    or return False (entries untouched) when storage cannot issue URLs.
+    """
+    from .blob import get_read_url
+
+    ttl = url_ttl_seconds()
+    urls: Dict[int, str] = {}
+    for entry in entries:
+        if not entry.get("bytes"):
+            continue
+        try:
+            url = get_read_url(f"{prefix}/{entry['seq']}.mp3", ttl_seconds=ttl)
+        except Exception as exc:  # noqa: BLE001
+            logging.warning("audio_delivery: could not sign blob URL: %s", exc)
+            url = None
+        if url is None:
+            return False
+        urls[entry["seq"]] = url
+    expires_at = (datetime.now(timezone.utc) + timedelta(seconds=ttl)).isoformat()
+    for entry in entries:
+        if entry["seq"] in urls:
+            entry["url"] = urls[entry["seq"]]
+            entry["expiresAt"] = expires_at
+    return True
+
+
+def multipart_response(
+    body: Dict[str, Any],
+    entries: List[Dict[str, Any]],
+    audio: Sequence[Optional[bytes]],
+    headers: Optional[Mapping[str, str]] = None,
+) -> func.HttpResponse:
+    """JSON `body` as part 0, then each non-empty `audio[i]` (for entries[i]) as an audio/mpeg part."""
+    audio_parts = []
+    for entry, payload in zip(entries, audio):
+        if payload:
+            entry["part"] = len(audio_parts) + 1
+            audio_parts.append((
+                {
+                    "Content-Type": "audio/mpeg",
+                    "Content-ID": f"<segment-{entry['seq']}>",
+                    "X-Segment-Seq": str(entry["seq"]),
+                },
+                memoryview(payload),
+            ))
+    return multipart_mixed([json_part(body)] + audio_parts, headers=headers)
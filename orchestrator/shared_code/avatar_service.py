@@ -17,11 +17,13 @@ import json
 import logging
 import os
 import tempfile
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-import requests
-
-from .blob import get_container_client, now_iso
+from . import metrics
+from .blob import get_container_client
+from .http_client import get_session
+from .refresh_cache import RefreshAheadCache
+from .tracing import span
 
 
 def _get_speech_config() -> Dict[str, str]:
@@ -123,12 +125,68 @@ def get_avatar_config(persona_type: str) -> Dict[str, Any]:
     }
 
 
+_XML_ESCAPES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&apos;"})
+
+SSML_SENTENCE_BREAK_MS = int(os.getenv("AVATAR_SSML_SENTENCE_BREAK_MS", "150"))
+
+
+def _xml_escape(text: str) -> str:
+    """Escape the five XML special characters in one pass."""
+    return text.translate(_XML_ESCAPES)
+
+
+def _ssml_frame(voice: str, voice_style: str) -> Tuple[str, str]:
+    prefix = f"""<speak version="1.0" xmlns="http://www.w3.org/2001/10/synthesis" 
+       xmlns:mstts="http://www.w3.org/2001/mstts" xml:lang="en-US">
+    <voice name="{_xml_escape(voice)}">
+        <mstts:express-as style="{_xml_escape(voice_style)}">
+            """
+    suffix = """
+        </mstts:express-as>
+    </voice>
+</speak>"""
+    return prefix, suffix
+
+
+# persona -> SSML before and after the spoken text, built once at import. The
+# express-as style is the persona's voice_style, so the emotion (reported
+# alongside) does not change the markup and is not part of the key.
+SSML_TEMPLATES: Dict[str, Tuple[str, str]] = {
+    persona: _ssml_frame(config["voice"], config["voice_style"])
+    for persona, config in PERSONA_AVATAR_CONFIGS.items()
+}
+
+
+def _ssml_template(persona_type: str) -> Tuple[str, str]:
+    return SSML_TEMPLATES.get(persona_type) or SSML_TEMPLATES["Relater"]
+
+
+def build_avatar_ssml_batch(
+    persona_type: str,
+    sentences: List[str],
+    break_ms: Optional[int] = None,
+) -> str:
+    """
+    One SSML document for a whole reply, sentence by sentence.
+
+    Each sentence is preceded by <bookmark mark="seg-{i}"/> (i matches the
+    audioSegments seq), so the client SDK's bookmark events can line the
+    avatar up with segment text and audio; sentences are separated by a
+    <break> of break_ms (AVATAR_SSML_SENTENCE_BREAK_MS, default 150).
+    """
+    prefix, suffix = _ssml_template(persona_type)
+    pause = f'<break time="{SSML_SENTENCE_BREAK_MS if break_ms is None else break_ms}ms"/>'
+    body = pause.join(f'<bookmark mark="seg-{i}"/>{_xml_escape(text)}' for i, text in enumerate(sentences))
+    return prefix + body + suffix
+
+
 def generate_avatar_video(
     persona_type: str,
     speech_text: str,
     emotion: str = "neutral",
     duration_seconds: float = 5.0,
     session_id: Optional[str] = None,
+    sentences: Optional[List[str]] = None,
 ) -> Dict[str, Any]:
     """
     Generate avatar synthesis configuration for Azure Speech Avatar.
@@ -142,6 +200,8 @@ def generate_avatar_video(
         emotion: Emotional state (neutral, interested, skeptical, pleased, etc.)
         duration_seconds: Not used for real-time avatar (kept for API compatibility)
         session_id: Optional session ID for logging
+        sentences: Optional sentence segmentation of speech_text; the SSML is
+            then batched with a bookmark per sentence (build_avatar_ssml_batch)
     
     Returns:
         Dict with:
@@ -153,18 +213,19 @@ def generate_avatar_video(
     config = _get_speech_config()
     
     # Check if service is available
-    if not is_avatar_service_available():
+    if not (config["key"] and config["region"]):
         logging.warning("avatar_service: Azure Speech not configured, returning placeholder")
         return _generate_placeholder_response(persona_type, emotion)
     
-    _validate_speech_config(config)
-    
     # Get persona-specific avatar configuration
     avatar_config = PERSONA_AVATAR_CONFIGS.get(persona_type, PERSONA_AVATAR_CONFIGS["Relater"])
-    expression_style = EMOTION_EXPRESSIONS.get(emotion, EMOTION_EXPRESSIONS["neutral"])
     
-    # Build SSML for avatar speech synthesis
-    ssml = _build_avatar_ssml(avatar_config, expression_style, speech_text)
+    # Build SSML for avatar speech synthesis from the precompiled template
+    if sentences:
+        ssml = build_avatar_ssml_batch(persona_type, sentences)
+    else:
+        prefix, suffix = _ssml_template(persona_type)
+        ssml = prefix + _xml_escape(speech_text) + suffix
     
     logging.info(
         "avatar_service: generating avatar config for persona=%s, emotion=%s, text_length=%d",
@@ -181,7 +242,6 @@ def generate_avatar_video(
         "emotion": emotion,
         "persona": persona_type,
         "region": config["region"],
-        "generated_at": now_iso(),
         "streaming": True,  # Indicates real-time WebRTC streaming
     }
 
@@ -195,32 +255,13 @@ def _build_avatar_ssml(
     Build SSML markup for Azure Speech Avatar synthesis.
     
     The SSML includes voice selection, expression style, and the text to speak.
-    This is used by the client-side Speech SDK for real-time avatar rendering.
+    Personas use SSML_TEMPLATES directly; this builds the frame for any
+    other voice/style combination.
     """
-    voice = avatar_config.get("voice", "en-US-JennyNeural")
-    voice_style = avatar_config.get("voice_style", "neutral")
-    
-    # Escape XML special characters in speech text
-    escaped_text = (
-        speech_text
-        .replace("&", "&amp;")
-        .replace("<", "&lt;")
-        .replace(">", "&gt;")
-        .replace('"', "&quot;")
-        .replace("'", "&apos;")
+    prefix, suffix = _ssml_frame(
+        avatar_config.get("voice", "en-US-JennyNeural"), avatar_config.get("voice_style", "neutral")
     )
-    
-    # Build SSML with voice style for emotional expression
-    ssml = f"""<speak version="1.0" xmlns="http://www.w3.org/2001/10/synthesis" 
-       xmlns:mstts="http://www.w3.org/2001/mstts" xml:lang="en-US">
-    <voice name="{voice}">
-        <mstts:express-as style="{voice_style}">
-            {escaped_text}
-        </mstts:express-as>
-    </voice>
-</speak>"""
-    
-    return ssml
+    return prefix + _xml_escape(speech_text) + suffix
 
 
 def get_ice_server_info(region: str, speech_key: str) -> Optional[Dict[str, Any]]:
@@ -229,6 +270,8 @@ def get_ice_server_info(region: str, speech_key: str) -> Optional[Dict[str, Any]
     
     This is needed for establishing the real-time avatar video stream.
     """
+    import requests  # only for requests.exceptions; see http_client
+
     url = f"https://{region}.tts.speech.microsoft.com/cognitiveservices/avatar/relay/token/v1"
     
     headers = {
@@ -237,8 +280,9 @@ def get_ice_server_info(region: str, speech_key: str) -> Optional[Dict[str, Any]
     
     try:
         logging.info("avatar_service: requesting ICE servers from %s", url)
-        resp = requests.get(url, headers=headers, timeout=10)
-        resp.raise_for_status()
+        with span("speech_ice"):
+            resp = get_session().get(url, headers=headers, timeout=10)
+            resp.raise_for_status()
         ice_data = resp.json()
         logging.info("avatar_service: ICE server response: %s", str(ice_data)[:500])
         return ice_data
@@ -250,21 +294,18 @@ def get_ice_server_info(region: str, speech_key: str) -> Optional[Dict[str, Any]
         return None
 
 
-def get_avatar_token() -> Optional[Dict[str, Any]]:
-    """
-    Get authentication token for Azure Speech Avatar.
-    
-    Returns token and region info needed for client-side SDK initialization.
-    """
-    config = _get_speech_config()
-    
-    if not is_avatar_service_available():
-        return None
-    
-    region = config["region"]
-    key = config["key"]
-    
-    # Get authorization token
+def _env_seconds(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _issue_speech_token(credentials: Tuple[str, str]) -> Optional[Tuple[str, float]]:
+    """STS token for (region, key) and its lifetime in seconds."""
+    import requests
+
+    region, key = credentials
     token_url = f"https://{region}.api.cognitive.microsoft.com/sts/v1.0/issueToken"
     
     headers = {
@@ -274,20 +315,12 @@ def get_avatar_token() -> Optional[Dict[str, Any]]:
     
     try:
         logging.info("avatar_service: requesting token from %s", token_url)
-        resp = requests.post(token_url, headers=headers, timeout=10)
-        resp.raise_for_status()
+        with span("speech_token"):
+            resp = get_session().post(token_url, headers=headers, timeout=10)
+            resp.raise_for_status()
         token = resp.text
         logging.info("avatar_service: token obtained successfully, length=%d", len(token))
-        
-        # Get ICE server info for WebRTC
-        ice_info = get_ice_server_info(region, key)
-        
-        return {
-            "token": token,
-            "region": region,
-            "ice_servers": ice_info,
-            "expires_in": 600,  # Token valid for 10 minutes
-        }
+        return token, SPEECH_TOKEN_TTL_S
     except requests.exceptions.HTTPError as exc:
         logging.error("avatar_service: HTTP error getting token: %s, response: %s", exc, exc.response.text if exc.response else "N/A")
         return None
@@ -296,6 +329,54 @@ def get_avatar_token() -> Optional[Dict[str, Any]]:
         return None
 
 
+def _fetch_ice_servers(credentials: Tuple[str, str]) -> Optional[Tuple[Dict[str, Any], float]]:
+    ice_info = get_ice_server_info(*credentials)
+    return (ice_info, _env_seconds("AVATAR_ICE_TTL_SECONDS", 600)) if ice_info is not None else None
+
+
+# STS tokens are valid for 10 minutes. Both caches refresh in the background
+# once a value is within AVATAR_TOKEN_REFRESH_AHEAD_SECONDS of expiring, so a
+# burst of session starts shares one fetch instead of two round trips each.
+SPEECH_TOKEN_TTL_S = 600
+_speech_tokens = RefreshAheadCache(
+    "speech_token", _issue_speech_token, _env_seconds("AVATAR_TOKEN_REFRESH_AHEAD_SECONDS", 120)
+)
+_ice_servers = RefreshAheadCache(
+    "avatar_ice", _fetch_ice_servers, _env_seconds("AVATAR_TOKEN_REFRESH_AHEAD_SECONDS", 120)
+)
+metrics.REGISTRY.register_cache(_speech_tokens.name, _speech_tokens)
+metrics.REGISTRY.register_cache(_ice_servers.name, _ice_servers)
+
+
+def get_avatar_token() -> Optional[Dict[str, Any]]:
+    """
+    Get authentication token for Azure Speech Avatar.
+    
+    Returns token and region info needed for client-side SDK initialization.
+    Token and ICE relay info are cached per region (see _speech_tokens);
+    expires_in is the token's remaining lifetime.
+    """
+    config = _get_speech_config()
+    
+    if not is_avatar_service_available():
+        return None
+    
+    credentials = (config["region"], config["key"])
+    token = _speech_tokens.get(credentials)
+    if token is None:
+        return None
+    
+    # Get ICE server info for WebRTC
+    ice = _ice_servers.get(credentials)
+    
+    return {
+        "token": token[0],
+        "region": config["region"],
+        "ice_servers": ice[0] if ice is not None else None,
+        "expires_in": int(token[1]),
+    }
+
+
 def transcribe_audio_speech_services(
     audio_data: bytes,
     audio_format: str = "webm",
@@ -314,6 +395,8 @@ def transcribe_audio_speech_services(
     Returns:
         Transcribed text or None on failure
     """
+    import requests
+
     config = _get_speech_config()
     
     if not config["key"] or not config["region"]:
@@ -350,8 +433,9 @@ def transcribe_audio_speech_services(
     
     try:
         logging.info("avatar_service: transcribing audio via Speech Services, size=%d bytes, format=%s", len(audio_data), audio_format)
-        resp = requests.post(stt_url, headers=headers, params=params, data=audio_data, timeout=30)
-        resp.raise_for_status()
+        with span("speech_stt", bytes=len(audio_data)):
+            resp = get_session().post(stt_url, headers=headers, params=params, data=audio_data, timeout=30)
+            resp.raise_for_status()
         
         result = resp.json()
         logging.info("avatar_service: STT response: %s", str(result)[:500])
@@ -393,7 +477,6 @@ def _generate_placeholder_response(
         "avatar_config": None,
         "persona": persona_type,
         "emotion": emotion,
-        "generated_at": now_iso(),
         "placeholder": True,
         "streaming": False,
         "message": "Azure Speech Avatar is not currently configured. "
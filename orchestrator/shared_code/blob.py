@@ -1,11 +1,26 @@
 import os
-import json
+import copy
+import hashlib
 import uuid
+import random
+import threading
+import time
 import logging
-from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Tuple
 
-from azure.storage.blob import BlobServiceClient, ContentSettings
+from . import codec, metrics
+from .compression import decompress, encode_for_path
+from .lru import LRUCache
+from .tracing import current_route, span
+
+if TYPE_CHECKING:
+    from azure.storage.blob import BlobServiceClient
+
+# The storage SDK (and azure.core, which pulls in requests) is imported on first
+# use rather than at module import: it is the largest single contributor to
+# cold-start import time, and several functions never touch storage.
 
 # Environment
 
@@ -35,11 +50,15 @@ def _resolve_blob_conn() -> Tuple[Optional[str], Optional[str]]:
 
 _BLOB_CONN, _BLOB_CONN_SOURCE = _resolve_blob_conn()
 _CONTAINER = os.getenv("PROMPTS_CONTAINER", "prompts")
+# "memory" swaps storage for an in-process stand-in (load tests, local runs); see memory_blob.py.
+_BACKEND = os.getenv("BLOB_BACKEND", "azure").strip().lower()
 
-_service_client: Optional[BlobServiceClient] = None
+_service_client: Optional["BlobServiceClient"] = None
+_container_client = None
+_client_lock = threading.Lock()
 
 
-def _get_service() -> BlobServiceClient:
+def _get_service() -> "BlobServiceClient":
     global _service_client
     if _service_client is None:
         if not _BLOB_CONN:
@@ -51,58 +70,368 @@ def _get_service() -> BlobServiceClient:
             "blob: initializing BlobServiceClient using connection from env=%s",
             _BLOB_CONN_SOURCE or "<unknown>",
         )
+        from azure.storage.blob import BlobServiceClient
+
         _service_client = BlobServiceClient.from_connection_string(_BLOB_CONN)
     return _service_client
 
 
 def get_container_client():
-    svc = _get_service()
-    cc = svc.get_container_client(_CONTAINER)
+    """Return the shared container client, creating the container on first use."""
+    global _container_client
+    if _container_client is None:
+        with _client_lock:
+            if _container_client is None and _BACKEND == "memory":
+                from .memory_blob import MemoryContainerClient
+
+                logging.info("blob: using in-memory storage backend (BLOB_BACKEND=memory)")
+                _container_client = MemoryContainerClient(float(os.getenv("BLOB_MEMORY_LATENCY_MS", "0")) / 1000.0)
+            elif _container_client is None:
+                cc = _get_service().get_container_client(_CONTAINER)
+                try:
+                    cc.create_container()
+                except Exception:
+                    # Already exists or no permission to create (assume exists)
+                    pass
+                _container_client = cc
+    return _container_client
+
+
+@contextmanager
+def use_container(container: Any) -> Iterator[Any]:
+    """Serve every helper in this module from `container` until the block exits.
+
+    For tests and local tooling. The per-process content hashes (the write
+    dirty check) are cleared on entry and exit, so state recorded against one
+    container never skips a write to another.
+    """
+    global _container_client
+    with _client_lock:
+        previous, _container_client = _container_client, container
+    _content_hashes.clear()
     try:
-        cc.create_container()
-    except Exception:
-        # Already exists or no permission to create (assume exists)
-        pass
-    return cc
+        yield container
+    finally:
+        with _client_lock:
+            _container_client = previous
+        _content_hashes.clear()
+
+
+# Dirty check: hash of the last content read from or written to each path in
+# this process. A conditional write whose bytes and ETag precondition match is skipped.
+_UNKNOWN_METADATA = object()
+_WRITE_DEDUP_ENABLED = os.getenv("BLOB_WRITE_DEDUP_ENABLED", "true").strip().lower() in ("true", "1", "yes")
+_content_hashes = LRUCache(int(os.getenv("BLOB_HASH_CACHE_SIZE", "4096")))
+_write_stats = {"writes": 0, "skipped": 0}
+_write_stats_lock = threading.Lock()
+
+
+def _content_digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def _remember_content(path: str, data: bytes, etag: Optional[str], metadata: Any = _UNKNOWN_METADATA) -> None:
+    if _WRITE_DEDUP_ENABLED:
+        _content_hashes.put(path, (_content_digest(data), etag, metadata))
+
+
+def _count_write(skipped: bool) -> None:
+    with _write_stats_lock:
+        _write_stats["skipped" if skipped else "writes"] += 1
+
+
+def get_write_stats() -> Dict[str, int]:
+    """Return counts of blob writes performed and skipped as unchanged in this process."""
+    with _write_stats_lock:
+        return dict(_write_stats)
+
+
+metrics.REGISTRY.register(
+    metrics.CallbackMetric(
+        "pulse_blob_writes_total",
+        "counter",
+        "JSON blob writes, by whether they were performed or skipped as unchanged.",
+        ("result",),
+        lambda: {("written",): get_write_stats()["writes"], ("skipped",): get_write_stats()["skipped"]},
+    )
+)
+metrics.REGISTRY.register_cache("blob_content_hash", _content_hashes)
+
+
+@contextmanager
+def _io(op: str, **attrs: Any) -> Iterator[Any]:
+    """Span plus latency/route metrics around one storage operation."""
+    start = time.perf_counter()
+    try:
+        with span(f"blob_{op}", **attrs) as sp:
+            yield sp
+    finally:
+        metrics.observe_blob_op(op, time.perf_counter() - start, current_route())
 
 
 def read_json(path: str) -> Optional[Dict[str, Any]]:
-    cc = get_container_client()
-    bc = cc.get_blob_client(path)
+    with _io("read", path=path) as sp:
+        cc = get_container_client()
+        bc = cc.get_blob_client(path)
+        try:
+            downloader = bc.download_blob()
+            data = decompress(downloader.readall())
+        except Exception:
+            sp.set(found=False)
+            return None
+    _remember_content(path, data, getattr(getattr(downloader, "properties", None), "etag", None))
     try:
-        data = bc.download_blob().readall()
+        return codec.loads(data)
     except Exception:
         return None
+
+
+class BlobConflictError(Exception):
+    """A conditional write lost a race: the blob changed (or appeared) since it was read."""
+
+
+def read_json_with_etag(path: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Read a JSON document together with its ETag.
+
+    Returns (None, None) when the blob does not exist. A blob that exists but
+    does not parse returns (None, etag) so a conditional write can replace it.
+    """
+    with _io("read", path=path) as sp:
+        cc = get_container_client()
+        bc = cc.get_blob_client(path)
+        try:
+            downloader = bc.download_blob()
+            data = decompress(downloader.readall())
+        except Exception:
+            sp.set(found=False)
+            return None, None
+    etag = downloader.properties.etag
+    _remember_content(path, data, etag)
     try:
-        return json.loads(data.decode("utf-8"))
+        return codec.loads(data), etag
     except Exception:
-        return None
+        return None, etag
 
 
-def write_json(path: str, obj: Dict[str, Any]) -> None:
-    cc = get_container_client()
-    bc = cc.get_blob_client(path)
-    data = json.dumps(obj, ensure_ascii=False).encode("utf-8")
-    bc.upload_blob(
-        data,
-        overwrite=True,
-        content_settings=ContentSettings(content_type="application/json; charset=utf-8"),
-    )
+def write_json(
+    path: str,
+    obj: Dict[str, Any],
+    metadata: Optional[Dict[str, str]] = None,
+    etag: Optional[str] = None,
+    create_only: bool = False,
+) -> Optional[str]:
+    """Write a JSON document, optionally attaching blob metadata.
 
+    Metadata is stored alongside the blob and returned by list_blobs_with_metadata,
+    which lets callers list summary fields without downloading documents.
 
-def blob_exists(path: str) -> bool:
+    `etag` makes the write conditional on the blob still having that ETag
+    (If-Match) and `create_only` on the blob not existing yet (If-None-Match: *).
+    Either precondition failing raises BlobConflictError. Returns the new ETag.
+
+    Large documents under prefixes with a compression policy are stored
+    gzip/zstd-encoded with a Content-Encoding header (see compression.py);
+    read_json decodes them transparently.
+
+    A conditional write whose content is identical to what this process last
+    read from or wrote to `path` with that same ETag is skipped (and counted in
+    get_write_stats): the precondition says nobody has written since. Writes
+    without an ETag always go to storage, since another instance may have
+    changed the blob since this process last saw it.
+    """
+    data = codec.dumps(obj)
+    if _WRITE_DEDUP_ENABLED and etag is not None and not create_only:
+        cached = _content_hashes.get(path)
+        if (
+            cached is not None
+            and cached[0] == _content_digest(data)
+            and etag == cached[1]
+            and (metadata is None or metadata == cached[2])
+        ):
+            _count_write(skipped=True)
+            return cached[1]
+
+    from azure.core import MatchConditions
+    from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+    from azure.storage.blob import ContentSettings
+
+    payload, content_encoding = encode_for_path(path, data)
     cc = get_container_client()
     bc = cc.get_blob_client(path)
+    kwargs: Dict[str, Any] = {}
+    if etag is not None:
+        kwargs["etag"] = etag
+        kwargs["match_condition"] = MatchConditions.IfNotModified
     try:
-        bc.get_blob_properties()
-        return True
-    except Exception:
-        return False
+        with _io("write", path=path, bytes=len(payload), encoding=content_encoding):
+            result = bc.upload_blob(
+                payload,
+                overwrite=not create_only,
+                content_settings=ContentSettings(
+                    content_type="application/json; charset=utf-8",
+                    content_encoding=content_encoding,
+                ),
+                metadata=metadata,
+                **kwargs,
+            )
+    except (ResourceModifiedError, ResourceExistsError) as exc:
+        _content_hashes.pop(path)
+        raise BlobConflictError(f"Conditional write to {path} failed: {exc}") from exc
+    except ResourceNotFoundError as exc:
+        _content_hashes.pop(path)
+        if etag is not None:
+            # Deleted since it was read: also a lost race.
+            raise BlobConflictError(f"Conditional write to {path} failed: {exc}") from exc
+        raise
+    new_etag = result.get("etag") if isinstance(result, dict) else None
+    _remember_content(path, data, new_etag, metadata)
+    _count_write(skipped=False)
+    return new_etag
+
+
+def update_json(
+    path: str,
+    mutate: Callable[[Optional[Dict[str, Any]]], Optional[Dict[str, Any]]],
+    retries: int = 8,
+    metadata: Optional[Dict[str, str]] = None,
+) -> Optional[Dict[str, Any]]:
+    """Read-modify-write a JSON document without a lock.
+
+    `mutate` receives a private copy of the current document (None when the blob
+    does not exist) and returns the new document, or None to leave the blob
+    untouched. The write is conditional on the ETag that was read; when another
+    writer got there first the document is re-read and `mutate` re-applied to
+    the fresh copy, so mutations must be expressed as merges ("append these
+    messages", "add this trust delta") rather than as precomputed results.
+
+    Returns the document as written (or as read, when `mutate` returned None).
+    Raises BlobConflictError if every attempt lost a race.
+    """
+    with _io("update", path=path) as sp:
+        for attempt in range(retries):
+            sp.set(attempts=attempt + 1)
+            current, etag = read_json_with_etag(path)
+            updated = mutate(copy.deepcopy(current))
+            if updated is None:
+                return current
+            try:
+                write_json(path, updated, metadata=metadata, etag=etag, create_only=etag is None)
+                return updated
+            except BlobConflictError:
+                logging.info("blob: update_json conflict on %s (attempt %d/%d)", path, attempt + 1, retries)
+                # Short jittered backoff so pipelined requests for one session interleave instead of colliding again.
+                time.sleep(random.uniform(0, 0.02 * (2 ** min(attempt, 4))))
+    raise BlobConflictError(f"Gave up updating {path} after {retries} conflicting writes")
+
+
+def set_blob_metadata(path: str, metadata: Dict[str, str]) -> None:
+    with _io("metadata", path=path):
+        cc = get_container_client()
+        bc = cc.get_blob_client(path)
+        bc.set_blob_metadata(metadata)
+
+
+def blob_exists(path: str) -> bool:
+    with _io("head", path=path):
+        cc = get_container_client()
+        bc = cc.get_blob_client(path)
+        try:
+            bc.get_blob_properties()
+            return True
+        except Exception:
+            return False
+
+
+def get_blob_etag(path: str) -> Optional[str]:
+    """Return the blob's ETag, or None when it does not exist."""
+    with _io("head", path=path):
+        cc = get_container_client()
+        bc = cc.get_blob_client(path)
+        try:
+            return bc.get_blob_properties().etag
+        except Exception:
+            return None
 
 
 def list_blob_names(prefix: str) -> List[str]:
-    cc = get_container_client()
-    return [b.name for b in cc.list_blobs(name_starts_with=prefix)]
+    with _io("list", prefix=prefix):
+        cc = get_container_client()
+        return [b.name for b in cc.list_blobs(name_starts_with=prefix)]
+
+
+def list_blobs_with_metadata(prefix: str) -> List[Tuple[str, Dict[str, str]]]:
+    """List blob names under a prefix together with their metadata (single listing call)."""
+    with _io("list", prefix=prefix):
+        cc = get_container_client()
+        return [
+            (b.name, dict(b.metadata or {}))
+            for b in cc.list_blobs(name_starts_with=prefix, include=["metadata"])
+        ]
+
+
+def write_bytes(path: str, data: bytes, content_type: str = "application/octet-stream") -> Optional[str]:
+    """Write a binary blob (audio and other non-JSON payloads) as-is. Returns the new ETag."""
+    from azure.storage.blob import ContentSettings
+
+    with _io("write", path=path, bytes=len(data)):
+        cc = get_container_client()
+        bc = cc.get_blob_client(path)
+        result = bc.upload_blob(data, overwrite=True, content_settings=ContentSettings(content_type=content_type))
+    _count_write(skipped=False)
+    return result.get("etag") if isinstance(result, dict) else None
+
+
+def read_bytes(path: str) -> Optional[bytes]:
+    """Read a binary blob; None when it does not exist."""
+    with _io("read", path=path) as sp:
+        cc = get_container_client()
+        bc = cc.get_blob_client(path)
+        try:
+            return bc.download_blob().readall()
+        except Exception:
+            sp.set(found=False)
+            return None
+
+
+def delete_blob(path: str) -> bool:
+    """Best-effort delete; False when the blob was already gone or the delete failed."""
+    with _io("delete", path=path) as sp:
+        cc = get_container_client()
+        bc = cc.get_blob_client(path)
+        try:
+            bc.delete_blob()
+            return True
+        except Exception:
+            sp.set(found=False)
+            return False
+
+
+def get_read_url(path: str, ttl_seconds: int = 300) -> Optional[str]:
+    """Short-lived read-only SAS URL for a blob.
+
+    Signed locally with the account key from the connection string (no
+    storage round trip). None when no URL can be issued: the memory backend,
+    or a connection that carries no account key.
+    """
+    if _BACKEND == "memory":
+        return None
+    from azure.storage.blob import BlobSasPermissions, generate_blob_sas
+
+    service = _get_service()
+    account_key = getattr(service.credential, "account_key", None)
+    if not account_key:
+        return None
+    now = datetime.now(timezone.utc)
+    sas = generate_blob_sas(
+        account_name=service.account_name,
+        container_name=_CONTAINER,
+        blob_name=path,
+        account_key=account_key,
+        permission=BlobSasPermissions(read=True),
+        start=now - timedelta(minutes=1),  # tolerate clock skew
+        expiry=now + timedelta(seconds=ttl_seconds),
+    )
+    return f"{get_container_client().get_blob_client(path).url}?{sas}"
 
 
 def now_iso() -> str:
@@ -0,0 +1,40 @@
+"""
+JSON codec shared by HTTP responses and blob I/O.
+
+`dumps` returns UTF-8 bytes, which func.HttpResponse and upload_blob accept
+directly, so no intermediate str is built. orjson is used when installed (set
+JSON_CODEC=stdlib to force the fallback). The stdlib fallback emits the same
+compact separators, so documents are byte-identical whichever backend wrote
+them and content-hash write suppression works across workers.
+"""
+
+import json
+import os
+from typing import Any, Union
+
+try:  # optional dependency
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None  # type: ignore
+
+
+_USE_ORJSON = orjson is not None and os.getenv("JSON_CODEC", "orjson").strip().lower() != "stdlib"
+
+# Non-string keys are stringified like the stdlib encoder does.
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+name = "orjson" if _USE_ORJSON else "stdlib"
+
+
+def dumps(obj: Any) -> bytes:
+    if _USE_ORJSON:
+        return orjson.dumps(obj, option=_ORJSON_OPTIONS)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    if _USE_ORJSON:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
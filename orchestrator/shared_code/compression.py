@@ -0,0 +1,100 @@
+"""
+Optional compression for JSON blobs.
+
+Policies map blob-path prefixes to an encoding and are read from
+BLOB_COMPRESSION_POLICIES, e.g. "sessions/=gzip,trainer-change-logs/=zstd".
+The longest matching prefix wins; "off" disables compression for a prefix.
+Payloads smaller than BLOB_COMPRESSION_MIN_BYTES are stored as-is because the
+header overhead outweighs the saving.
+
+zstd is used only when the optional `zstandard` package is installed;
+otherwise those prefixes fall back to gzip. Reads detect the encoding from the
+payload's magic bytes rather than trusting the Content-Encoding header,
+because the storage SDK may already have decoded gzip in transit and blobs
+written before compression was enabled are plain JSON.
+"""
+
+import gzip
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+try:  # optional dependency
+    import zstandard  # type: ignore
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None  # type: ignore
+
+
+_logger = logging.getLogger(__name__)
+
+GZIP = "gzip"
+ZSTD = "zstd"
+
+_GZIP_MAGIC = b"\x1f\x8b"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+_DEFAULT_POLICIES = "sessions/=gzip,trainer-change-logs/=gzip"
+_GZIP_LEVEL = 6
+_ZSTD_LEVEL = 3
+
+
+def parse_policies(spec: str) -> List[Tuple[str, Optional[str]]]:
+    """Parse "prefix=encoding,..." into (prefix, encoding) pairs, longest prefix first."""
+    policies: Dict[str, Optional[str]] = {}
+    for part in (spec or "").split(","):
+        prefix, sep, encoding = part.strip().partition("=")
+        if not sep:
+            continue
+        encoding = encoding.strip().lower()
+        if encoding in ("off", "none", ""):
+            policies[prefix.strip()] = None
+        elif encoding in (GZIP, ZSTD):
+            policies[prefix.strip()] = encoding
+        else:
+            _logger.warning("compression: ignoring unknown encoding %r for prefix %r", encoding, prefix)
+    return sorted(policies.items(), key=lambda item: len(item[0]), reverse=True)
+
+
+_POLICIES = parse_policies(os.getenv("BLOB_COMPRESSION_POLICIES", _DEFAULT_POLICIES))
+_MIN_BYTES = int(os.getenv("BLOB_COMPRESSION_MIN_BYTES", "2048"))
+
+
+def encoding_for(path: str, size: int) -> Optional[str]:
+    """Return the encoding to use for a payload of `size` bytes at `path`, or None."""
+    if size < _MIN_BYTES:
+        return None
+    for prefix, encoding in _POLICIES:
+        if path.startswith(prefix):
+            if encoding == ZSTD and zstandard is None:
+                return GZIP
+            return encoding
+    return None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == ZSTD:
+        return zstandard.ZstdCompressor(level=_ZSTD_LEVEL).compress(data)
+    # mtime=0 keeps output deterministic for identical input.
+    return gzip.compress(data, compresslevel=_GZIP_LEVEL, mtime=0)
+
+
+def decompress(data: bytes) -> bytes:
+    """Decode a gzip or zstd payload; anything else is returned unchanged."""
+    if data[:2] == _GZIP_MAGIC:
+        return gzip.decompress(data)
+    if data[:4] == _ZSTD_MAGIC:
+        if zstandard is None:
+            raise RuntimeError("Blob is zstd-compressed but the 'zstandard' package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+
+def encode_for_path(path: str, data: bytes) -> Tuple[bytes, Optional[str]]:
+    """Compress `data` according to the policy for `path`. Returns (payload, content_encoding)."""
+    encoding = encoding_for(path, len(data))
+    if encoding is None:
+        return data, None
+    payload = compress(data, encoding)
+    if len(payload) >= len(data):
+        return data, None
+    return payload, encoding
@@ -0,0 +1,194 @@
+"""
+Hedged speech-to-text: Whisper first, Azure Speech Services as the hedge.
+
+With STT_HEDGE_ENABLED=true (and Speech Services configured), transcribe()
+sends the audio to Whisper and waits up to the hedge delay. If Whisper has
+not answered by then, or fails, is throttled (429) or returns nothing before
+it, the same audio goes to Speech Services as well. The first non-empty
+transcript wins; the other call is abandoned (cancelled if it has not
+started; an in-flight HTTP request cannot be interrupted, so its result is
+discarded when it lands).
+
+The hedge delay tracks Whisper's observed p90 over the last
+STT_HEDGE_WINDOW calls, clamped to [STT_HEDGE_MIN_DELAY_MS,
+STT_HEDGE_MAX_DELAY_MS]; until STT_HEDGE_MIN_SAMPLES calls have been seen it
+is STT_HEDGE_DELAY_MS (default 1500). So roughly one request in ten pays for
+a second transcription, and those are the slow ones.
+
+Per-provider latency is exported as pulse_stt_provider_duration_seconds and
+the outcome of each hedged call as pulse_stt_hedge_total{winner,hedged}.
+"""
+
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Deque, Dict, Optional
+
+from . import metrics
+
+
+WHISPER = "whisper"
+SPEECH = "speech_services"
+
+STT_LATENCY = metrics.REGISTRY.register(
+    metrics.Histogram(
+        "pulse_stt_provider_duration_seconds", "Speech-to-text latency by provider and outcome.", ("provider", "outcome")
+    )
+)
+HEDGE_RESULTS = metrics.REGISTRY.register(
+    metrics.Counter(
+        "pulse_stt_hedge_total", "Hedged transcriptions by winning provider and whether the hedge fired.",
+        ("winner", "hedged"),
+    )
+)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def enabled() -> bool:
+    return os.getenv("STT_HEDGE_ENABLED", "false").strip().lower() in ("true", "1", "yes")
+
+
+class LatencyWindow:
+    """Most recent latencies (seconds) for one provider."""
+
+    def __init__(self, size: int) -> None:
+        self._samples: Deque[float] = deque(maxlen=max(1, size))
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def quantile(self, q: float) -> Optional[float]:
+        with self._lock:
+            ordered = sorted(self._samples)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+_windows: Dict[str, LatencyWindow] = {
+    WHISPER: LatencyWindow(_env_int("STT_HEDGE_WINDOW", 200)),
+    SPEECH: LatencyWindow(_env_int("STT_HEDGE_WINDOW", 200)),
+}
+_pool = ThreadPoolExecutor(max_workers=_env_int("STT_HEDGE_WORKERS", 8), thread_name_prefix="stt-hedge")
+
+
+def hedge_delay_s() -> float:
+    """Seconds to wait on Whisper before hedging: its recent p90, clamped."""
+    low = _env_int("STT_HEDGE_MIN_DELAY_MS", 300) / 1000.0
+    high = _env_int("STT_HEDGE_MAX_DELAY_MS", 5000) / 1000.0
+    window = _windows[WHISPER]
+    if len(window) < _env_int("STT_HEDGE_MIN_SAMPLES", 20):
+        return min(max(_env_int("STT_HEDGE_DELAY_MS", 1500) / 1000.0, low), high)
+    return min(max(window.quantile(0.9), low), high)
+
+
+def latency_quantiles() -> Dict[str, Dict[str, Optional[float]]]:
+    """p50/p90 per provider over the current windows (for diagnostics)."""
+    return {
+        name: {"samples": len(window), "p50": window.quantile(0.5), "p90": window.quantile(0.9)}
+        for name, window in _windows.items()
+    }
+
+
+def _is_throttled(exc: BaseException) -> bool:
+    return getattr(getattr(exc, "response", None), "status_code", None) == 429
+
+
+def _timed(provider: str, fn, *args, **kwargs) -> Optional[str]:
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        result = fn(*args, **kwargs)
+        outcome = "ok" if result and result.strip() else "empty"
+        return result
+    except Exception as exc:  # noqa: BLE001
+        outcome = "throttled" if _is_throttled(exc) else "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STT_LATENCY.labels(provider, outcome).observe(elapsed)
+        # Only answers feed the window: a 429 in 50 ms says nothing about how long a transcription takes.
+        if outcome in ("ok", "empty"):
+            _windows[provider].add(elapsed)
+
+
+def _whisper(audio_data: bytes, audio_format: str) -> Optional[str]:
+    from . import openai_client
+
+    return openai_client.transcribe_audio(audio_data, audio_format=audio_format)
+
+
+def _speech_services(audio_data: bytes, audio_format: str) -> Optional[str]:
+    from . import avatar_service
+
+    return avatar_service.transcribe_audio_speech_services(audio_data, audio_format=audio_format)
+
+
+def _submit(provider: str, fn, audio_data: bytes, audio_format: str) -> Future:
+    ctx = contextvars.copy_context()
+    return _pool.submit(ctx.run, _timed, provider, fn, audio_data, audio_format)
+
+
+def _text(future: Future) -> Optional[str]:
+    try:
+        result = future.result()
+    except Exception as exc:  # noqa: BLE001
+        logging.warning("hedged_stt: provider failed: %s", exc)
+        return None
+    return result.strip() if result and result.strip() else None
+
+
+def transcribe(audio_data: bytes, audio_format: str = "webm") -> Optional[str]:
+    """
+    Transcribe with Whisper, hedged by Speech Services when enabled.
+
+    Returns the first non-empty transcript, "" when every provider that ran
+    heard nothing, or None when all of them failed. Without hedging this is
+    transcribe_audio() with its exceptions propagated.
+    """
+    from . import avatar_service
+
+    if not enabled() or not avatar_service.is_avatar_service_available():
+        return _timed(WHISPER, _whisper, audio_data, audio_format)
+
+    delay = hedge_delay_s()
+    providers: Dict[Future, str] = {_submit(WHISPER, _whisper, audio_data, audio_format): WHISPER}
+    done, _ = wait(list(providers), timeout=delay)
+    for future in done:
+        text = _text(future)
+        if text:
+            HEDGE_RESULTS.labels(WHISPER, "false").inc()
+            return text
+
+    reason = "slow" if not done else "primary_failed_or_empty"
+    logging.info("hedged_stt: hedging to Speech Services (%s, delay=%.0f ms)", reason, delay * 1000)
+    providers[_submit(SPEECH, _speech_services, audio_data, audio_format)] = SPEECH
+    pending = {f for f in providers if f not in done}
+    while pending:
+        finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in finished:
+            text = _text(future)
+            if text:
+                for loser in pending:
+                    loser.cancel()
+                HEDGE_RESULTS.labels(providers[future], "true").inc()
+                return text
+    HEDGE_RESULTS.labels("none", "true").inc()
+    # Everything has finished: "" if any provider answered (with nothing), None if all failed.
+    answered = any(f.exception() is None and f.result() is not None for f in providers)
+    return "" if answered else None
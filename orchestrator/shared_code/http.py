@@ -1,17 +1,19 @@
-import json
 import uuid
 from datetime import datetime, timezone
-from typing import Any, Mapping, Optional
+from typing import Any, Mapping, Optional, Sequence, Tuple, Union
 
 import azure.functions as func
 
+from . import codec
+
 
 Headers = Optional[Mapping[str, str]]
+BytesLike = Union[bytes, bytearray, memoryview]
 
 
 def json_ok(body: Any, status: int = 200, headers: Headers = None) -> func.HttpResponse:
     return func.HttpResponse(
-        body=json.dumps(body, ensure_ascii=False),
+        body=codec.dumps(body),
         status_code=status,
         mimetype="application/json",
         headers=headers,
@@ -46,8 +48,45 @@ def json_error_envelope(code: str, message: str, status: int, headers: Headers =
     combined_headers.setdefault("Content-Type", "application/json")
 
     return func.HttpResponse(
-        body=json.dumps(envelope, ensure_ascii=False),
+        body=codec.dumps(envelope),
         status_code=status,
         mimetype="application/json",
         headers=combined_headers,
     )
+
+
+def wants_multipart(req: func.HttpRequest) -> bool:
+    """True when the client's Accept header asks for multipart/mixed."""
+    accept = (req.headers.get("Accept") or "").lower()
+    return "multipart/mixed" in accept
+
+
+def multipart_mixed(
+    parts: Sequence[Tuple[Mapping[str, str], BytesLike]],
+    status: int = 200,
+    headers: Headers = None,
+) -> func.HttpResponse:
+    """Return a multipart/mixed response built from (part headers, payload) pairs.
+
+    The body is one b"".join over the parts, with payloads passed as
+    memoryviews: each payload is copied exactly once, into a bytes object
+    HttpResponse keeps as-is. Binary payloads (audio) go out as-is instead of
+    base64 inside JSON.
+    """
+    boundary = f"pulse-{uuid.uuid4().hex}"
+    delimiter = f"--{boundary}\r\n".encode("ascii")
+    pieces: list = []
+    for part_headers, payload in parts:
+        head = "".join(f"{k}: {v}\r\n" for k, v in part_headers.items()) + "\r\n"
+        pieces.extend((delimiter, head.encode("utf-8"), memoryview(payload), b"\r\n"))
+    pieces.append(f"--{boundary}--\r\n".encode("ascii"))
+    body = b"".join(pieces)
+
+    combined_headers = dict(headers) if headers else {}
+    combined_headers["Content-Type"] = f"multipart/mixed; boundary={boundary}"
+    return func.HttpResponse(body=body, status_code=status, headers=combined_headers)
+
+
+def json_part(body: Any) -> Tuple[Mapping[str, str], bytes]:
+    """A JSON part for multipart_mixed."""
+    return {"Content-Type": "application/json; charset=utf-8"}, codec.dumps(body)
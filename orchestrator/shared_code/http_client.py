@@ -0,0 +1,37 @@
+"""
+Shared outbound HTTP session.
+
+`requests` is imported when the first outbound call is made rather than at
+module import, keeping it off the cold-start path of functions that never call
+out. The session is reused for the life of the worker so calls to Azure OpenAI
+and Speech Services keep their TLS connections alive instead of handshaking on
+every request.
+"""
+
+import os
+import threading
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import requests
+
+
+_session: Optional["requests.Session"] = None
+_lock = threading.Lock()
+
+
+def get_session() -> "requests.Session":
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                pool_size = int(os.getenv("HTTP_POOL_SIZE", "20"))
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
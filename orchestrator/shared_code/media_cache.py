@@ -0,0 +1,151 @@
+"""
+Content-addressed caches for speech results.
+
+- transcripts: keyed by SHA-256 of the uploaded audio bytes (plus language and
+  Whisper deployment), so a client retry that re-uploads the same chunk is
+  not transcribed twice.
+- speech: MP3 keyed by SHA-256 of (deployment, voice, speed, text), so stock
+  persona lines and common short replies are synthesized once.
+
+Each cache has a bounded in-process LRU tier in front of a blob tier under
+media-cache/{name}/ that is shared by every instance. Blob errors are logged
+and treated as misses; the caches never fail the call they sit in front of.
+Entries larger than MEDIA_CACHE_MAX_ITEM_BYTES are kept in blob only.
+
+Transcripts are what a user said, and blob entries are never expired, so the
+transcripts cache stays in process unless STT_CACHE_BLOB_ENABLED is set; turn
+it on only alongside a storage lifecycle rule that deletes
+media-cache/stt_transcripts/ after the session retention period.
+
+Environment:
+- MEDIA_CACHE_ENABLED (default true), MEDIA_CACHE_BLOB_ENABLED (default true)
+- STT_CACHE_BLOB_ENABLED (default false)
+- STT_CACHE_SIZE (default 2048 entries), TTS_CACHE_SIZE (default 256 entries)
+
+Lookups are counted in pulse_media_cache_lookups_total{cache,tier}; the
+in-process tiers are also exported through pulse_cache_* as
+"stt_transcripts" and "tts_audio".
+"""
+
+import hashlib
+import json
+import logging
+import os
+from typing import Optional
+
+from . import metrics
+from .lru import LRUCache
+
+
+LOOKUPS = metrics.REGISTRY.register(
+    metrics.Counter(
+        "pulse_media_cache_lookups_total",
+        "Speech cache lookups by cache and the tier that answered (memory, blob or miss).",
+        ("cache", "tier"),
+    )
+)
+
+
+def _flag(name: str, default: str = "true") -> bool:
+    return os.getenv(name, default).strip().lower() in ("true", "1", "yes")
+
+
+def _max_item_bytes() -> int:
+    try:
+        return int(os.getenv("MEDIA_CACHE_MAX_ITEM_BYTES", str(512 * 1024)))
+    except ValueError:
+        return 512 * 1024
+
+
+class ContentCache:
+    """Bytes by content key: LRU in process, blob storage behind it."""
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int,
+        extension: str,
+        content_type: str,
+        blob_flag: Optional[str] = None,
+    ) -> None:
+        self.name = name
+        self.extension = extension
+        self.content_type = content_type
+        self.memory = LRUCache(max_entries)
+        # Opt-in switch for this cache's blob tier, on top of MEDIA_CACHE_BLOB_ENABLED.
+        self.blob_flag = blob_flag
+
+    def _blob_enabled(self) -> bool:
+        if not _flag("MEDIA_CACHE_BLOB_ENABLED"):
+            return False
+        return self.blob_flag is None or _flag(self.blob_flag, "false")
+
+    def _path(self, key: str) -> str:
+        return f"media-cache/{self.name}/{key[:2]}/{key}.{self.extension}"
+
+    def get(self, key: str) -> Optional[bytes]:
+        if not _flag("MEDIA_CACHE_ENABLED"):
+            return None
+        value = self.memory.get(key)
+        if value is not None:
+            LOOKUPS.labels(self.name, "memory").inc()
+            return value
+        if self._blob_enabled():
+            from .blob import read_bytes
+
+            try:
+                value = read_bytes(self._path(key))
+            except Exception as exc:  # noqa: BLE001
+                logging.warning("media_cache: %s blob read failed: %s", self.name, exc)
+                value = None
+            if value is not None:
+                LOOKUPS.labels(self.name, "blob").inc()
+                if len(value) <= _max_item_bytes():
+                    self.memory.put(key, value)
+                return value
+        LOOKUPS.labels(self.name, "miss").inc()
+        return None
+
+    def put(self, key: str, value: bytes) -> None:
+        if not _flag("MEDIA_CACHE_ENABLED") or not value:
+            return
+        if len(value) <= _max_item_bytes():
+            self.memory.put(key, value)
+        if self._blob_enabled():
+            from .blob import write_bytes
+
+            try:
+                write_bytes(self._path(key), value, content_type=self.content_type)
+            except Exception as exc:  # noqa: BLE001
+                logging.warning("media_cache: %s blob write failed: %s", self.name, exc)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+transcripts = ContentCache(
+    "stt_transcripts",
+    _env_int("STT_CACHE_SIZE", 2048),
+    "txt",
+    "text/plain; charset=utf-8",
+    blob_flag="STT_CACHE_BLOB_ENABLED",
+)
+speech = ContentCache("tts_audio", _env_int("TTS_CACHE_SIZE", 256), "mp3", "audio/mpeg")
+metrics.REGISTRY.register_cache(transcripts.name, transcripts.memory)
+metrics.REGISTRY.register_cache(speech.name, speech.memory)
+
+
+def transcript_key(audio_data: bytes, language: str, deployment: str) -> str:
+    digest = hashlib.sha256(audio_data).hexdigest()
+    # Short prefix for the variant so the same audio in another language or model is a different entry.
+    variant = hashlib.sha256(f"{language}\0{deployment}".encode()).hexdigest()[:8]
+    return f"{digest}-{variant}"
+
+
+def speech_key(text: str, voice: str, speed: float, deployment: str) -> str:
+    material = json.dumps([deployment, voice, round(float(speed), 3), text], ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
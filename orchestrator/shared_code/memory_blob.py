@@ -0,0 +1,208 @@
+"""
+In-memory stand-in for the blob container client.
+
+Selected with BLOB_BACKEND=memory (see blob.get_container_client). It
+implements the subset of the azure-storage-blob ContainerClient/BlobClient API
+that blob.py uses, including ETag preconditions, so conditional writes and
+update_json retries behave as they do against real storage, and blob leases,
+so lease-based locks exclude each other within the process. Documents live for
+the life of the process; nothing is persisted.
+
+Intended for load tests and local runs without a storage account.
+BLOB_MEMORY_LATENCY_MS adds a fixed delay to every storage call to
+approximate the round trip to a real account. memory_container() swaps a
+fresh one in for the duration of a block (unit tests).
+"""
+
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+
+
+class _BlobProperties:
+    __slots__ = ("name", "etag", "metadata", "size", "content_settings")
+
+    def __init__(self, name: str, etag: str, metadata: Dict[str, str], size: int, content_settings: Any) -> None:
+        self.name = name
+        self.etag = etag
+        self.metadata = metadata
+        self.size = size
+        self.content_settings = content_settings
+
+
+class _Downloader:
+    def __init__(self, data: bytes, properties: _BlobProperties) -> None:
+        self._data = data
+        self.properties = properties
+
+    def readall(self) -> bytes:
+        return self._data
+
+
+class MemoryLease:
+    def __init__(self, container: "MemoryContainerClient", name: str, lease_id: str, duration: int) -> None:
+        self._container = container
+        self._name = name
+        self.id = lease_id
+        self._duration = duration
+
+    def renew(self) -> None:
+        with self._container._lock:
+            held = self._container._leases.get(self._name)
+            if held is None or held[0] != self.id:
+                raise ResourceModifiedError(f"The lease ID specified did not match: {self._name}")
+            self._container._leases[self._name] = (self.id, self._container._lease_expiry(self._duration))
+
+    def release(self) -> None:
+        with self._container._lock:
+            held = self._container._leases.get(self._name)
+            if held is not None and held[0] == self.id:
+                del self._container._leases[self._name]
+
+
+class MemoryBlobClient:
+    def __init__(self, container: "MemoryContainerClient", name: str) -> None:
+        self._container = container
+        self.blob_name = name
+
+    def download_blob(self) -> _Downloader:
+        self._container._delay()
+        with self._container._lock:
+            entry = self._container._blobs.get(self.blob_name)
+            if entry is None:
+                raise ResourceNotFoundError(f"The specified blob does not exist: {self.blob_name}")
+            data, props = entry
+            return _Downloader(data, self._container._copy_props(props))
+
+    def upload_blob(
+        self,
+        data: Any,
+        overwrite: bool = False,
+        content_settings: Any = None,
+        metadata: Optional[Dict[str, str]] = None,
+        etag: Optional[str] = None,
+        match_condition: Optional[MatchConditions] = None,
+        **kwargs: Any,
+    ) -> Dict[str, Any]:
+        payload = data.encode("utf-8") if isinstance(data, str) else bytes(data)
+        self._container._delay()
+        with self._container._lock:
+            existing = self._container._blobs.get(self.blob_name)
+            if existing is not None and not overwrite:
+                raise ResourceExistsError(f"The specified blob already exists: {self.blob_name}")
+            if match_condition == MatchConditions.IfNotModified:
+                if existing is None:
+                    raise ResourceNotFoundError(f"The specified blob does not exist: {self.blob_name}")
+                if existing[1].etag != etag:
+                    raise ResourceModifiedError(f"The condition specified is not met: {self.blob_name}")
+            new_etag = self._container._next_etag()
+            self._container._blobs[self.blob_name] = (
+                payload,
+                _BlobProperties(self.blob_name, new_etag, dict(metadata or {}), len(payload), content_settings),
+            )
+        return {"etag": new_etag}
+
+    def get_blob_properties(self) -> _BlobProperties:
+        self._container._delay()
+        with self._container._lock:
+            entry = self._container._blobs.get(self.blob_name)
+            if entry is None:
+                raise ResourceNotFoundError(f"The specified blob does not exist: {self.blob_name}")
+            return self._container._copy_props(entry[1])
+
+    def set_blob_metadata(self, metadata: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        self._container._delay()
+        with self._container._lock:
+            entry = self._container._blobs.get(self.blob_name)
+            if entry is None:
+                raise ResourceNotFoundError(f"The specified blob does not exist: {self.blob_name}")
+            props = entry[1]
+            props.metadata = dict(metadata or {})
+            props.etag = self._container._next_etag()
+            return {"etag": props.etag}
+
+    def acquire_lease(self, lease_duration: int = -1, lease_id: Optional[str] = None, **kwargs: Any) -> MemoryLease:
+        self._container._delay()
+        with self._container._lock:
+            if self.blob_name not in self._container._blobs:
+                raise ResourceNotFoundError(f"The specified blob does not exist: {self.blob_name}")
+            held = self._container._leases.get(self.blob_name)
+            if held is not None and held[1] > time.monotonic() and held[0] != lease_id:
+                raise ResourceExistsError(f"There is already a lease present: {self.blob_name}")
+            new_id = lease_id or str(uuid.uuid4())
+            self._container._leases[self.blob_name] = (new_id, self._container._lease_expiry(lease_duration))
+        return MemoryLease(self._container, self.blob_name, new_id, lease_duration)
+
+    def delete_blob(self) -> None:
+        self._container._delay()
+        with self._container._lock:
+            if self._container._blobs.pop(self.blob_name, None) is None:
+                raise ResourceNotFoundError(f"The specified blob does not exist: {self.blob_name}")
+
+
+class MemoryContainerClient:
+    def __init__(self, latency_s: float = 0.0) -> None:
+        self.latency_s = latency_s
+        self._blobs: Dict[str, Any] = {}
+        self._leases: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._etag_counter = 0
+
+    def _delay(self) -> None:
+        if self.latency_s > 0:
+            time.sleep(self.latency_s)
+
+    @staticmethod
+    def _lease_expiry(duration: int) -> float:
+        return float("inf") if duration is None or duration < 0 else time.monotonic() + duration
+
+    def _next_etag(self) -> str:
+        self._etag_counter += 1
+        return f'"0x{self._etag_counter:X}"'
+
+    @staticmethod
+    def _copy_props(props: _BlobProperties) -> _BlobProperties:
+        return _BlobProperties(props.name, props.etag, dict(props.metadata), props.size, props.content_settings)
+
+    def create_container(self) -> None:
+        pass
+
+    def get_blob_client(self, blob: str) -> MemoryBlobClient:
+        return MemoryBlobClient(self, blob)
+
+    def list_blobs(self, name_starts_with: Optional[str] = None, include: Optional[Iterable[str]] = None) -> List[_BlobProperties]:
+        self._delay()
+        prefix = name_starts_with or ""
+        with self._lock:
+            return [
+                self._copy_props(props)
+                for name, (_, props) in sorted(self._blobs.items())
+                if name.startswith(prefix)
+            ]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._blobs.clear()
+            self._leases.clear()
+
+    def __len__(self) -> int:
+        return len(self._blobs)
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(len(data) for data, _ in self._blobs.values())
+
+
+@contextmanager
+def memory_container(latency_s: float = 0.0) -> Iterator[MemoryContainerClient]:
+    """A fresh in-memory container that shared_code.blob serves from until the block exits."""
+    from .blob import use_container
+
+    with use_container(MemoryContainerClient(latency_s)) as container:
+        yield container
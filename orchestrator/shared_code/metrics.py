@@ -0,0 +1,348 @@
+"""
+In-process metrics registry with Prometheus text exposition.
+
+Metrics are declared once at import time. Each labelled series is a child
+object created on first use and cached by its label tuple, so the hot path is
+a dict lookup plus an in-place increment: histogram children preallocate one
+slot per bucket and `observe` is a bisect into a tuple of bounds. Callers on
+very hot paths can resolve a child once (`LATENCY.labels("read")`) and reuse
+it.
+
+Values are per worker process. The `pulse_worker_info` series identifies the
+instance and process, because a scale-out Function App serves each scrape of
+/metrics from whichever instance receives it.
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+LabelValues = Tuple[str, ...]
+
+# Seconds. Covers blob round trips (ms) through slow LLM completions (tens of seconds).
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help_text
+        self.label_names: Tuple[str, ...] = tuple(labels)
+        self._children: Dict[LabelValues, Any] = {}
+        self._lock = threading.Lock()
+        self._default = self._new_child() if not self.label_names else None
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def labels(self, *values: str) -> Any:
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(f"{self.name} expects labels {self.label_names}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def children(self) -> Dict[LabelValues, Any]:
+        """Snapshot of the labelled children, keyed by label values."""
+        return dict(self._children)
+
+    def _series(self) -> Iterable[Tuple[LabelValues, Any]]:
+        if self._default is not None:
+            return [((), self._default)]
+        return list(self._children.items())
+
+    def render(self, out: List[str]) -> None:
+        out.append(f"# HELP {self.name} {self.help}")
+        out.append(f"# TYPE {self.name} {self.kind}")
+        for values, child in self._series():
+            child.render(self.name, self.label_names, values, out)
+
+
+class _ValueChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def render(self, name: str, label_names: Sequence[str], values: LabelValues, out: List[str]) -> None:
+        out.append(f"{name}{_format_labels(label_names, values)} {_format_value(self.value)}")
+
+
+class _GaugeChild(_ValueChild):
+    __slots__ = ()
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _ValueChild:
+        return _ValueChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self._default.set(value)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default.dec(amount)
+
+
+class _Timer:
+    __slots__ = ("_child", "_start")
+
+    def __init__(self, child: "_HistogramChild") -> None:
+        self._child = child
+        self._start = 0.0
+
+    def __enter__(self) -> "_Timer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._child.observe(time.perf_counter() - self._start)
+
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "_counts", "_sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+    @property
+    def count(self) -> int:
+        return sum(self._counts)
+
+    def render(self, name: str, label_names: Sequence[str], values: LabelValues, out: List[str]) -> None:
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative = 0
+        for bound, n in zip(self._bounds + (float("inf"),), counts):
+            cumulative += n
+            le = f'le="{_format_value(bound)}"'
+            out.append(f"{name}_bucket{_format_labels(label_names, values, le)} {cumulative}")
+        labels = _format_labels(label_names, values)
+        out.append(f"{name}_sum{labels} {_format_value(total)}")
+        out.append(f"{name}_count{labels} {cumulative}")
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> None:
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help_text, labels)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def time(self) -> _Timer:
+        return self._default.time()
+
+
+class CallbackMetric:
+    """A metric whose series are read from a function at scrape time."""
+
+    def __init__(
+        self,
+        name: str,
+        kind: str,
+        help_text: str,
+        labels: Sequence[str],
+        collect: Callable[[], Dict[LabelValues, float]],
+    ) -> None:
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.collect = collect
+
+    def render(self, out: List[str]) -> None:
+        out.append(f"# HELP {self.name} {self.help}")
+        out.append(f"# TYPE {self.name} {self.kind}")
+        for values, value in self.collect().items():
+            if value is None:
+                continue
+            out.append(f"{self.name}{_format_labels(self.label_names, values)} {_format_value(value)}")
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Any] = {}
+        self._caches: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Any) -> Any:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def register_cache(self, name: str, cache: Any) -> None:
+        """Export hits, misses and size for an object with `hits`, `misses` and `__len__` (e.g. LRUCache)."""
+        with self._lock:
+            self._caches[name] = cache
+
+    def _cache_series(self, attr: str) -> Dict[LabelValues, float]:
+        out: Dict[LabelValues, float] = {}
+        for name, cache in list(self._caches.items()):
+            out[(name,)] = float(len(cache)) if attr == "entries" else float(getattr(cache, attr, 0))
+        return out
+
+    def render(self) -> str:
+        out: List[str] = []
+        for metric in list(self._metrics.values()):
+            metric.render(out)
+        return "\n".join(out) + "\n"
+
+
+REGISTRY = Registry()
+
+_INSTANCE = (os.getenv("WEBSITE_INSTANCE_ID") or os.getenv("HOSTNAME") or "local")[:16]
+
+REGISTRY.register(
+    CallbackMetric(
+        "pulse_worker_info",
+        "gauge",
+        "Worker process serving this scrape (values below are per process).",
+        ("instance", "pid"),
+        lambda: {(_INSTANCE, str(os.getpid())): 1.0},
+    )
+)
+REGISTRY.register(
+    CallbackMetric(
+        "pulse_process_start_time_seconds", "gauge", "Worker process start time (unix seconds).", (),
+        lambda _start=time.time(): {(): _start},
+    )
+)
+
+REQUEST_LATENCY = REGISTRY.register(
+    Histogram("pulse_http_request_duration_seconds", "HTTP request latency by route.", ("route", "method", "status"))
+)
+OPENAI_LATENCY = REGISTRY.register(
+    Histogram("pulse_openai_request_duration_seconds", "Azure OpenAI call latency.", ("deployment", "operation"))
+)
+OPENAI_TOKENS = REGISTRY.register(
+    Counter("pulse_openai_tokens_total", "Azure OpenAI tokens used.", ("deployment", "kind"))
+)
+BLOB_OPS = REGISTRY.register(Counter("pulse_blob_operations_total", "Blob storage operations.", ("route", "op")))
+BLOB_LATENCY = REGISTRY.register(
+    Histogram("pulse_blob_operation_duration_seconds", "Blob storage operation latency.", ("op",))
+)
+DB_LATENCY = REGISTRY.register(
+    Histogram("pulse_db_duration_seconds", "Analytics database latency by phase (connect, query).", ("phase",))
+)
+
+REGISTRY.register(
+    CallbackMetric(
+        "pulse_cache_hits_total", "counter", "In-process cache hits.", ("cache",),
+        lambda: REGISTRY._cache_series("hits"),
+    )
+)
+REGISTRY.register(
+    CallbackMetric(
+        "pulse_cache_misses_total", "counter", "In-process cache misses.", ("cache",),
+        lambda: REGISTRY._cache_series("misses"),
+    )
+)
+REGISTRY.register(
+    CallbackMetric(
+        "pulse_cache_entries", "gauge", "Entries held by in-process caches.", ("cache",),
+        lambda: REGISTRY._cache_series("entries"),
+    )
+)
+
+
+def observe_request(route: str, method: str, status: Optional[int], seconds: float) -> None:
+    REQUEST_LATENCY.labels(route, method or "", str(status) if status is not None else "error").observe(seconds)
+
+
+def observe_openai(
+    deployment: str,
+    operation: str,
+    seconds: float,
+    prompt_tokens: Optional[int] = None,
+    completion_tokens: Optional[int] = None,
+) -> None:
+    OPENAI_LATENCY.labels(deployment, operation).observe(seconds)
+    if prompt_tokens:
+        OPENAI_TOKENS.labels(deployment, "prompt").inc(prompt_tokens)
+    if completion_tokens:
+        OPENAI_TOKENS.labels(deployment, "completion").inc(completion_tokens)
+
+
+def observe_blob_op(op: str, seconds: float, route: Optional[str]) -> None:
+    BLOB_LATENCY.labels(op).observe(seconds)
+    BLOB_OPS.labels(route or "none", op).inc()
+
+
+def render() -> str:
+    return REGISTRY.render()
@@ -12,9 +12,38 @@ import base64
 import json
 import logging
 import os
-from typing import Any, Dict, List, Optional
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-import requests
+from . import media_cache, metrics
+from .http_client import get_session
+from .prompt_registry import get_registry
+from .tracing import span
+
+
+# Runtime persona prompt, resolved through the prompt registry. Admins can
+# override it by creating a prompt with this id; $persona_type and
+# $session_context are substituted per request.
+PERSONA_PROMPT_ID = os.getenv("PULSE_PERSONA_PROMPT_ID", "pulse-persona-conversation")
+
+PERSONA_SYSTEM_PROMPT = """You are an AI customer in a sales training simulation for the PULSE Selling methodology.
+
+You are playing the role of a **$persona_type** customer persona based on the Platinum Rule behavioral styles:
+- **Director**: Direct, results-oriented, impatient, values efficiency and bottom-line results
+- **Relater**: Warm, patient, relationship-focused, values trust and personal connection
+- **Socializer**: Enthusiastic, talkative, optimistic, values recognition and social interaction
+- **Thinker**: Analytical, detail-oriented, cautious, values accuracy and logical reasoning
+
+Stay in character as a $persona_type. Respond naturally to the sales associate's approach.
+- If they're doing well with PULSE methodology, be receptive but still present realistic challenges
+- If they're struggling, present appropriate objections or concerns for your persona type
+- Keep responses concise (1-3 sentences typically) to simulate natural conversation flow
+
+Current context: $session_context
+"""
+
+get_registry().register_default(PERSONA_PROMPT_ID, PERSONA_SYSTEM_PROMPT)
 
 
 def _get_config() -> Dict[str, str]:
@@ -40,6 +69,48 @@ def _validate_config(config: Dict[str, str], required_deployment: str) -> None:
         raise RuntimeError(f"Missing {required_deployment} deployment configuration")
 
 
+@contextmanager
+def _observe_chat(
+    deployment: str, span_name: str = "openai_chat", current: bool = True
+) -> Iterator[Tuple[Any, Dict[str, Any]]]:
+    """Span plus latency/token metrics around one chat call.
+
+    Yields (span, usage); the caller fills `usage` from the response and the
+    token counts are recorded whether or not the call succeeds. `current` is
+    passed to span(); streaming uses False (see tracing.span).
+    """
+    start = time.perf_counter()
+    usage: Dict[str, Any] = {}
+    try:
+        with span(span_name, current=current, deployment=deployment) as sp:
+            yield sp, usage
+            sp.set(prompt_tokens=usage.get("prompt_tokens"), completion_tokens=usage.get("completion_tokens"))
+    finally:
+        metrics.observe_openai(
+            deployment,
+            "chat",
+            time.perf_counter() - start,
+            usage.get("prompt_tokens"),
+            usage.get("completion_tokens"),
+        )
+
+
+def post_chat(
+    url: str,
+    headers: Dict[str, str],
+    payload: Dict[str, Any],
+    deployment: str,
+    timeout: float = 60,
+) -> Dict[str, Any]:
+    """POST a (non-streaming) chat completion request and return the parsed response, traced and metered."""
+    with _observe_chat(deployment) as (_, usage):
+        resp = get_session().post(url, headers=headers, json=payload, timeout=timeout)
+        resp.raise_for_status()
+        result = resp.json()
+        usage.update(result.get("usage") or {})
+    return result
+
+
 def chat_completion(
     messages: List[Dict[str, str]],
     deployment_key: str = "deployment_core_chat",
@@ -83,10 +154,68 @@ def chat_completion(
     
     logging.info("openai_client: calling chat completion on deployment=%s", deployment)
     
-    resp = requests.post(url, headers=headers, json=payload, timeout=60)
-    resp.raise_for_status()
+    return post_chat(url, headers, payload, deployment, timeout=60)
+
+
+def stream_chat_completion(
+    messages: List[Dict[str, str]],
+    deployment_key: str = "deployment_core_chat",
+    temperature: float = 0.7,
+    max_tokens: Optional[int] = None,
+) -> Iterator[str]:
+    """
+    Call Azure OpenAI chat completion with streaming and yield content deltas
+    as they arrive (server-sent events).
+    
+    Token usage is requested with stream_options.include_usage and recorded
+    once the stream ends, the same as chat_completion. Closing the generator
+    early closes the connection.
+    """
+    config = _get_config()
+    _validate_config(config, deployment_key)
+    
+    deployment = config[deployment_key]
+    url = f"{config['endpoint']}/openai/deployments/{deployment}/chat/completions?api-version={config['api_version']}"
+    
+    payload: Dict[str, Any] = {
+        "messages": messages,
+        "temperature": temperature,
+        "stream": True,
+        "stream_options": {"include_usage": True},
+    }
+    if max_tokens:
+        payload["max_tokens"] = max_tokens
+    
+    headers = {
+        "Content-Type": "application/json",
+        "api-key": config["api_key"],
+    }
     
-    return resp.json()
+    logging.info("openai_client: streaming chat completion on deployment=%s", deployment)
+    
+    with _observe_chat(deployment, "openai_chat_stream", current=False) as (sp, usage):
+        start = time.perf_counter()
+        resp = get_session().post(url, headers=headers, json=payload, timeout=60, stream=True)
+        try:
+            resp.raise_for_status()
+            first = True
+            for line in resp.iter_lines():
+                if not line or not line.startswith(b"data:"):
+                    continue
+                data = line[5:].strip()
+                if data == b"[DONE]":
+                    break
+                chunk = json.loads(data)
+                usage.update(chunk.get("usage") or {})
+                for choice in chunk.get("choices") or []:
+                    delta = (choice.get("delta") or {}).get("content")
+                    if delta:
+                        if first:
+                            sp.set(first_token_ms=round((time.perf_counter() - start) * 1000, 1))
+                            first = False
+                        yield delta
+        finally:
+            resp.close()
 
 
 def extract_chat_content(response: Dict[str, Any]) -> str:
@@ -119,11 +248,20 @@ def transcribe_audio(
     
     Returns:
         Transcribed text
+
+    Results are cached by audio content (media_cache.transcripts), so a
+    retried upload of the same bytes is not transcribed again.
     """
     config = _get_config()
     
     # Use Whisper deployment for transcription (not realtime model)
     deployment = os.getenv("OPENAI_DEPLOYMENT_WHISPER", "PULSE-Whisper")
+
+    cache_key = media_cache.transcript_key(audio_data, language, deployment)
+    cached = media_cache.transcripts.get(cache_key)
+    if cached is not None:
+        logging.info("openai_client: transcript cache hit, size=%d bytes", len(audio_data))
+        return cached.decode("utf-8")
     
     # Use the transcription endpoint
     url = f"{config['endpoint']}/openai/deployments/{deployment}/audio/transcriptions?api-version={config['api_version']}"
@@ -143,10 +281,18 @@ def transcribe_audio(
     
     logging.info("openai_client: transcribing audio, size=%d bytes, format=%s", len(audio_data), audio_format)
     
-    resp = requests.post(url, headers=headers, files=files, data=data, timeout=30)
-    resp.raise_for_status()
-    
-    return resp.text.strip()
+    start = time.perf_counter()
+    try:
+        with span("openai_stt", deployment=deployment, bytes=len(audio_data)):
+            resp = get_session().post(url, headers=headers, files=files, data=data, timeout=30)
+            resp.raise_for_status()
+    finally:
+        metrics.observe_openai(deployment, "transcription", time.perf_counter() - start)
+    
+    transcript = resp.text.strip()
+    if transcript:
+        media_cache.transcripts.put(cache_key, transcript.encode("utf-8"))
+    return transcript
 
 
 def generate_speech(
@@ -164,11 +310,19 @@ def generate_speech(
     
     Returns:
         Audio bytes (MP3 format)
+
+    Audio is cached by (deployment, voice, speed, text) in media_cache.speech.
     """
     config = _get_config()
     _validate_config(config, "deployment_audio_realtime")
     
     deployment = config["deployment_audio_realtime"]
+
+    cache_key = media_cache.speech_key(text, voice, speed, deployment)
+    cached = media_cache.speech.get(cache_key)
+    if cached is not None:
+        logging.info("openai_client: speech cache hit, text_length=%d, voice=%s", len(text), voice)
+        return cached
     
     url = f"{config['endpoint']}/openai/deployments/{deployment}/audio/speech?api-version={config['api_version']}"
     
@@ -187,12 +341,37 @@ def generate_speech(
     
     logging.info("openai_client: generating speech, text_length=%d, voice=%s", len(text), voice)
     
-    resp = requests.post(url, headers=headers, json=payload, timeout=60)
-    resp.raise_for_status()
+    start = time.perf_counter()
+    try:
+        with span("openai_tts", deployment=deployment, chars=len(text)):
+            resp = get_session().post(url, headers=headers, json=payload, timeout=60)
+            resp.raise_for_status()
+    finally:
+        metrics.observe_openai(deployment, "speech", time.perf_counter() - start)
     
+    media_cache.speech.put(cache_key, resp.content)
     return resp.content
 
 
+def _conversation_messages(
+    user_message: str,
+    persona_type: str,
+    conversation_history: List[Dict[str, str]],
+    session_context: Optional[Dict[str, Any]],
+) -> List[Dict[str, str]]:
+    system_prompt = get_registry().render(
+        PERSONA_PROMPT_ID,
+        persona_type=persona_type,
+        session_context=json.dumps(session_context or {}, ensure_ascii=False),
+    ) or ""
+    
+    messages = [{"role": "system", "content": system_prompt}]
+    # Stored messages may carry bookkeeping keys (e.g. "interrupted") the API does not accept.
+    messages.extend({"role": m["role"], "content": m["content"]} for m in conversation_history)
+    messages.append({"role": "user", "content": user_message})
+    return messages
+
+
 def generate_conversation_response(
     user_message: str,
     persona_type: str,
@@ -211,25 +390,7 @@ def generate_conversation_response(
     Returns:
         AI response text
     """
-    system_prompt = f"""You are an AI customer in a sales training simulation for the PULSE Selling methodology.
-
-You are playing the role of a **{persona_type}** customer persona based on the Platinum Rule behavioral styles:
-- **Director**: Direct, results-oriented, impatient, values efficiency and bottom-line results
-- **Relater**: Warm, patient, relationship-focused, values trust and personal connection
-- **Socializer**: Enthusiastic, talkative, optimistic, values recognition and social interaction
-- **Thinker**: Analytical, detail-oriented, cautious, values accuracy and logical reasoning
-
-Stay in character as a {persona_type}. Respond naturally to the sales associate's approach.
-- If they're doing well with PULSE methodology, be receptive but still present realistic challenges
-- If they're struggling, present appropriate objections or concerns for your persona type
-- Keep responses concise (1-3 sentences typically) to simulate natural conversation flow
-
-Current context: {json.dumps(session_context or {}, ensure_ascii=False)}
-"""
-    
-    messages = [{"role": "system", "content": system_prompt}]
-    messages.extend(conversation_history)
-    messages.append({"role": "user", "content": user_message})
+    messages = _conversation_messages(user_message, persona_type, conversation_history, session_context)
     
     response = chat_completion(
         messages=messages,
@@ -239,3 +400,23 @@ Current context: {json.dumps(session_context or {}, ensure_ascii=False)}
     )
     
     return extract_chat_content(response)
+
+
+def stream_conversation_response(
+    user_message: str,
+    persona_type: str,
+    conversation_history: List[Dict[str, str]],
+    session_context: Optional[Dict[str, Any]] = None,
+) -> Iterator[str]:
+    """
+    Streaming variant of generate_conversation_response: yields the persona's
+    reply as content deltas, for callers that start work (such as TTS) before
+    the reply is complete.
+    """
+    messages = _conversation_messages(user_message, persona_type, conversation_history, session_context)
+    return stream_chat_completion(
+        messages=messages,
+        deployment_key="deployment_core_chat",
+        temperature=0.8,
+        max_tokens=200,
+    )
@@ -0,0 +1,187 @@
+"""
+In-process registry of runtime prompts.
+
+Request paths resolve prompt ids through the registry instead of reading blob
+storage. Each prompt is compiled once into a PromptTemplate (a
+`string.Template` using `$name` placeholders, so JSON braces in prompt text
+need no escaping) with a precomputed token estimate.
+
+Admin writes record the new version in a small manifest blob
+(`prompt-manifest.json`). A background thread polls the manifest ETag and
+reloads only the prompts whose version changed, so edits made in the Admin UI
+take effect within PROMPT_REGISTRY_POLL_SECONDS without any storage access on
+the request path. Callers register a built-in default for each id they use;
+the default is served until (and unless) an admin-managed prompt with that id
+exists in storage.
+"""
+
+import logging
+import math
+import os
+import threading
+from string import Template
+from typing import Any, Dict, Optional, Set
+
+from .blob import get_blob_etag, now_iso, read_json, update_json
+
+
+_logger = logging.getLogger(__name__)
+
+MANIFEST_PATH = "prompt-manifest.json"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token for English prompt text).
+
+    Good enough for budgeting max_tokens and spotting oversized prompts without
+    pulling a tokenizer into the Function App.
+    """
+    return int(math.ceil(len(text) / 4.0)) if text else 0
+
+
+class PromptTemplate:
+    __slots__ = ("prompt_id", "version", "text", "token_count", "source", "_template", "_static")
+
+    def __init__(self, prompt_id: str, text: str, version: Optional[int], source: str) -> None:
+        self.prompt_id = prompt_id
+        self.version = version
+        self.text = text
+        self.token_count = estimate_tokens(text)
+        self.source = source
+        self._template = Template(text)
+        self._static = not self._template.get_identifiers()
+
+    def render(self, **values: Any) -> str:
+        if self._static:
+            return self.text
+        return self._template.safe_substitute(values)
+
+
+class PromptRegistry:
+    def __init__(self, poll_seconds: float) -> None:
+        self.poll_seconds = poll_seconds
+        self._defaults: Dict[str, PromptTemplate] = {}
+        self._templates: Dict[str, PromptTemplate] = {}
+        self._loaded: Set[str] = set()
+        self._manifest_etag: Optional[str] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def register_default(self, prompt_id: str, text: str) -> None:
+        tmpl = PromptTemplate(prompt_id, text, version=None, source="default")
+        self._defaults[prompt_id] = tmpl
+        self._templates.setdefault(prompt_id, tmpl)
+
+    def get(self, prompt_id: str) -> Optional[PromptTemplate]:
+        self._ensure_polling()
+        if prompt_id not in self._loaded:
+            # First use in this process: one synchronous load, then the poller keeps it fresh.
+            # The id only counts as loaded once the read succeeded, so concurrent first
+            # callers wait on the lock and a failed read is retried on the next get().
+            with self._lock:
+                if prompt_id not in self._loaded and self._load(prompt_id):
+                    self._loaded.add(prompt_id)
+        return self._templates.get(prompt_id)
+
+    def render(self, prompt_id: str, **values: Any) -> Optional[str]:
+        tmpl = self.get(prompt_id)
+        return tmpl.render(**values) if tmpl is not None else None
+
+    def refresh(self) -> bool:
+        """Reload prompts whose manifest version changed. Returns True if the manifest changed."""
+        etag = get_blob_etag(MANIFEST_PATH)
+        if etag is None or etag == self._manifest_etag:
+            return False
+        manifest = read_json(MANIFEST_PATH) or {}
+        versions = manifest.get("prompts") if isinstance(manifest, dict) else None
+        if not isinstance(versions, dict):
+            versions = {}
+        with self._lock:
+            for prompt_id in list(self._loaded):
+                current = self._templates.get(prompt_id)
+                loaded_version = current.version if current is not None else None
+                if versions.get(prompt_id) != loaded_version and not self._load(prompt_id):
+                    # Keep serving the current template; the next get() retries the read.
+                    self._loaded.discard(prompt_id)
+            self._manifest_etag = etag
+        return True
+
+    def _load(self, prompt_id: str) -> bool:
+        """Read one prompt from storage (caller holds the lock). False if the read failed."""
+        try:
+            doc = read_json(f"prompts/{prompt_id}.json")
+        except Exception as exc:  # noqa: BLE001
+            _logger.warning("prompt_registry: failed to load %s: %s", prompt_id, exc)
+            return False
+        content = doc.get("content") if isinstance(doc, dict) else None
+        if isinstance(content, str) and content.strip() and not doc.get("deleted"):
+            try:
+                version: Optional[int] = int(doc.get("version"))
+            except (TypeError, ValueError):
+                version = None
+            tmpl = PromptTemplate(prompt_id, content, version=version, source="blob")
+            self._templates[prompt_id] = tmpl
+            _logger.info(
+                "prompt_registry: loaded %s version=%s tokens~%d", prompt_id, tmpl.version, tmpl.token_count
+            )
+        elif prompt_id in self._defaults:
+            self._templates[prompt_id] = self._defaults[prompt_id]
+        else:
+            self._templates.pop(prompt_id, None)
+        return True
+
+    def _ensure_polling(self) -> None:
+        if self.poll_seconds <= 0 or self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._poll_loop, name="prompt-registry-poll", daemon=True)
+            self._thread.start()
+
+    def _poll_loop(self) -> None:
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                if self.refresh():
+                    _logger.info("prompt_registry: manifest changed, prompts refreshed")
+            except Exception as exc:  # noqa: BLE001
+                _logger.debug("prompt_registry: manifest poll failed: %s", exc)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+_registry: Optional[PromptRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> PromptRegistry:
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = PromptRegistry(float(os.getenv("PROMPT_REGISTRY_POLL_SECONDS", "5")))
+    return _registry
+
+
+def publish_prompt_changes(versions: Dict[str, Any]) -> None:
+    """Record new prompt versions in the manifest so registries reload them.
+
+    Best-effort: a failed manifest write only delays propagation until the next
+    successful publish, so errors are logged rather than raised.
+    """
+    def merge(manifest: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        manifest = manifest or {}
+        prompts = manifest.get("prompts") if isinstance(manifest.get("prompts"), dict) else {}
+        if manifest and all(prompts.get(k) == v for k, v in versions.items()):
+            # Nothing new (e.g. an idempotent re-seed): leave the manifest and its ETag alone.
+            return None
+        prompts.update(versions)
+        return {"prompts": prompts, "updatedAt": now_iso()}
+
+    try:
+        # Conditional merge so concurrent admin writes do not drop each other's versions.
+        update_json(MANIFEST_PATH, merge)
+    except Exception as exc:  # noqa: BLE001
+        _logger.warning("prompt_registry: failed to publish manifest for %s: %s", list(versions), exc)
@@ -0,0 +1,225 @@
+"""
+Prompt version storage for the admin prompt editor.
+
+Every prompt write produces an immutable version document at
+`prompts/{id}/versions/{n}.json`. The summary fields shown in the admin UI
+(version, updatedAt, updatedBy) are also stored as blob metadata on each
+version so the history can be listed from a single blob listing instead of
+downloading every document.
+
+To keep storage linear in the size of the edits, only every Nth version is a
+full snapshot. The versions in between store the prompt fields plus a
+line-level delta of `content` against the most recent snapshot, so any version
+is rebuilt from at most two documents. Rebuilt versions are immutable and kept
+in an in-process LRU. Documents without a `delta` key (including everything
+written before delta encoding) are full snapshots and are read as-is.
+"""
+
+import difflib
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+from . import codec, metrics
+from .blob import list_blobs_with_metadata, read_json, set_blob_metadata, write_json
+from .lru import LRUCache
+
+
+_logger = logging.getLogger(__name__)
+
+_SNAPSHOT_INTERVAL = max(1, int(os.getenv("PROMPT_VERSION_SNAPSHOT_INTERVAL", "10")))
+_version_cache = LRUCache(int(os.getenv("PROMPT_VERSION_CACHE_SIZE", "256")))
+metrics.REGISTRY.register_cache("prompt_versions", _version_cache)
+
+# Blob metadata keys are case-insensitive identifiers; values must be ASCII.
+_META_VERSION = "version"
+_META_UPDATED_AT = "updatedat"
+_META_UPDATED_BY = "updatedby"
+
+
+def version_prefix(prompt_id: str) -> str:
+    return f"prompts/{prompt_id}/versions/"
+
+
+def version_blob(prompt_id: str, version: int) -> str:
+    return f"{version_prefix(prompt_id)}{version}.json"
+
+
+def _version_metadata(doc: Dict[str, Any]) -> Dict[str, str]:
+    meta = {_META_VERSION: str(int(doc.get("version") or 0))}
+    if doc.get("updatedAt"):
+        meta[_META_UPDATED_AT] = quote(str(doc["updatedAt"]), safe="")
+    if doc.get("updatedBy"):
+        meta[_META_UPDATED_BY] = quote(str(doc["updatedBy"]), safe="")
+    return meta
+
+
+def _summary_from_metadata(version: int, meta: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    # Metadata keys may come back with different casing depending on the client.
+    lowered = {k.lower(): v for k, v in meta.items()}
+    if _META_VERSION not in lowered:
+        return None
+    updated_at = lowered.get(_META_UPDATED_AT)
+    updated_by = lowered.get(_META_UPDATED_BY)
+    return {
+        "version": version,
+        "updatedAt": unquote(updated_at) if updated_at else None,
+        "updatedBy": unquote(updated_by) if updated_by else None,
+    }
+
+
+def _parse_version(name: str) -> Optional[int]:
+    # name like prompts/<id>/versions/<ver>.json
+    if not name.endswith(".json"):
+        return None
+    try:
+        return int(name.rsplit("/", 1)[-1][:-5])
+    except ValueError:
+        return None
+
+
+def _snapshot_base(version: int) -> int:
+    return ((version - 1) // _SNAPSHOT_INTERVAL) * _SNAPSHOT_INTERVAL + 1
+
+
+def encode_delta(base: str, target: str) -> List[List[Any]]:
+    """Encode `target` as line operations against `base`.
+
+    Ops: ["=", n] copies n base lines, ["-", n] skips n base lines and
+    ["+", [lines]] inserts new lines.
+    """
+    a = base.splitlines(keepends=True)
+    b = target.splitlines(keepends=True)
+    ops: List[List[Any]] = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag == "equal":
+            ops.append(["=", i2 - i1])
+            continue
+        if i2 > i1:
+            ops.append(["-", i2 - i1])
+        if j2 > j1:
+            ops.append(["+", b[j1:j2]])
+    return ops
+
+
+def apply_delta(base: str, ops: List[List[Any]]) -> str:
+    lines = base.splitlines(keepends=True)
+    out: List[str] = []
+    pos = 0
+    for op, arg in ops:
+        if op == "=":
+            out.extend(lines[pos : pos + arg])
+            pos += arg
+        elif op == "-":
+            pos += arg
+        elif op == "+":
+            out.extend(arg)
+        else:
+            raise ValueError(f"Unknown delta op {op!r}")
+    return "".join(out)
+
+
+def _encode_version(prompt_id: str, doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the stored form of a version: the doc itself or a delta against its snapshot."""
+    version = int(doc.get("version") or 0)
+    content = doc.get("content")
+    base_ver = _snapshot_base(version)
+    if base_ver == version or not isinstance(content, str):
+        return doc
+
+    base_doc = read_json(version_blob(prompt_id, base_ver))
+    if not isinstance(base_doc, dict) or "delta" in base_doc or not isinstance(base_doc.get("content"), str):
+        # Missing base, or the snapshot interval changed since it was written.
+        return doc
+
+    ops = encode_delta(base_doc["content"], content)
+    # Compare encoded sizes: what the blob would actually hold either way.
+    if len(codec.dumps(ops)) >= len(codec.dumps(content)):
+        return doc
+
+    stored = {k: v for k, v in doc.items() if k != "content"}
+    stored["delta"] = {"base": base_ver, "ops": ops}
+    return stored
+
+
+def write_version(prompt_id: str, doc: Dict[str, Any]) -> None:
+    """Persist an immutable version document with its summary metadata."""
+    version = int(doc.get("version") or 0)
+    stored = _encode_version(prompt_id, doc)
+    write_json(version_blob(prompt_id, version), stored, metadata=_version_metadata(doc))
+    _version_cache.put((prompt_id, version), dict(doc))
+
+
+def read_version(prompt_id: str, version: int) -> Optional[Dict[str, Any]]:
+    """Return the full document for a version, rebuilding delta-encoded versions."""
+    key = (prompt_id, version)
+    cached = _version_cache.get(key)
+    if cached is not None:
+        return dict(cached)
+
+    stored = read_json(version_blob(prompt_id, version))
+    if not isinstance(stored, dict):
+        return None
+
+    delta = stored.get("delta")
+    if isinstance(delta, dict):
+        base = read_version(prompt_id, int(delta.get("base") or 0))
+        if base is None or not isinstance(base.get("content"), str):
+            _logger.error("prompt_versions: base snapshot missing for %s version %s", prompt_id, version)
+            return None
+        doc = {k: v for k, v in stored.items() if k != "delta"}
+        doc["content"] = apply_delta(base["content"], delta.get("ops") or [])
+    else:
+        doc = stored
+
+    _version_cache.put(key, doc)
+    return dict(doc)
+
+
+def list_versions(
+    prompt_id: str,
+    limit: Optional[int] = None,
+    before: Optional[int] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    """List version summaries newest-first.
+
+    Returns (items, next_before). `before` excludes versions >= before and
+    `limit` caps the page size; next_before is the cursor for the following
+    page, or None when the history is exhausted.
+
+    Versions written before metadata was recorded are summarized from their
+    document once and the metadata is backfilled, so later listings stay
+    download-free.
+    """
+    entries: List[Tuple[int, str, Dict[str, str]]] = []
+    for name, meta in list_blobs_with_metadata(version_prefix(prompt_id)):
+        ver = _parse_version(name)
+        if ver is None:
+            continue
+        if before is not None and ver >= before:
+            continue
+        entries.append((ver, name, meta))
+
+    entries.sort(key=lambda e: e[0], reverse=True)
+    next_before: Optional[int] = None
+    if limit is not None and len(entries) > limit:
+        entries = entries[:limit]
+        next_before = entries[-1][0]
+
+    items: List[Dict[str, Any]] = []
+    for ver, name, meta in entries:
+        summary = _summary_from_metadata(ver, meta)
+        if summary is None:
+            doc = read_json(name) or {}
+            summary = {
+                "version": ver,
+                "updatedAt": doc.get("updatedAt"),
+                "updatedBy": doc.get("updatedBy"),
+            }
+            try:
+                set_blob_metadata(name, _version_metadata({**doc, "version": ver}))
+            except Exception as exc:  # noqa: BLE001
+                _logger.warning("prompt_versions: failed to backfill metadata for %s: %s", name, exc)
+        items.append(summary)
+    return items, next_before
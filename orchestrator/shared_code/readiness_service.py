@@ -3,8 +3,6 @@ import os
 import uuid
 from typing import Any, Dict, List, Optional
 
-from psycopg.types.json import Json
-
 from . import analytics_db
 
 
@@ -255,7 +253,7 @@ def compute_and_store_user_readiness(user_id: str) -> Optional[Dict[str, Any]]:
                         "readiness_communication": snapshot["readiness_communication"],
                         "readiness_structure": snapshot["readiness_structure"],
                         "readiness_behavioral": snapshot["readiness_behavioral"],
-                        "meta": Json(meta),
+                        "meta": analytics_db.json_param(meta),
                     },
                 )
     except Exception as exc:  # noqa: BLE001
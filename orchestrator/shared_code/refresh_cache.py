@@ -0,0 +1,90 @@
+"""
+Refresh-ahead cache for short-lived credentials (speech tokens, ICE relays).
+
+get(key) returns the cached value while it is fresh. Once the value is
+within `refresh_ahead_s` of expiring, the first caller starts one background
+refresh and everyone keeps getting the current value until the new one
+lands. When there is no usable value (first use, expired, or the last
+refresh failed), callers fetch synchronously, but single-flight: concurrent
+callers for the same key wait for one fetch instead of each making their own.
+
+A fetch returns (value, ttl_seconds), or None on failure; failures are not
+cached, and an unexpired value survives a failed refresh.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from . import metrics
+
+
+REFRESHES = metrics.REGISTRY.register(
+    metrics.Counter(
+        "pulse_credential_refresh_total", "Credential cache fetches by cache, mode and result.", ("cache", "mode", "result")
+    )
+)
+
+Fetch = Callable[[Hashable], Optional[Tuple[Any, float]]]
+
+
+class RefreshAheadCache:
+    def __init__(self, name: str, fetch: Fetch, refresh_ahead_s: float) -> None:
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._fetch = fetch
+        self._refresh_ahead_s = refresh_ahead_s
+        self._entries: Dict[Hashable, Tuple[Any, float]] = {}  # key -> (value, expires_at monotonic)
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """(value, seconds until it expires), or None when no value can be had."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self.hits += 1
+                if entry[1] - now <= self._refresh_ahead_s and key not in self._inflight:
+                    flight = self._inflight[key] = Future()
+                    threading.Thread(
+                        target=self._run, args=(key, flight, "background"), name=f"{self.name}-refresh", daemon=True
+                    ).start()
+                return entry[0], entry[1] - now
+            self.misses += 1
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = Future()
+        if leader:
+            self._run(key, flight, "sync")
+        result = flight.result()
+        if result is None:
+            return None
+        return result[0], result[1] - time.monotonic()
+
+    def _run(self, key: Hashable, flight: Future, mode: str) -> None:
+        result = None
+        try:
+            fetched = self._fetch(key)
+            if fetched is not None:
+                value, ttl = fetched
+                result = (value, time.monotonic() + ttl)
+        except Exception as exc:  # noqa: BLE001
+            logging.warning("refresh_cache: %s fetch failed: %s", self.name, exc)
+        REFRESHES.labels(self.name, mode, "ok" if result is not None else "failed").inc()
+        with self._lock:
+            if result is not None:
+                self._entries[key] = result
+            self._inflight.pop(key, None)
+        flight.set_result(result)
@@ -0,0 +1,259 @@
+"""
+Per-session admission for conversation turns.
+
+Two /audio/chunk invocations for one session that overlap both call the LLM
+with the same history, so the second reply ignores the first exchange and
+we pay for two competing completions. admit() lets one turn per session run
+the LLM at a time. AUDIO_ADMISSION_MODE picks what happens to the others:
+
+- queue     (default) wait in arrival order, then run normally
+- coalesce  wait; whichever request gets the session next answers every
+            transcript queued so far in one LLM call, and the requests it
+            absorbed return without a reply of their own
+- reject    fail fast (429) when a turn is already running
+- off       no admission control
+
+At most AUDIO_ADMISSION_MAX_QUEUE requests (default 2) wait per session;
+further ones are rejected, as are those that wait longer than
+AUDIO_ADMISSION_WAIT_MS (default 30000).
+
+Mutual exclusion is a blob lease on sessions/{id}/admission.lock
+(AUDIO_ADMISSION_LEASE_SECONDS, 15-60, default 60, so a crashed worker
+frees the session on its own). The holder renews it every third of that
+while the turn runs, for at most AUDIO_ADMISSION_MAX_HOLD_SECONDS (default
+300) so a hung turn cannot keep the session forever; waiters poll for it every
+AUDIO_ADMISSION_POLL_MS (default 150). The waiting line is the ETag-guarded
+document sessions/{id}/admission.json. With BLOB_BACKEND=memory both are
+memory_blob's in-process stand-ins.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from . import metrics
+
+
+QUEUE = "queue"
+COALESCE = "coalesce"
+REJECT = "reject"
+OFF = "off"
+
+ADMITTED = "admitted"
+COALESCED = "coalesced"
+REJECTED = "rejected"
+
+ADMISSIONS = metrics.REGISTRY.register(
+    metrics.Counter("pulse_session_admission_total", "Conversation turn admissions by mode and outcome.", ("mode", "status"))
+)
+ADMISSION_WAIT = metrics.REGISTRY.register(
+    metrics.Histogram("pulse_session_admission_wait_seconds", "Time spent waiting for the session.", ("mode",))
+)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def mode() -> str:
+    value = os.getenv("AUDIO_ADMISSION_MODE", QUEUE).strip().lower()
+    return value if value in (QUEUE, COALESCE, REJECT, OFF) else QUEUE
+
+
+class HeldLease:
+    """A blob lease plus the daemon thread that renews it until release()."""
+
+    def __init__(self, lease: Any, session_id: str, interval_s: float, max_hold_s: float) -> None:
+        self.lease = lease
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._renew, args=(session_id, interval_s, max_hold_s), name="admission-lease", daemon=True
+        )
+        self._thread.start()
+
+    def _renew(self, session_id: str, interval_s: float, max_hold_s: float) -> None:
+        deadline = time.monotonic() + max_hold_s
+        while not self._stop.wait(interval_s):
+            if time.monotonic() >= deadline:
+                logging.warning("session_admission: turn for %s held the session too long; letting the lease lapse", session_id)
+                return
+            try:
+                self.lease.renew()
+            except Exception as exc:  # noqa: BLE001
+                logging.warning("session_admission: lease renewal failed for %s: %s", session_id, exc)
+                return
+
+    def release(self) -> None:
+        self._stop.set()
+        self.lease.release()
+
+
+class BlobLeaseBackend:
+    """Blob lease as the lock, an ETag-guarded JSON document as the queue.
+
+    With BLOB_BACKEND=memory the leases are memory_blob's in-process stand-in,
+    which excludes requests served by this process only.
+    """
+
+    @staticmethod
+    def _lease_seconds() -> int:
+        return min(60, max(15, _env_int("AUDIO_ADMISSION_LEASE_SECONDS", 60)))
+
+    @staticmethod
+    def _max_hold_seconds() -> float:
+        return float(_env_int("AUDIO_ADMISSION_MAX_HOLD_SECONDS", 300))
+
+    def try_lock(self, session_id: str) -> Optional[HeldLease]:
+        from azure.core.exceptions import HttpResponseError, ResourceExistsError, ResourceNotFoundError
+
+        from .blob import get_container_client
+
+        bc = get_container_client().get_blob_client(f"sessions/{session_id}/admission.lock")
+        for attempt in range(2):
+            try:
+                lease_s = self._lease_seconds()
+                lease = bc.acquire_lease(lease_duration=lease_s)
+                return HeldLease(lease, session_id, lease_s / 3.0, self._max_hold_seconds())
+            except ResourceNotFoundError:
+                if attempt:
+                    raise
+                try:
+                    bc.upload_blob(b"", overwrite=False)
+                except ResourceExistsError:
+                    pass  # created by a concurrent request
+            except HttpResponseError:
+                # 409 LeaseAlreadyPresent: another request holds the session.
+                return None
+        return None
+
+    def unlock(self, session_id: str, token: Any) -> None:
+        try:
+            token.release()
+        except Exception as exc:  # noqa: BLE001
+            logging.warning("session_admission: lease release failed for %s (expires on its own): %s", session_id, exc)
+
+    def update(self, session_id: str, mutate: Callable[[Optional[Dict[str, Any]]], Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+        from .blob import update_json
+
+        return update_json(f"sessions/{session_id}/admission.json", mutate) or {}
+
+
+def _live(waiting: List[Dict[str, Any]], now: float, wait_s: float) -> List[Dict[str, Any]]:
+    # Entries from requests that died while waiting stop counting once they are older than any wait could be.
+    return [w for w in waiting if now - w["at"] <= wait_s + 5]
+
+
+def admit(session_id: str, transcript: str, backend: Any = None) -> Dict[str, Any]:
+    """
+    Wait for the session according to the admission mode.
+
+    Returns {"status", "transcript", "merged", "waited_ms", "reason", ...}.
+    status is admitted (run the turn with "transcript", then call release()),
+    coalesced (another request answered this transcript) or rejected
+    (reason: busy, queue_full or timeout).
+    """
+    current_mode = mode()
+    result: Dict[str, Any] = {"status": ADMITTED, "transcript": transcript, "merged": 1, "waited_ms": 0, "reason": None}
+    if current_mode == OFF:
+        ADMISSIONS.labels(current_mode, ADMITTED).inc()
+        return result
+    backend = backend or BlobLeaseBackend()
+    result.update(session_id=session_id, backend=backend, token=None)
+    start = time.monotonic()
+
+    def finish(status: str, reason: Optional[str] = None, **extra: Any) -> Dict[str, Any]:
+        waited = time.monotonic() - start
+        ADMISSIONS.labels(current_mode, status).inc()
+        ADMISSION_WAIT.labels(current_mode).observe(waited)
+        result.update(status=status, reason=reason, waited_ms=round(waited * 1000), **extra)
+        return result
+
+    wait_s = _env_int("AUDIO_ADMISSION_WAIT_MS", 30000) / 1000.0
+    max_queue = _env_int("AUDIO_ADMISSION_MAX_QUEUE", 2)
+    poll_s = _env_int("AUDIO_ADMISSION_POLL_MS", 150) / 1000.0
+    token = backend.try_lock(session_id)
+    if token is not None and current_mode == QUEUE:
+        if _live(backend.update(session_id, lambda d: None).get("waiting") or [], time.time(), wait_s):
+            backend.unlock(session_id, token)  # others are already waiting: no overtaking
+            token = None
+    if token is not None and current_mode != COALESCE:
+        return finish(ADMITTED, token=token)
+    if token is None and current_mode == REJECT:
+        return finish(REJECTED, "busy")
+
+    joined: Dict[str, Any] = {}
+
+    def join(doc: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        doc = doc or {}
+        waiting = _live(doc.get("waiting") or [], time.time(), wait_s)
+        ticket = doc.get("next", 0)
+        joined["ticket"], joined["full"] = ticket, token is None and len(waiting) >= max_queue
+        if not joined["full"]:
+            waiting.append({"ticket": ticket, "text": transcript, "at": time.time()})
+        return dict(doc, next=ticket + 1, waiting=waiting)
+
+    backend.update(session_id, join)
+    if joined["full"]:
+        return finish(REJECTED, "queue_full")
+    ticket = joined["ticket"]
+
+    while True:
+        if token is None:
+            doc = backend.update(session_id, lambda d: None)
+            absorbed_by = (doc.get("absorbed") or {}).get(str(ticket))
+            if absorbed_by is not None:
+                backend.update(session_id, lambda d: dict(d, absorbed={
+                    k: v for k, v in ((d or {}).get("absorbed") or {}).items() if k != str(ticket)
+                }))
+                return finish(COALESCED, merged_into=absorbed_by)
+            waiting = _live(doc.get("waiting") or [], time.time(), wait_s)
+            if not waiting or waiting[0]["ticket"] == ticket or current_mode == COALESCE:
+                token = backend.try_lock(session_id)
+        if token is not None:
+            taken: Dict[str, Any] = {}
+
+            def take(d: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+                d = d or {}
+                if str(ticket) in (d.get("absorbed") or {}):
+                    # Answered by the previous holder between our last poll and the lock.
+                    taken["absorbed_by"] = d["absorbed"][str(ticket)]
+                    return dict(d, absorbed={k: v for k, v in d["absorbed"].items() if k != str(ticket)})
+                waiting = d.get("waiting") or []
+                mine = [w for w in waiting if w["ticket"] == ticket]
+                if current_mode == COALESCE:
+                    mine = sorted(_live(waiting, time.time(), wait_s), key=lambda w: w["ticket"])
+                    mine = mine or [{"ticket": ticket, "text": transcript}]
+                absorbed = dict(d.get("absorbed") or {})
+                for w in mine:
+                    if w["ticket"] != ticket:
+                        absorbed[str(w["ticket"])] = ticket
+                taken["entries"] = mine
+                ids = {w["ticket"] for w in mine} | {ticket}
+                return dict(d, waiting=[w for w in waiting if w["ticket"] not in ids], absorbed=absorbed)
+
+            backend.update(session_id, take)
+            if "absorbed_by" in taken:
+                backend.unlock(session_id, token)
+                return finish(COALESCED, merged_into=taken["absorbed_by"])
+            entries = taken["entries"] or [{"ticket": ticket, "text": transcript}]
+            merged_text = " ".join(w["text"].strip() for w in entries if w["text"].strip())
+            return finish(ADMITTED, token=token, transcript=merged_text or transcript, merged=len(entries))
+        if time.monotonic() - start > wait_s:
+            backend.update(session_id, lambda d: dict(d or {}, waiting=[
+                w for w in ((d or {}).get("waiting") or []) if w["ticket"] != ticket
+            ]))
+            return finish(REJECTED, "timeout")
+        time.sleep(poll_s)
+
+
+def release(admission: Optional[Dict[str, Any]]) -> None:
+    """Give the session back; safe to call more than once."""
+    if not admission or admission.get("token") is None:
+        return
+    token, admission["token"] = admission["token"], None
+    admission["backend"].unlock(admission["session_id"], token)
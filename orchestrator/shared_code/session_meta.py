@@ -0,0 +1,127 @@
+"""
+Session metadata without a storage read per request.
+
+/audio/chunk only needs a session's persona, and a voice session sends many
+chunks a minute. get_session_meta() answers from, in order:
+
+1. a signed session token issued by /session/start (sessionToken form field
+   or X-Session-Token header): HMAC-SHA256 over the session id, persona and
+   expiry with SESSION_TOKEN_SECRET, so any instance can trust it without
+   storage; tokens are only issued when the secret is set
+2. an in-process LRU (SESSION_META_CACHE_SIZE, default 4096) filled by
+   session_start, session_complete and storage reads
+3. sessions/{id}/session.json, whose metadata is then cached
+
+The persona never changes after start, so cached entries cannot go stale on
+it; status is refreshed by session_complete on the instance that serves it.
+Lookups are counted by source in pulse_session_meta_lookups_total.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+from . import metrics
+from .lru import LRUCache
+
+
+META_FIELDS = ("persona", "status", "user_id")
+
+LOOKUPS = metrics.REGISTRY.register(
+    metrics.Counter(
+        "pulse_session_meta_lookups_total", "Session metadata lookups by the source that answered.", ("source",)
+    )
+)
+
+_cache = LRUCache(int(os.getenv("SESSION_META_CACHE_SIZE", "4096")))
+metrics.REGISTRY.register_cache("session_meta", _cache)
+
+
+def _meta(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {field: doc.get(field) for field in META_FIELDS if doc.get(field) is not None}
+
+
+def remember(session_id: str, doc: Dict[str, Any]) -> None:
+    """Cache the metadata of a session document that was just written or read."""
+    _cache.put(session_id, _meta(doc))
+
+
+def _secret() -> bytes:
+    return os.getenv("SESSION_TOKEN_SECRET", "").encode("utf-8")
+
+
+def tokens_enabled() -> bool:
+    """True when session tokens are issued, so endpoints can require one."""
+    return bool(_secret())
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def issue_token(session_id: str, doc: Dict[str, Any]) -> Optional[str]:
+    """Signed token carrying the session's persona; None when no secret is configured."""
+    secret = _secret()
+    if not secret:
+        return None
+    ttl = int(os.getenv("SESSION_TOKEN_TTL_SECONDS", str(8 * 3600)))
+    payload = {"sid": session_id, "persona": doc.get("persona"), "exp": int(time.time()) + ttl}
+    body = _b64(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+    signature = _b64(hmac.new(secret, body.encode("ascii"), hashlib.sha256).digest())
+    return f"{body}.{signature}"
+
+
+def verify_token(token: Optional[str], session_id: str) -> Optional[Dict[str, Any]]:
+    """Metadata from a valid, unexpired token for this session, else None."""
+    secret = _secret()
+    if not token or not secret or "." not in token:
+        return None
+    body, _, signature = token.partition(".")
+    try:
+        expected = _b64(hmac.new(secret, body.encode("ascii"), hashlib.sha256).digest())
+    except UnicodeError:  # client-supplied header: never let it raise
+        return None
+    if not hmac.compare_digest(expected.encode("ascii"), signature.encode("utf-8")):
+        logging.warning("session_meta: session token with a bad signature for session=%s", session_id)
+        return None
+    try:
+        payload = json.loads(_unb64(body))
+    except ValueError:  # includes binascii.Error and UnicodeDecodeError
+        return None
+    if not isinstance(payload, dict):
+        return None
+    exp = payload.get("exp")
+    if payload.get("sid") != session_id or not isinstance(exp, (int, float)) or exp < time.time():
+        return None
+    return {"persona": payload.get("persona")} if payload.get("persona") else None
+
+
+def get_session_meta(session_id: str, token: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Persona (and status/user_id when known) for a session; None when it does not exist."""
+    meta = verify_token(token, session_id)
+    if meta is not None:
+        LOOKUPS.labels("token").inc()
+        return meta
+    meta = _cache.get(session_id)
+    if meta is not None:
+        LOOKUPS.labels("memory").inc()
+        return meta
+
+    from .blob import read_json
+
+    doc = read_json(f"sessions/{session_id}/session.json")
+    if not doc:
+        LOOKUPS.labels("missing").inc()
+        return None
+    LOOKUPS.labels("storage").inc()
+    remember(session_id, doc)
+    return _meta(doc)
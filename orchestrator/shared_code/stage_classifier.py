@@ -0,0 +1,241 @@
+"""
+Local PULSE stage classifier: hashed n-gram features and a linear model.
+
+Sits between the regex rules in chat._analyze_pulse_stage_quick and the
+LLM-based pulse-stage-detector prompt. Each trainee message is reduced to a
+set of hashed word 1-3-grams (CRC32 into N_FEATURES buckets, plus a bias
+bucket). The model is a (N_FEATURES, 5) weight matrix trained one-vs-rest,
+so one message scores all five stages with a single gather-and-sum, and a
+whole transcript is scored with one np.add.reduceat over the concatenated
+feature indices. A message can exhibit more than one stage (a Link that
+closes with an Earn question), so each stage has its own sigmoid and
+threshold; no stage above threshold means small talk.
+
+numpy is an optional dependency. Without it, or without a model artifact,
+get_classifier() returns None and callers keep the regex rules. The default
+artifact is shared_code/models/pulse_stage_classifier.npz, produced by
+scripts/train_stage_classifier.py; STAGE_CLASSIFIER_MODEL points elsewhere.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+try:  # optional dependency
+    import numpy as np  # type: ignore
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None  # type: ignore
+
+
+_logger = logging.getLogger(__name__)
+
+STAGES = (1, 2, 3, 4, 5)
+N_FEATURES = 1 << 12
+NGRAM_RANGE = (1, 3)
+DEFAULT_THRESHOLD = 0.5
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "pulse_stage_classifier.npz")
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+|\?")
+_BIAS = 0
+
+
+def available() -> bool:
+    return np is not None
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def featurize(text: str, n_features: int = N_FEATURES, ngram_range: Sequence[int] = NGRAM_RANGE) -> List[int]:
+    """Sorted, de-duplicated hashed n-gram buckets for `text`; bucket 0 is the bias and always present."""
+    tokens = tokenize(text)
+    low, high = ngram_range
+    buckets = {_BIAS}
+    for n in range(low, high + 1):
+        for i in range(len(tokens) - n + 1):
+            gram = " ".join(tokens[i:i + n])
+            buckets.add(1 + zlib.crc32(gram.encode("utf-8")) % (n_features - 1))
+    return sorted(buckets)
+
+
+class StageClassifier:
+    """One-vs-rest logistic model over hashed n-grams. Requires numpy."""
+
+    def __init__(
+        self,
+        weights: Any,
+        thresholds: Optional[Sequence[float]] = None,
+        ngram_range: Sequence[int] = NGRAM_RANGE,
+        meta: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        if np is None:
+            raise RuntimeError("numpy is required for StageClassifier")
+        self.weights = np.ascontiguousarray(weights, dtype=np.float32)
+        if self.weights.ndim != 2 or self.weights.shape[1] != len(STAGES):
+            raise ValueError(f"weights must have shape (n_features, {len(STAGES)}), got {self.weights.shape}")
+        self.n_features = int(self.weights.shape[0])
+        self.thresholds = np.asarray(
+            thresholds if thresholds is not None else [DEFAULT_THRESHOLD] * len(STAGES), dtype=np.float32
+        )
+        self.ngram_range = (int(ngram_range[0]), int(ngram_range[1]))
+        self.meta = dict(meta or {})
+
+    # ------------------------------------------------------------------ scoring
+
+    def featurize(self, text: str) -> List[int]:
+        return featurize(text, self.n_features, self.ngram_range)
+
+    def scores(self, text: str) -> Any:
+        """Probabilities for stages 1-5, shape (5,)."""
+        logits = self.weights[self.featurize(text)].sum(axis=0)
+        return 1.0 / (1.0 + np.exp(-logits))
+
+    def scores_batch(self, texts: Sequence[str]) -> Any:
+        """Probabilities for many messages at once, shape (len(texts), 5)."""
+        if not texts:
+            return np.zeros((0, len(STAGES)), dtype=np.float32)
+        rows = [self.featurize(text) for text in texts]
+        offsets = np.zeros(len(rows), dtype=np.intp)
+        np.cumsum([len(r) for r in rows[:-1]], out=offsets[1:])
+        indices = np.fromiter((i for r in rows for i in r), dtype=np.intp)
+        # Every row holds the bias bucket, so no reduceat segment is empty.
+        logits = np.add.reduceat(self.weights[indices], offsets, axis=0)
+        return 1.0 / (1.0 + np.exp(-logits))
+
+    def predict(self, text: str) -> List[int]:
+        """Stages whose probability clears their threshold."""
+        return [stage for stage, hit in zip(STAGES, self.scores(text) >= self.thresholds) if hit]
+
+    def predict_batch(self, texts: Sequence[str]) -> List[List[int]]:
+        hits = self.scores_batch(texts) >= self.thresholds
+        return [[stage for stage, hit in zip(STAGES, row) if hit] for row in hits]
+
+    def score_transcript(self, messages: Iterable[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """Score every trainee ("user") message of a chat transcript in one batch."""
+        positions, texts = [], []
+        for index, message in enumerate(messages):
+            if message.get("role") == "user" and isinstance(message.get("content"), str):
+                positions.append(index)
+                texts.append(message["content"])
+        probs = self.scores_batch(texts)
+        hits = probs >= self.thresholds
+        return [
+            {
+                "index": position,
+                "scores": {stage: round(float(p), 4) for stage, p in zip(STAGES, row)},
+                "stages": [stage for stage, hit in zip(STAGES, hit_row) if hit],
+            }
+            for position, row, hit_row in zip(positions, probs, hits)
+        ]
+
+    # ------------------------------------------------------------------ training
+
+    @classmethod
+    def fit(
+        cls,
+        texts: Sequence[str],
+        labels: Sequence[Iterable[int]],
+        n_features: int = N_FEATURES,
+        ngram_range: Sequence[int] = NGRAM_RANGE,
+        epochs: int = 300,
+        learning_rate: float = 0.05,
+        l2: float = 1e-4,
+        meta: Optional[Dict[str, Any]] = None,
+    ) -> "StageClassifier":
+        """
+        Full-batch gradient descent on the logistic loss, one column per stage.
+        The design matrix stays sparse: forward and backward passes work on
+        the concatenated bucket indices, so memory is O(total n-grams).
+        """
+        if np is None:
+            raise RuntimeError("numpy is required to train StageClassifier")
+        rows = [featurize(text, n_features, ngram_range) for text in texts]
+        lengths = np.fromiter((len(r) for r in rows), dtype=np.intp, count=len(rows))
+        offsets = np.zeros(len(rows), dtype=np.intp)
+        np.cumsum(lengths[:-1], out=offsets[1:])
+        indices = np.fromiter((i for r in rows for i in r), dtype=np.intp)
+        row_of = np.repeat(np.arange(len(rows)), lengths)
+
+        targets = np.zeros((len(rows), len(STAGES)), dtype=np.float32)
+        for r, stages in enumerate(labels):
+            for stage in stages:
+                targets[r, stage - 1] = 1.0
+
+        weights = np.zeros((n_features, len(STAGES)), dtype=np.float32)
+        # Adam keeps rare n-grams learning at the same pace as frequent ones.
+        m = np.zeros_like(weights)
+        v = np.zeros_like(weights)
+        beta1, beta2, eps = 0.9, 0.999, 1e-8
+        for step in range(1, epochs + 1):
+            logits = np.add.reduceat(weights[indices], offsets, axis=0)
+            errors = (1.0 / (1.0 + np.exp(-logits)) - targets) / len(rows)
+            grad = np.zeros_like(weights)
+            np.add.at(grad, indices, errors[row_of])
+            grad += l2 * weights
+            m = beta1 * m + (1 - beta1) * grad
+            v = beta2 * v + (1 - beta2) * grad * grad
+            m_hat = m / (1 - beta1 ** step)
+            v_hat = v / (1 - beta2 ** step)
+            weights -= learning_rate * m_hat / (np.sqrt(v_hat) + eps)
+
+        info = {"examples": len(rows), "epochs": epochs, "l2": l2}
+        info.update(meta or {})
+        return cls(weights, ngram_range=ngram_range, meta=info)
+
+    # ------------------------------------------------------------------ persistence
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "wb") as fh:
+            np.savez_compressed(
+                fh,
+                weights=self.weights.astype(np.float16),
+                thresholds=self.thresholds,
+                ngram_range=np.asarray(self.ngram_range, dtype=np.int32),
+                meta=np.asarray(json.dumps(self.meta, sort_keys=True)),
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "StageClassifier":
+        if np is None:
+            raise RuntimeError("numpy is required to load StageClassifier")
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"])) if "meta" in data else {}
+            meta["source"] = path
+            return cls(
+                data["weights"].astype(np.float32),
+                thresholds=data["thresholds"].tolist(),
+                ngram_range=data["ngram_range"].tolist(),
+                meta=meta,
+            )
+
+
+_classifier: Optional[StageClassifier] = None
+_classifier_loaded = False
+_classifier_lock = threading.Lock()
+
+
+def get_classifier() -> Optional[StageClassifier]:
+    """The process-wide classifier, loaded once; None when numpy or the artifact is missing."""
+    global _classifier, _classifier_loaded
+    if _classifier_loaded:
+        return _classifier
+    with _classifier_lock:
+        if not _classifier_loaded:
+            path = os.getenv("STAGE_CLASSIFIER_MODEL", DEFAULT_MODEL_PATH)
+            if np is None:
+                _logger.warning("stage_classifier: numpy not installed; using regex stage detection only")
+            elif not os.path.exists(path):
+                _logger.warning("stage_classifier: model %s not found; using regex stage detection only", path)
+            else:
+                try:
+                    _classifier = StageClassifier.load(path)
+                except Exception as exc:  # noqa: BLE001
+                    _logger.warning("stage_classifier: failed to load %s: %s", path, exc)
+            _classifier_loaded = True
+    return _classifier
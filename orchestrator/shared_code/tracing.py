@@ -0,0 +1,205 @@
+"""
+Lightweight in-process request tracing.
+
+Each HTTP endpoint's `main` is wrapped with `@traced("<route>")`, which opens a
+trace for the invocation. Code on the request path (shared_code I/O helpers,
+OpenAI calls, rule analysis) wraps its phases in `with span("name"):`; spans
+nest through a context variable, so they record their parent without any
+state being threaded through call signatures.
+
+When the request finishes the trace is turned into:
+- a `Server-Timing` response header, with total duration per span name
+  (visible in browser devtools next to the network timings),
+- an `X-Correlation-Id` response header, taken from the incoming
+  `X-Correlation-Id`/`X-Request-Id` header when present,
+- one structured log record (`request_trace`) with every span, carried both
+  in the message (JSON) and in `extra` so Application Insights indexes the
+  fields as custom dimensions.
+
+Outside a trace (scripts, unit tests calling helpers directly) `span` is a
+near no-op.
+"""
+
+import contextvars
+import functools
+import itertools
+import logging
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from . import codec, metrics
+
+
+_logger = logging.getLogger(__name__)
+
+_CORRELATION_HEADERS = ("x-correlation-id", "x-request-id")
+_VALID_CORRELATION_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+
+class Span:
+    __slots__ = ("span_id", "name", "parent_id", "start", "end", "attrs")
+
+    def __init__(self, span_id: int, name: str, parent_id: Optional[int], attrs: Dict[str, Any]) -> None:
+        self.span_id = span_id
+        self.name = name
+        self.parent_id = parent_id
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.attrs = attrs
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000.0
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+
+class Trace:
+    __slots__ = ("correlation_id", "route", "start", "spans", "_ids")
+
+    def __init__(self, correlation_id: str, route: str) -> None:
+        self.correlation_id = correlation_id
+        self.route = route
+        self.start = time.perf_counter()
+        self.spans: List[Span] = []
+        self._ids = itertools.count(1)  # next() is atomic, so spans opened from worker threads get distinct ids
+
+    def next_span_id(self) -> int:
+        return next(self._ids)
+
+    def server_timing(self, total_ms: float) -> str:
+        totals: Dict[str, float] = {}
+        for s in self.spans:
+            totals[s.name] = totals.get(s.name, 0.0) + s.duration_ms
+        parts = [f"{name};dur={ms:.1f}" for name, ms in totals.items()]
+        parts.append(f"total;dur={total_ms:.1f}")
+        return ", ".join(parts)
+
+    def to_record(self, status: Optional[int], method: str, total_ms: float) -> Dict[str, Any]:
+        return {
+            "correlationId": self.correlation_id,
+            "route": self.route,
+            "method": method,
+            "status": status,
+            "durationMs": round(total_ms, 2),
+            "spans": [
+                {
+                    "id": s.span_id,
+                    "parent": s.parent_id,
+                    "name": s.name,
+                    "offsetMs": round((s.start - self.start) * 1000.0, 2),
+                    "durationMs": round(s.duration_ms, 2),
+                    **s.attrs,
+                }
+                for s in self.spans
+            ],
+        }
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("pulse_trace", default=None)
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("pulse_span", default=None)
+
+
+@contextmanager
+def span(name: str, current: bool = True, **attrs: Any) -> Iterator[Any]:
+    """Time a phase of the current request. Yields the span so callers can add attributes.
+
+    current=False records the span without making it the parent of spans
+    opened inside it. Generators that yield while a span is open need this:
+    their body runs in the caller's context, so the span would otherwise
+    become the parent of whatever the caller does between items.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield _NOOP_SPAN
+        return
+    parent = _current_span.get()
+    s = Span(trace.next_span_id(), name, parent.span_id if parent is not None else None, attrs)
+    trace.spans.append(s)
+    token = _current_span.set(s) if current else None
+    try:
+        yield s
+    except BaseException as exc:
+        s.attrs["error"] = type(exc).__name__
+        raise
+    finally:
+        s.end = time.perf_counter()
+        if token is not None:
+            _current_span.reset(token)
+
+
+def current_correlation_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.correlation_id if trace is not None else None
+
+
+def current_route() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.route if trace is not None else None
+
+
+def _correlation_id_from(req: Any) -> str:
+    headers = getattr(req, "headers", None) or {}
+    for header in _CORRELATION_HEADERS:
+        value = headers.get(header)
+        if value and _VALID_CORRELATION_ID.match(value):
+            return value
+    return uuid.uuid4().hex
+
+
+def traced(route: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Decorate an HTTP function's `main(req)` to trace the invocation."""
+
+    def decorator(fn: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(fn)
+        def wrapper(req: Any, *args: Any, **kwargs: Any) -> Any:
+            trace = Trace(_correlation_id_from(req), route)
+            trace_token = _current_trace.set(trace)
+            span_token = _current_span.set(None)
+            resp = None
+            try:
+                resp = fn(req, *args, **kwargs)
+                return resp
+            finally:
+                _current_span.reset(span_token)
+                _current_trace.reset(trace_token)
+                _finish(trace, req, resp)
+
+        return wrapper
+
+    return decorator
+
+
+def _finish(trace: Trace, req: Any, resp: Any) -> None:
+    total_ms = (time.perf_counter() - trace.start) * 1000.0
+    status = getattr(resp, "status_code", None)
+    method = getattr(req, "method", "") or ""
+    metrics.observe_request(trace.route, method, status, total_ms / 1000.0)
+    headers = getattr(resp, "headers", None)
+    if headers is not None:
+        headers["Server-Timing"] = trace.server_timing(total_ms)
+        headers["X-Correlation-Id"] = trace.correlation_id
+        headers["Timing-Allow-Origin"] = "*"
+        headers["Access-Control-Expose-Headers"] = "Server-Timing, X-Correlation-Id"
+    record = trace.to_record(status, method, total_ms)
+    try:
+        _logger.info(
+            "request_trace %s",
+            codec.dumps(record).decode("utf-8"),
+            extra={"custom_dimensions": record},
+        )
+    except Exception as exc:  # noqa: BLE001
+        _logger.debug("tracing: failed to log trace for %s: %s", trace.route, exc)
@@ -0,0 +1,363 @@
+"""
+Server-side utterance assembly for streamed audio chunks.
+
+Clients that stream short chunks send `final=false` with each one and
+`final=true` with the last (the chunk may be empty). Chunks are buffered per
+session and the utterance is released for transcription when:
+
+- the client signals the end (final=true),
+- trailing silence reaches AUDIO_UTTERANCE_END_SILENCE_MS (default 800):
+  chunks the VAD gate rejects count as silence once the buffer holds speech
+  (WAV/PCM only; webm/ogg fragments cannot be gated one by one, so they all
+  count as speech and the assembled utterance is gated instead),
+- the previous chunk is older than AUDIO_UTTERANCE_STALE_MS (default 8000):
+  the buffered utterance is released and the new chunk starts the next one,
+- the buffer exceeds AUDIO_UTTERANCE_MAX_MS / AUDIO_UTTERANCE_MAX_BYTES.
+
+One Whisper call per utterance instead of one per chunk is cheaper and gives
+Whisper the whole sentence as context.
+
+Assembly by format:
+- WAV: PCM payloads are concatenated and re-wrapped (chunks with a different
+  sample rate or channel count than the first are dropped).
+- raw PCM: concatenated.
+- webm/ogg: MediaRecorder timeslice fragments of one recording, where only
+  the first fragment carries the container header. The header (everything
+  before the first Cluster) is remembered per session and prepended to later
+  utterances that start mid-stream, so every released utterance decodes on
+  its own. A fragment that starts with a new header begins a new recording.
+
+Storage is selected with AUDIO_UTTERANCE_STORE: "blob" (default; works across
+scaled-out instances) keeps the state document at
+sessions/{id}/utterance.json and chunk bytes beside it; "memory" keeps
+everything in this process (single instance, local runs, tests).
+"""
+
+import io
+import logging
+import os
+import threading
+import time
+import uuid
+import wave
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import vad
+from .lru import LRUCache
+
+
+_WEBM_MAGIC = b"\x1a\x45\xdf\xa3"
+_WEBM_CLUSTER = b"\x1f\x43\xb6\x75"
+
+Chunk = Tuple[bytes, Dict[str, Any]]
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _config() -> Dict[str, float]:
+    return {
+        "end_silence_ms": _env_float("AUDIO_UTTERANCE_END_SILENCE_MS", 800),
+        "stale_ms": _env_float("AUDIO_UTTERANCE_STALE_MS", 8000),
+        "max_ms": _env_float("AUDIO_UTTERANCE_MAX_MS", 30000),
+        "max_bytes": _env_float("AUDIO_UTTERANCE_MAX_BYTES", 8 * 1024 * 1024),
+    }
+
+
+def _empty_state() -> Dict[str, Any]:
+    return {
+        "utterance_id": uuid.uuid4().hex,
+        "chunks": [],
+        "bytes": 0,
+        "duration_ms": 0.0,
+        "speech_ms": 0.0,
+        "trailing_silence_ms": 0.0,
+        "started_at": None,
+        "last_chunk_at": None,
+    }
+
+
+def _add_chunk(state: Dict[str, Any], meta: Dict[str, Any]) -> Dict[str, Any]:
+    state = dict(state)
+    state["chunks"] = list(state.get("chunks") or []) + [meta]
+    state["bytes"] = state.get("bytes", 0) + meta["bytes"]
+    state["duration_ms"] = state.get("duration_ms", 0.0) + (meta.get("duration_ms") or 0.0)
+    if meta["speech"]:
+        state["speech_ms"] = state.get("speech_ms", 0.0) + (meta.get("duration_ms") or 0.0)
+        state["trailing_silence_ms"] = 0.0
+    else:
+        state["trailing_silence_ms"] = state.get("trailing_silence_ms", 0.0) + (meta.get("duration_ms") or 0.0)
+    state["started_at"] = state.get("started_at") or meta["received_at"]
+    state["last_chunk_at"] = meta["received_at"]
+    return state
+
+
+def summary(state: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    state = state or _empty_state()
+    chunks = state.get("chunks") or []
+    return {
+        "utteranceId": state.get("utterance_id"),
+        "chunks": len(chunks),
+        "bytes": state.get("bytes", 0),
+        "durationMs": round(state.get("duration_ms", 0.0)),
+        "hasSpeech": any(c.get("speech") for c in chunks),
+        "trailingSilenceMs": round(state.get("trailing_silence_ms", 0.0)),
+    }
+
+
+class MemoryUtteranceStore:
+    """In-process buffers; only correct when one instance serves the session.
+
+    A recording's webm header has to outlive the utterance it arrived with
+    (later utterances of the same recording need it), and nothing tells the
+    server when a recording ends, so headers are kept for the most recent
+    AUDIO_UTTERANCE_HEADER_CACHE_SIZE sessions (default 1024).
+    """
+
+    def __init__(self) -> None:
+        self._states: Dict[str, Dict[str, Any]] = {}
+        self._data: Dict[str, List[bytes]] = {}
+        self._headers = LRUCache(int(_env_float("AUDIO_UTTERANCE_HEADER_CACHE_SIZE", 1024)))
+        self._lock = threading.Lock()
+
+    def peek(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._states.get(session_id)
+
+    def append(self, session_id: str, data: bytes, meta: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            state = _add_chunk(self._states.get(session_id) or _empty_state(), meta)
+            self._states[session_id] = state
+            self._data.setdefault(session_id, []).append(data)
+            return state
+
+    def take(self, session_id: str) -> Tuple[Optional[Dict[str, Any]], List[bytes]]:
+        with self._lock:
+            return self._states.pop(session_id, None), self._data.pop(session_id, [])
+
+    def get_header(self, session_id: str) -> Optional[bytes]:
+        with self._lock:
+            return self._headers.get(session_id)
+
+    def set_header(self, session_id: str, header: bytes) -> None:
+        with self._lock:
+            self._headers.put(session_id, header)
+
+
+class BlobUtteranceStore:
+    """Buffers in blob storage; the state document is updated with ETag retries."""
+
+    @staticmethod
+    def _state_path(session_id: str) -> str:
+        return f"sessions/{session_id}/utterance.json"
+
+    @staticmethod
+    def _header_path(session_id: str) -> str:
+        return f"sessions/{session_id}/utterance/header.bin"
+
+    def peek(self, session_id: str) -> Optional[Dict[str, Any]]:
+        from .blob import read_json
+
+        state = read_json(self._state_path(session_id))
+        return state if state and state.get("chunks") else None
+
+    def append(self, session_id: str, data: bytes, meta: Dict[str, Any]) -> Dict[str, Any]:
+        from .blob import update_json, write_bytes
+
+        # Unique name per chunk: the bytes land before the state references them.
+        meta = dict(meta, path=f"sessions/{session_id}/utterance/{uuid.uuid4().hex}.bin")
+        write_bytes(meta["path"], data)
+        result: Dict[str, Any] = {}
+
+        def add(doc: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+            result["state"] = _add_chunk(doc if doc and doc.get("chunks") else _empty_state(), meta)
+            return result["state"]
+
+        update_json(self._state_path(session_id), add)
+        return result["state"]
+
+    def take(self, session_id: str) -> Tuple[Optional[Dict[str, Any]], List[bytes]]:
+        from .blob import delete_blob, read_bytes, update_json
+
+        taken: Dict[str, Any] = {}
+
+        def clear(doc: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+            # Whoever clears the document owns its chunks; a racing flush sees it empty.
+            taken["state"] = doc if doc and doc.get("chunks") else None
+            return _empty_state()
+
+        update_json(self._state_path(session_id), clear)
+        state = taken.get("state")
+        if state is None:
+            return None, []
+        data = []
+        for meta in state["chunks"]:
+            chunk = read_bytes(meta["path"])
+            if chunk is None:
+                logging.warning("utterance: chunk %s missing, skipping", meta["path"])
+                continue
+            data.append(chunk)
+            delete_blob(meta["path"])
+        return state, data
+
+    def get_header(self, session_id: str) -> Optional[bytes]:
+        from .blob import read_bytes
+
+        return read_bytes(self._header_path(session_id))
+
+    def set_header(self, session_id: str, header: bytes) -> None:
+        from .blob import write_bytes
+
+        write_bytes(self._header_path(session_id), header)
+
+
+_memory_store = MemoryUtteranceStore()
+
+
+def get_store() -> Any:
+    if os.getenv("AUDIO_UTTERANCE_STORE", "blob").strip().lower() == "memory":
+        return _memory_store
+    return BlobUtteranceStore()
+
+
+def _webm_header(data: bytes) -> Optional[bytes]:
+    if not data.startswith(_WEBM_MAGIC):
+        return None
+    cluster = data.find(_WEBM_CLUSTER)
+    return data[:cluster] if cluster > 0 else None
+
+
+def assemble(
+    chunks: List[bytes],
+    metas: List[Dict[str, Any]],
+    header: Optional[bytes] = None,
+    sample_rate: int = 16000,
+) -> Tuple[bytes, str]:
+    """Join buffered chunks into one decodable payload; returns (audio, format)."""
+    if not chunks:
+        return b"", "webm"
+    audio_format = metas[0].get("format") or "webm"
+    if audio_format == "wav":
+        pcm = io.BytesIO()
+        params = None
+        for chunk in chunks:
+            try:
+                with wave.open(io.BytesIO(chunk), "rb") as part:
+                    shape = (part.getnchannels(), part.getsampwidth(), part.getframerate())
+                    if params is None:
+                        params = shape
+                    if shape != params:
+                        logging.warning("utterance: dropping WAV chunk with format %s (expected %s)", shape, params)
+                        continue
+                    pcm.write(part.readframes(part.getnframes()))
+            except (wave.Error, EOFError):
+                logging.warning("utterance: dropping unreadable WAV chunk")
+        if params is None:
+            return b"", "wav"
+        out = io.BytesIO()
+        with wave.open(out, "wb") as joined:
+            joined.setnchannels(params[0])
+            joined.setsampwidth(params[1])
+            joined.setframerate(params[2])
+            joined.writeframes(pcm.getvalue())
+        return out.getvalue(), "wav"
+    joined = b"".join(chunks)
+    if audio_format in ("webm", "ogg") and header and not joined.startswith(_WEBM_MAGIC):
+        joined = header + joined
+    return joined, audio_format
+
+
+def submit(
+    session_id: str,
+    data: bytes,
+    declared_format: Optional[str] = None,
+    duration_ms: Optional[float] = None,
+    sample_rate: int = 16000,
+    final: bool = False,
+    store: Any = None,
+) -> Dict[str, Any]:
+    """
+    Buffer one chunk and decide whether an utterance is ready.
+
+    Returns {"ready", "reason", "state"} plus, when ready, "audio", "format"
+    and "duration_ms" of the assembled utterance. reason is one of buffered,
+    final, silence, stale, max_length or no_speech (an utterance was released
+    but held no speech, so there is nothing to transcribe).
+    """
+    store = store or get_store()
+    cfg = _config()
+    now = time.time()
+    meta: Optional[Dict[str, Any]] = None
+    if data:
+        audio_format = vad.sniff_format(data, declared_format)
+        if audio_format in ("webm", "ogg"):
+            # The size/bitrate heuristics only mean something for a whole
+            # utterance; a 250 ms timeslice is always "too small". Count
+            # fragments as speech and let the caller gate the assembled audio.
+            speech, gated_ms = True, None
+        else:
+            gate = vad.gate(data, declared_format, duration_ms, sample_rate)
+            speech, gated_ms = gate["speech"], gate.get("duration_ms")
+        meta = {
+            "bytes": len(data),
+            "format": audio_format,
+            "duration_ms": duration_ms if duration_ms is not None else gated_ms,
+            "speech": speech,
+            "received_at": now,
+        }
+        header = _webm_header(data)
+        if header is not None:
+            store.set_header(session_id, header)
+
+    previous = store.peek(session_id)
+    stale = (
+        previous is not None
+        and previous.get("last_chunk_at") is not None
+        and (now - previous["last_chunk_at"]) * 1000 > cfg["stale_ms"]
+    )
+    if stale and not final:
+        released = _release(store, session_id, "stale", sample_rate)
+        if meta is not None:
+            store.append(session_id, data, meta)
+        return released
+
+    state = store.append(session_id, data, meta) if meta is not None else previous
+    if final:
+        return _release(store, session_id, "final", sample_rate)
+    if state is None:
+        return {"ready": False, "reason": "buffered", "state": summary(None)}
+
+    has_speech = any(c.get("speech") for c in state.get("chunks") or [])
+    if has_speech and state.get("trailing_silence_ms", 0.0) >= cfg["end_silence_ms"]:
+        return _release(store, session_id, "silence", sample_rate)
+    if not has_speech and state.get("trailing_silence_ms", 0.0) >= cfg["end_silence_ms"]:
+        # Nothing but silence so far: drop it rather than let it grow.
+        store.take(session_id)
+        return {"ready": False, "reason": "buffered", "state": summary(None)}
+    if state.get("duration_ms", 0.0) >= cfg["max_ms"] or state.get("bytes", 0) >= cfg["max_bytes"]:
+        return _release(store, session_id, "max_length", sample_rate)
+    return {"ready": False, "reason": "buffered", "state": summary(state)}
+
+
+def _release(store: Any, session_id: str, reason: str, sample_rate: int) -> Dict[str, Any]:
+    state, chunks = store.take(session_id)
+    metas = (state or {}).get("chunks") or []
+    if not chunks or not any(m.get("speech") for m in metas):
+        return {"ready": False, "reason": "no_speech" if chunks else reason, "state": summary(state)}
+    header = store.get_header(session_id) if metas[0].get("format") in ("webm", "ogg") else None
+    audio, audio_format = assemble(chunks, metas, header, sample_rate)
+    logging.info(
+        "utterance: session=%s released %d chunk(s), %d bytes (%s)", session_id, len(chunks), len(audio), reason,
+    )
+    return {
+        "ready": bool(audio),
+        "reason": reason,
+        "state": summary(state),
+        "audio": audio,
+        "format": audio_format,
+        "duration_ms": (state or {}).get("duration_ms") or None,
+    }
@@ -0,0 +1,205 @@
+"""
+Voice activity gate in front of Whisper.
+
+/audio/chunk used to send every upload to transcribe_audio and only learned
+"no speech" after the round trip. gate() decides locally, per chunk:
+
+- WAV (RIFF, 16-bit PCM) and raw PCM (audioFormat=pcm, 16-bit little-endian
+  mono): frame-level energy/zero-crossing VAD. Frames are 20 ms; a frame is
+  speech when its RMS clears both an absolute floor and a multiple of the
+  chunk's own noise floor (its 10th-percentile frame, capped so a chunk that
+  is all speech still counts as speech), unless it is
+  low-energy broadband hiss (high zero-crossing rate near the threshold).
+  Chunks with less than min_speech_ms of speech are dropped; otherwise
+  leading/trailing silence beyond a short pad is trimmed and the result is
+  re-wrapped as WAV for Whisper.
+- webm/ogg (MediaRecorder Opus): the container cannot be decoded without a
+  codec library, so size and duration heuristics apply. Opus with DTX/VBR
+  spends very few bytes on silence, so a chunk below min_bytes, shorter than
+  min_duration_ms, or below min_bytes_per_second (when the client reports
+  durationMs) is dropped. Everything else passes through unchanged.
+
+Thresholds come from AUDIO_VAD_* environment variables (see _config);
+AUDIO_VAD_ENABLED=false disables the gate.
+"""
+
+import array
+import io
+import os
+import struct
+import sys
+import wave
+from typing import Any, Dict, List, Optional
+
+from . import metrics
+
+
+VAD_RESULTS = metrics.REGISTRY.register(
+    metrics.Counter(
+        "pulse_audio_vad_total", "Audio chunks seen by the VAD gate, by decision and reason.", ("result", "reason")
+    )
+)
+
+FRAME_MS = 20
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _config() -> Dict[str, float]:
+    return {
+        "min_speech_ms": _env_float("AUDIO_VAD_MIN_SPEECH_MS", 200),
+        "pad_ms": _env_float("AUDIO_VAD_PAD_MS", 200),
+        # int16 RMS; ~-48 dBFS. Quieter than any usable speech from a headset mic.
+        "abs_threshold": _env_float("AUDIO_VAD_ABS_THRESHOLD", 130),
+        "noise_multiplier": _env_float("AUDIO_VAD_NOISE_MULTIPLIER", 3.0),
+        # ~-30 dBFS. A chunk cut from the middle of speech has no quiet frames, so
+        # its 10th percentile is speech, not noise; never trust a floor above this.
+        "max_noise_floor": _env_float("AUDIO_VAD_MAX_NOISE_FLOOR", 1000),
+        "min_bytes": _env_float("AUDIO_VAD_MIN_BYTES", 2000),
+        "min_duration_ms": _env_float("AUDIO_VAD_MIN_DURATION_MS", 300),
+        # Opus speech at MediaRecorder defaults runs 2-4 KB/s; DTX silence is well under 1 KB/s.
+        "min_bytes_per_second": _env_float("AUDIO_VAD_MIN_BYTES_PER_SECOND", 1200),
+    }
+
+
+def enabled() -> bool:
+    return os.getenv("AUDIO_VAD_ENABLED", "true").strip().lower() in ("true", "1", "yes")
+
+
+def sniff_format(data: bytes, declared: Optional[str] = None) -> str:
+    """Container format from magic bytes; `declared` (e.g. "pcm") only when nothing matches."""
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        return "wav"
+    if data[:4] == b"\x1a\x45\xdf\xa3":
+        return "webm"
+    if data[:4] == b"OggS":
+        return "ogg"
+    if data[:3] == b"ID3" or data[:2] in (b"\xff\xfb", b"\xff\xf3", b"\xff\xf2"):
+        return "mp3"
+    return (declared or "webm").strip().lower()
+
+
+def _result(speech: bool, reason: str, audio: bytes, audio_format: str, **extra: Any) -> Dict[str, Any]:
+    VAD_RESULTS.labels("speech" if speech else "skipped", reason).inc()
+    return {"speech": speech, "reason": reason, "audio": audio, "format": audio_format, **extra}
+
+
+def _frame_stats(samples: "array.array", frame_len: int) -> List[tuple]:
+    """(rms, zero-crossing rate) per frame."""
+    stats = []
+    for start in range(0, len(samples) - frame_len + 1, frame_len):
+        frame = samples[start:start + frame_len]
+        energy = sum(map(int.__mul__, frame, frame))
+        crossings = sum(1 for a, b in zip(frame, frame[1:]) if (a ^ b) < 0)
+        stats.append(((energy / frame_len) ** 0.5, crossings / frame_len))
+    return stats
+
+
+def analyze_pcm16(pcm: bytes, sample_rate: int, channels: int = 1, config: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """
+    Energy/ZCR VAD over 16-bit little-endian PCM. Returns {"speech_ms",
+    "duration_ms", "start", "end"} where start/end are byte offsets of the
+    padded speech region (start == end when there is none).
+    """
+    cfg = config or _config()
+    samples = array.array("h")
+    samples.frombytes(pcm[: len(pcm) - len(pcm) % (2 * channels)])
+    if sys.byteorder != "little":
+        samples.byteswap()
+    if channels > 1:
+        samples = samples[::channels]  # first channel is enough to find speech
+    frame_len = max(1, sample_rate * FRAME_MS // 1000)
+    stats = _frame_stats(samples, frame_len)
+    duration_ms = len(samples) * 1000.0 / sample_rate if sample_rate else 0.0
+    if not stats:
+        return {"speech_ms": 0.0, "duration_ms": duration_ms, "start": 0, "end": 0}
+
+    noise_floor = min(sorted(rms for rms, _ in stats)[len(stats) // 10], cfg["max_noise_floor"])
+    threshold = max(cfg["abs_threshold"], noise_floor * cfg["noise_multiplier"])
+    voiced = [
+        rms >= threshold and not (zcr > 0.35 and rms < threshold * 2)  # hiss: many crossings, little energy
+        for rms, zcr in stats
+    ]
+    speech_frames = sum(voiced)
+    if not speech_frames:
+        return {"speech_ms": 0.0, "duration_ms": duration_ms, "start": 0, "end": 0}
+
+    first = voiced.index(True)
+    last = len(voiced) - 1 - voiced[::-1].index(True)
+    pad = int(cfg["pad_ms"] // FRAME_MS)
+    frame_bytes = frame_len * 2 * channels
+    start = max(0, first - pad) * frame_bytes
+    end = min(len(pcm), (last + 1 + pad) * frame_bytes)
+    return {"speech_ms": float(speech_frames * FRAME_MS), "duration_ms": duration_ms, "start": start, "end": end}
+
+
+def _wav(pcm: bytes, sample_rate: int, channels: int) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as out:
+        out.setnchannels(channels)
+        out.setsampwidth(2)
+        out.setframerate(sample_rate)
+        out.writeframes(pcm)
+    return buf.getvalue()
+
+
+def _gate_pcm(pcm: bytes, sample_rate: int, channels: int, source_format: str) -> Dict[str, Any]:
+    cfg = _config()
+    found = analyze_pcm16(pcm, sample_rate, channels, cfg)
+    extra = {"duration_ms": round(found["duration_ms"]), "speech_ms": round(found["speech_ms"])}
+    if found["speech_ms"] < cfg["min_speech_ms"]:
+        return _result(False, "silence", b"", "wav", **extra)
+    trimmed = pcm[found["start"]:found["end"]]
+    extra["trimmed_ms"] = round(found["duration_ms"] - len(trimmed) * 1000.0 / (sample_rate * 2 * channels))
+    return _result(True, f"{source_format}_vad", _wav(trimmed, sample_rate, channels), "wav", **extra)
+
+
+def gate(
+    data: bytes,
+    declared_format: Optional[str] = None,
+    duration_ms: Optional[float] = None,
+    sample_rate: int = 16000,
+) -> Dict[str, Any]:
+    """
+    Decide whether a chunk is worth transcribing.
+
+    Returns {"speech": bool, "reason", "audio", "format", ...}: "audio" and
+    "format" are what to send to Whisper (trimmed WAV for PCM input, the
+    original bytes otherwise). Containers the gate cannot inspect pass.
+    """
+    audio_format = sniff_format(data, declared_format)
+    if not data:
+        return _result(False, "empty", b"", audio_format)
+    if not enabled():
+        return _result(True, "disabled", data, audio_format)
+
+    if audio_format == "wav":
+        try:
+            with wave.open(io.BytesIO(data), "rb") as wav:
+                if wav.getsampwidth() != 2:
+                    return _result(True, "wav_unsupported", data, audio_format)
+                pcm = wav.readframes(wav.getnframes())
+                return _gate_pcm(pcm, wav.getframerate(), wav.getnchannels(), "wav")
+        except (wave.Error, EOFError, struct.error):
+            return _result(True, "wav_unreadable", data, audio_format)
+
+    if audio_format == "pcm":
+        return _gate_pcm(data, sample_rate, 1, "pcm")
+
+    if audio_format in ("webm", "ogg"):
+        cfg = _config()
+        if len(data) < cfg["min_bytes"]:
+            return _result(False, "too_small", b"", audio_format, bytes=len(data))
+        if duration_ms is not None and duration_ms > 0:
+            if duration_ms < cfg["min_duration_ms"]:
+                return _result(False, "too_short", b"", audio_format, duration_ms=round(duration_ms))
+            if len(data) * 1000.0 / duration_ms < cfg["min_bytes_per_second"]:
+                return _result(False, "low_bitrate", b"", audio_format, duration_ms=round(duration_ms))
+        return _result(True, "size_ok", data, audio_format)
+
+    return _result(True, "unchecked", data, audio_format)
@@ -0,0 +1,279 @@
+"""
+Pipelined voice turn: streamed completion -> sentences -> concurrent TTS.
+
+/audio/chunk used to wait for the whole persona reply before synthesizing
+any of it, so end-of-speech to first audio was STT + full completion + full
+TTS. Here the completion is consumed as a stream of deltas, cut into
+sentences as soon as each one is complete (SentenceSplitter), and every
+sentence is handed to a TTS worker immediately. First audio then costs STT +
+time to the first sentence + TTS of that sentence, and later sentences
+synthesize while the model is still writing.
+
+Segments finish out of order on the pool but are published strictly in
+sequence (on_segment is called for 0, 1, 2, ... as each contiguous prefix
+becomes ready), so a caller can forward them to the client as they land.
+"""
+
+import contextvars
+import logging
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+
+_logger = logging.getLogger(__name__)
+
+# Sentence-final punctuation (plus closing quotes/brackets) followed by whitespace.
+_BOUNDARY_RE = re.compile(r"[.!?…]+[\"')\]”’]*\s+")
+_SOFT_BOUNDARY_RE = re.compile(r"[,;:—]\s+")
+_ABBREVIATIONS = frozenset({"mr", "mrs", "ms", "dr", "st", "sr", "jr", "vs", "etc", "e.g", "i.e", "approx"})
+
+Segment = Dict[str, Any]
+
+
+class SentenceSplitter:
+    """
+    Incremental sentence splitter for streamed text.
+
+    feed() returns the sentences completed by a delta; flush() returns
+    whatever is left once the stream ends. A boundary only counts once the
+    whitespace after it has arrived, so "3." followed by "5 inches" or
+    "Dr." followed by " Smith" never splits. Pieces shorter than min_chars
+    ("Hmm.", "Oh!") are held and joined to the next sentence because a TTS
+    round trip per interjection costs more than it saves. Text that runs
+    past max_chars without a sentence end is cut at the last comma-like
+    pause so long run-on replies still start speaking early.
+    """
+
+    def __init__(self, min_chars: int = 12, max_chars: int = 220) -> None:
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+
+    def feed(self, delta: str) -> List[str]:
+        self._buffer += delta
+        sentences: List[str] = []
+        start = 0
+        for match in _BOUNDARY_RE.finditer(self._buffer):
+            end = match.end()
+            candidate = self._buffer[start:end].strip()
+            if self._ends_with_abbreviation(self._buffer[start:match.start() + 1]):
+                continue
+            if len(candidate) < self.min_chars:
+                continue
+            sentences.append(candidate)
+            start = end
+        self._buffer = self._buffer[start:]
+        if len(self._buffer) > self.max_chars:
+            cut = None
+            for match in _SOFT_BOUNDARY_RE.finditer(self._buffer, 0, self.max_chars):
+                cut = match.end()
+            if cut is not None and len(self._buffer[:cut].strip()) >= self.min_chars:
+                sentences.append(self._buffer[:cut].strip())
+                self._buffer = self._buffer[cut:]
+        return sentences
+
+    def flush(self) -> List[str]:
+        tail = self._buffer.strip()
+        self._buffer = ""
+        return [tail] if tail else []
+
+    @staticmethod
+    def _ends_with_abbreviation(text: str) -> bool:
+        words = text.rstrip(".").rsplit(None, 1)
+        if not words:
+            return False
+        last = words[-1].lower()
+        return last in _ABBREVIATIONS or (len(last) == 1 and last.isalpha())
+
+
+class _OrderedPublisher:
+    """Calls on_segment for each segment in sequence order as soon as all earlier ones are done."""
+
+    def __init__(self, on_segment: Optional[Callable[[Segment], None]]) -> None:
+        self._on_segment = on_segment
+        self._pending: Dict[int, Segment] = {}
+        self._next = 0
+        self._lock = threading.Lock()
+        self.first_audio_at: Optional[float] = None
+
+    def ready(self, segment: Segment) -> None:
+        with self._lock:
+            self._pending[segment["seq"]] = segment
+            while self._next in self._pending:
+                current = self._pending.pop(self._next)
+                self._next += 1
+                if self.first_audio_at is None and current.get("audio") is not None:
+                    self.first_audio_at = time.perf_counter()
+                if self._on_segment is not None:
+                    try:
+                        self._on_segment(current)
+                    except Exception as exc:  # noqa: BLE001
+                        _logger.warning("voice_pipeline: segment callback failed for seq=%d: %s", current["seq"], exc)
+
+
+def run_voice_turn(
+    deltas: Iterable[str],
+    synthesize: Callable[[str], bytes],
+    on_segment: Optional[Callable[[Segment], None]] = None,
+    max_workers: int = 3,
+    splitter: Optional[SentenceSplitter] = None,
+) -> Dict[str, Any]:
+    """
+    Consume a stream of reply deltas and synthesize it sentence by sentence.
+
+    Returns {"text", "segments", "error", "first_audio_at", "llm_s"};
+    first_audio_at is the time.perf_counter() value at which the first
+    segment with audio was published (None if none had audio).
+    segments are in order, each {"seq", "text", "audio" (bytes or None),
+    "tts_ms", "error"}. A failure of the stream is reported in "error" with
+    whatever text had arrived; a failed sentence has audio None and does not
+    stop the others.
+    """
+    started = time.perf_counter()
+    splitter = splitter or SentenceSplitter()
+    publisher = _OrderedPublisher(on_segment)
+    parts: List[str] = []
+    futures: List["Future[Segment]"] = []
+    error: Optional[str] = None
+
+    def synthesize_one(seq: int, text: str) -> Segment:
+        tts_start = time.perf_counter()
+        segment: Segment = {"seq": seq, "text": text, "audio": None, "error": None}
+        try:
+            segment["audio"] = synthesize(text)
+        except Exception as exc:  # noqa: BLE001
+            _logger.warning("voice_pipeline: TTS failed for seq=%d: %s", seq, exc)
+            segment["error"] = f"{type(exc).__name__}: {exc}"
+        segment["tts_ms"] = round((time.perf_counter() - tts_start) * 1000, 1)
+        publisher.ready(segment)
+        return segment
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="tts") as pool:
+        def submit(sentences: List[str]) -> None:
+            for sentence in sentences:
+                # Copy the context so TTS spans land in the request's trace.
+                ctx = contextvars.copy_context()
+                futures.append(pool.submit(ctx.run, synthesize_one, len(futures), sentence))
+
+        try:
+            for delta in deltas:
+                parts.append(delta)
+                submit(splitter.feed(delta))
+        except Exception as exc:  # noqa: BLE001
+            _logger.warning("voice_pipeline: reply stream failed after %d chars: %s", sum(map(len, parts)), exc)
+            error = f"{type(exc).__name__}: {exc}"
+        finally:
+            close = getattr(deltas, "close", None)
+            if close is not None:
+                close()
+        llm_s = time.perf_counter() - started
+        submit(splitter.flush())
+        segments = [future.result() for future in futures]
+
+    return {
+        "text": "".join(parts).strip(),
+        "segments": segments,
+        "error": error,
+        "first_audio_at": publisher.first_audio_at,
+        "llm_s": llm_s,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Progressive delivery: segments are stored as they are published so a client
+# polling /audio/segments can start playback while /audio/chunk is running.
+# ---------------------------------------------------------------------------
+
+_TURN_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def valid_turn_id(turn_id: Optional[str]) -> bool:
+    return bool(turn_id) and bool(_TURN_ID_RE.match(turn_id or ""))
+
+
+def turn_prefix(session_id: str, turn_id: str) -> str:
+    return f"sessions/{session_id}/turns/{turn_id}"
+
+
+class TurnSegmentStore:
+    """
+    Writes each published segment to sessions/{id}/turns/{turn}/{seq}.mp3 and
+    keeps sessions/{id}/turns/{turn}/manifest.json listing the segments
+    available so far. publish() is called in sequence order by
+    run_voice_turn, so the manifest always describes a contiguous prefix.
+    """
+
+    def __init__(self, session_id: str, turn_id: str, transcript: str) -> None:
+        self.prefix = turn_prefix(session_id, turn_id)
+        self._manifest: Dict[str, Any] = {
+            "sessionId": session_id,
+            "turnId": turn_id,
+            "transcript": transcript,
+            "segments": [],
+            "done": False,
+        }
+
+    def _write_manifest(self) -> None:
+        from .blob import now_iso, write_json
+
+        self._manifest["updated_at"] = now_iso()
+        write_json(f"{self.prefix}/manifest.json", self._manifest)
+
+    def start(self) -> None:
+        self._write_manifest()
+
+    def publish(self, segment: Segment) -> None:
+        from .blob import write_bytes
+
+        audio = segment.get("audio")
+        if audio is not None:
+            write_bytes(f"{self.prefix}/{segment['seq']}.mp3", audio, content_type="audio/mpeg")
+        self._manifest["segments"].append({
+            "seq": segment["seq"],
+            "text": segment["text"],
+            "bytes": len(audio) if audio is not None else 0,
+        })
+        self._write_manifest()
+
+    def finish(self, ai_response: str, interrupted: bool = False) -> None:
+        self._manifest["done"] = True
+        self._manifest["aiResponse"] = ai_response
+        if interrupted:
+            # The reply stream failed partway: aiResponse is what was spoken, not a complete reply.
+            self._manifest["interrupted"] = True
+        self._write_manifest()
+
+
+def read_turn_segments(session_id: str, turn_id: str, after: int = 0, with_audio: bool = True) -> Dict[str, Any]:
+    """
+    Segments with seq >= after for one turn, with their audio bytes unless
+    with_audio is False. found is False until /audio/chunk has stored the
+    turn's manifest.
+    """
+    from .blob import read_bytes, read_json
+
+    prefix = turn_prefix(session_id, turn_id)
+    manifest = read_json(f"{prefix}/manifest.json")
+    if not manifest:
+        return {
+            "found": False, "prefix": prefix, "done": False, "interrupted": False,
+            "transcript": None, "aiResponse": None, "segments": [],
+        }
+    segments = []
+    for entry in manifest.get("segments") or []:
+        if entry.get("seq", -1) < after:
+            continue
+        audio = read_bytes(f"{prefix}/{entry['seq']}.mp3") if with_audio and entry.get("bytes") else None
+        segments.append({"seq": entry["seq"], "text": entry.get("text"), "bytes": entry.get("bytes", 0), "audio": audio})
+    return {
+        "found": True,
+        "prefix": prefix,
+        "done": bool(manifest.get("done")),
+        "interrupted": bool(manifest.get("interrupted")),
+        "transcript": manifest.get("transcript"),
+        "aiResponse": manifest.get("aiResponse"),
+        "segments": segments,
+    }
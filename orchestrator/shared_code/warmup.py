@@ -0,0 +1,67 @@
+"""
+Pre-initialization of SDK clients for a fresh worker.
+
+Module imports are kept light (heavy SDKs load on first use), so the first
+real request would otherwise pay for importing the storage SDK, opening the
+blob container, building the HTTP session and loading prompts. `prewarm` does
+that work up front; it is called from the warmup trigger when an instance is
+added and is safe to call more than once. Each step is best-effort.
+"""
+
+import logging
+import os
+import time
+from typing import Callable, Dict, List, Tuple
+
+
+_logger = logging.getLogger(__name__)
+
+
+def _storage() -> None:
+    from .blob import get_container_client
+
+    get_container_client()
+
+
+def _http() -> None:
+    from .http_client import get_session
+
+    get_session()
+
+
+def _prompts() -> None:
+    # Importing openai_client registers the persona prompt default.
+    from . import openai_client  # noqa: F401
+    from .prompt_registry import get_registry
+
+    get_registry().get(openai_client.PERSONA_PROMPT_ID)
+
+
+def _analytics_db() -> None:
+    from .analytics_db import PSYCOPG_AVAILABLE
+
+    if PSYCOPG_AVAILABLE and os.getenv("PULSE_ANALYTICS_DB_HOST"):
+        import psycopg  # noqa: F401
+        from psycopg.types.json import Json  # noqa: F401
+
+
+_STEPS: List[Tuple[str, Callable[[], None]]] = [
+    ("storage", _storage),
+    ("http", _http),
+    ("prompts", _prompts),
+    ("analytics_db", _analytics_db),
+]
+
+
+def prewarm() -> Dict[str, float]:
+    """Run every warmup step and return how long each took, in milliseconds."""
+    timings: Dict[str, float] = {}
+    for name, step in _STEPS:
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception as exc:  # noqa: BLE001
+            _logger.warning("warmup: %s step failed: %s", name, exc)
+        timings[name] = round((time.perf_counter() - start) * 1000.0, 1)
+    _logger.info("warmup: completed %s", timings)
+    return timings
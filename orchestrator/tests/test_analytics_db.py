@@ -0,0 +1,44 @@
+import os
+import unittest
+from unittest import mock
+
+import psycopg
+
+from shared_code import analytics_db, metrics
+
+DB_ENV = {
+    "PULSE_ANALYTICS_DB_HOST": "db",
+    "PULSE_ANALYTICS_DB_NAME": "pulse",
+    "PULSE_ANALYTICS_DB_USER": "pulse",
+    "PULSE_ANALYTICS_DB_PASSWORD": "secret",
+}
+
+
+class AnalyticsDbTimingTests(unittest.TestCase):
+    @mock.patch.dict(os.environ, DB_ENV)
+    def test_connections_use_timed_cursors(self) -> None:
+        conn = mock.Mock()
+        with mock.patch.object(psycopg, "connect", return_value=conn) as connect:
+            with analytics_db.get_connection() as opened:
+                self.assertIs(opened, conn)
+
+        cursor_factory, server_cursor_factory = analytics_db._timed_cursor_factories()
+        self.assertIs(connect.call_args.kwargs["cursor_factory"], cursor_factory)
+        self.assertIs(conn.server_cursor_factory, server_cursor_factory)
+        conn.close.assert_called_once()
+
+    def test_each_execute_is_timed_as_a_query(self) -> None:
+        cursor_factory, server_cursor_factory = analytics_db._timed_cursor_factories()
+        queries = metrics.DB_LATENCY.labels("query")
+        before = queries.count
+
+        with mock.patch.object(psycopg.Cursor, "execute") as execute:
+            object.__new__(cursor_factory).execute("SELECT 1", None)
+
+        execute.assert_called_once_with("SELECT 1", None)
+        self.assertEqual(queries.count, before + 1)
+        self.assertIn("execute", vars(server_cursor_factory))
+
+
+if __name__ == "__main__":
+    unittest.main()
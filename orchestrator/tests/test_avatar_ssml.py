@@ -0,0 +1,57 @@
+import os
+import unittest
+import xml.etree.ElementTree as ET
+from unittest import mock
+
+from shared_code import avatar_service
+
+SYNTHESIS = "{http://www.w3.org/2001/10/synthesis}"
+MSTTS = "{http://www.w3.org/2001/mstts}"
+
+
+def _express_as(ssml: str) -> ET.Element:
+    return ET.fromstring(ssml).find(f"{SYNTHESIS}voice/{MSTTS}express-as")
+
+
+@mock.patch.dict(os.environ, {"AZURE_SPEECH_KEY": "key", "AZURE_SPEECH_REGION": "eastus2"})
+class AvatarSsmlTests(unittest.TestCase):
+    def test_templates_cover_every_persona(self) -> None:
+        self.assertEqual(set(avatar_service.SSML_TEMPLATES), set(avatar_service.PERSONA_AVATAR_CONFIGS))
+
+    def test_single_utterance_matches_the_persona_frame(self) -> None:
+        text = "Tom & Jerry's <\"best\"> deal"
+        config = avatar_service.PERSONA_AVATAR_CONFIGS["Thinker"]
+
+        result = avatar_service.generate_avatar_video("Thinker", text, emotion="skeptical")
+
+        self.assertEqual(result["ssml"], avatar_service._build_avatar_ssml(config, "skeptical", text))
+        express_as = _express_as(result["ssml"])
+        self.assertEqual(express_as.get("style"), config["voice_style"])
+        self.assertEqual(express_as.text.strip(), text)
+
+    def test_unknown_persona_and_emotion_fall_back(self) -> None:
+        result = avatar_service.generate_avatar_video("Pirate", "Ahoy", emotion="furious")
+
+        self.assertEqual(result["avatar_config"]["voice"], avatar_service.PERSONA_AVATAR_CONFIGS["Relater"]["voice"])
+        self.assertEqual(result["emotion"], "furious")
+        self.assertEqual(_express_as(result["ssml"]).text.strip(), "Ahoy")
+
+    def test_sentences_are_batched_with_bookmarks_and_breaks(self) -> None:
+        ssml = avatar_service.build_avatar_ssml_batch("Director", ["Let's be quick.", "Price & terms?"], break_ms=200)
+
+        children = list(_express_as(ssml))
+        self.assertEqual(
+            [(child.tag.replace(SYNTHESIS, ""), child.get("mark") or child.get("time")) for child in children],
+            [("bookmark", "seg-0"), ("break", "200ms"), ("bookmark", "seg-1")],
+        )
+        self.assertEqual(children[0].tail, "Let's be quick.")
+        self.assertEqual(children[2].tail.strip(), "Price & terms?")
+
+    def test_generate_uses_batch_when_sentences_are_given(self) -> None:
+        result = avatar_service.generate_avatar_video("Socializer", "Hi! Great.", sentences=["Hi!", "Great."])
+
+        self.assertIn('<bookmark mark="seg-1"/>Great.', result["ssml"])
+
+
+if __name__ == "__main__":
+    unittest.main()
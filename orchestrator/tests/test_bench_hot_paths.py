@@ -0,0 +1,29 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+import bench_hot_paths  # noqa: E402
+
+
+class BenchHotPathsTests(unittest.TestCase):
+    def test_every_benchmark_runs_and_report_is_keyed_by_name(self) -> None:
+        report = bench_hot_paths.run(name_filter=None, min_time=0.0, repeat=1, seed=7)
+
+        self.assertIn("chat._detect_missteps[long]", report["results"])
+        self.assertIn("readiness_service._compute_components_from_aggregates", report["results"])
+        for result in report["results"].values():
+            self.assertGreater(result["best_ns"], 0)
+
+    def test_compare_flags_regressions_beyond_threshold(self) -> None:
+        current = {"results": {"a": {"best_ns": 130.0}, "b": {"best_ns": 80.0}, "c": {"best_ns": 105.0}, "d": {"best_ns": 5.0}}}
+        baseline = {"results": {"a": {"best_ns": 100.0}, "b": {"best_ns": 100.0}, "c": {"best_ns": 100.0}}}
+
+        statuses = {row["name"]: row["status"] for row in bench_hot_paths.compare(current, baseline, 0.15)}
+
+        self.assertEqual(statuses, {"a": "regression", "b": "improved", "c": "ok", "d": "new"})
+
+
+if __name__ == "__main__":
+    unittest.main()
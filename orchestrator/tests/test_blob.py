@@ -0,0 +1,268 @@
+import json
+import os
+import unittest
+from unittest import mock
+
+import azure.functions as func
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+
+import admin_prompts_by_id
+import chat
+import seed_admin_data
+from shared_code import blob, codec, compression
+
+
+class _Downloader:
+    def __init__(self, data: bytes, etag: str) -> None:
+        self._data = data
+        self.properties = mock.Mock(etag=etag)
+
+    def readall(self) -> bytes:
+        return self._data
+
+
+class _FakeBlobClient:
+    def __init__(self, container: "_FakeContainer", path: str) -> None:
+        self._container = container
+        self._path = path
+
+    def download_blob(self) -> _Downloader:
+        if self._path not in self._container.blobs:
+            raise ResourceNotFoundError("missing")
+        data, etag = self._container.blobs[self._path]
+        return _Downloader(data, etag)
+
+    def upload_blob(self, data, overwrite=False, content_settings=None, metadata=None, etag=None, match_condition=None):
+        self._container.before_upload(self._path)
+        existing = self._container.blobs.get(self._path)
+        if existing is not None and not overwrite:
+            raise ResourceExistsError("exists")
+        if etag is not None and (existing is None or existing[1] != etag):
+            raise ResourceModifiedError("etag mismatch")
+        self._container.counter += 1
+        self._container.uploads += 1
+        self._container.encodings[self._path] = getattr(content_settings, "content_encoding", None)
+        new_etag = f'"{self._container.counter}"'
+        self._container.blobs[self._path] = (data, new_etag)
+        return {"etag": new_etag}
+
+
+class _FakeContainer:
+    def __init__(self) -> None:
+        self.blobs: dict = {}
+        self.counter = 0
+        self.uploads = 0
+        self.encodings: dict = {}
+        self.interleave = None
+
+    def get_blob_client(self, path: str) -> _FakeBlobClient:
+        return _FakeBlobClient(self, path)
+
+    def before_upload(self, path: str) -> None:
+        # Simulates another request writing between our read and our write.
+        if self.interleave is not None:
+            hook, self.interleave = self.interleave, None
+            hook(path)
+
+    def put(self, path: str, doc: dict) -> None:
+        self.counter += 1
+        self.blobs[path] = (codec.dumps(doc), f'"{self.counter}"')
+
+    def doc(self, path: str) -> dict:
+        return json.loads(self.blobs[path][0])
+
+
+class _FakeContainerTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.container = self.enterContext(blob.use_container(_FakeContainer()))
+        patcher = mock.patch.object(blob.time, "sleep")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class UpdateJsonTests(_FakeContainerTestCase):
+
+    def test_conditional_write_rejects_stale_etag(self) -> None:
+        self.container.put("a.json", {"n": 1})
+        _, etag = blob.read_json_with_etag("a.json")
+        self.container.put("a.json", {"n": 2})
+        with self.assertRaises(blob.BlobConflictError):
+            blob.write_json("a.json", {"n": 3}, etag=etag)
+        with self.assertRaises(blob.BlobConflictError):
+            blob.write_json("a.json", {"n": 3}, create_only=True)
+
+    def test_concurrent_append_is_retried_and_merged(self) -> None:
+        path = "sessions/s1/conversation.json"
+        self.container.put(path, {"messages": ["a"]})
+        self.container.interleave = lambda p: self.container.put(p, {"messages": ["a", "b"]})
+
+        result = blob.update_json(path, lambda doc: {"messages": doc["messages"] + ["c"]})
+
+        self.assertEqual(result, {"messages": ["a", "b", "c"]})
+        self.assertEqual(self.container.doc(path), {"messages": ["a", "b", "c"]})
+
+    def test_missing_blob_is_created_once(self) -> None:
+        path = "sessions/s1/pulse_state.json"
+        self.container.interleave = lambda p: self.container.put(p, {"current_stage": 3})
+
+        result = blob.update_json(path, lambda doc: None if doc else {"current_stage": 2})
+
+        self.assertEqual(result, {"current_stage": 3})
+        self.assertEqual(self.container.doc(path), {"current_stage": 3})
+
+    def test_gives_up_after_retries(self) -> None:
+        path = "x.json"
+        self.container.put(path, {"n": 0})
+
+        def always_conflict(p: str) -> None:
+            self.container.put(p, {"n": -1})
+            self.container.interleave = always_conflict
+
+        self.container.interleave = always_conflict
+        with self.assertRaises(blob.BlobConflictError):
+            blob.update_json(path, lambda doc: {"n": doc["n"] + 1}, retries=3)
+
+
+class ChatSessionStateMergeTests(_FakeContainerTestCase):
+    def test_overlapping_exchanges_are_both_kept(self) -> None:
+        path = "sessions/s1/conversation.json"
+        other = [{"role": "user", "content": "first"}, {"role": "assistant", "content": "one"}]
+        self.container.interleave = lambda p: self.container.put(p, {"messages": other})
+
+        mine = [{"role": "user", "content": "second"}, {"role": "assistant", "content": "two"}]
+        merged = chat._append_conversation_exchange("s1", mine)
+
+        self.assertEqual(merged, other + mine)
+        self.assertEqual(self.container.doc(path)["messages"], other + mine)
+
+    def test_trust_deltas_from_overlapping_turns_accumulate(self) -> None:
+        path = "sessions/s1/sale_state.json"
+        self.container.put(path, chat._initial_sale_state())
+        overlapping = dict(chat._initial_sale_state(), trust_score=6)
+        self.container.interleave = lambda p: self.container.put(p, overlapping)
+
+        state = chat._apply_sale_turn("s1", trust_change=1, current_missteps=[], current_stage=2)
+
+        self.assertEqual(state["trust_score"], 7)
+        self.assertEqual(self.container.doc(path)["trust_score"], 7)
+
+    def test_pulse_stage_never_moves_backwards(self) -> None:
+        self.container.put("sessions/s1/pulse_state.json", {"current_stage": 4})
+        self.assertEqual(chat._save_pulse_stage_to_session("s1", 3, []), 4)
+        self.assertEqual(self.container.doc("sessions/s1/pulse_state.json")["current_stage"], 4)
+
+
+class WriteDedupTests(_FakeContainerTestCase):
+    def test_unchanged_conditional_write_after_read_is_skipped(self) -> None:
+        self.container.put("a.json", {"n": 1})
+        doc, etag = blob.read_json_with_etag("a.json")
+        before = blob.get_write_stats()["skipped"]
+
+        blob.write_json("a.json", doc, etag=etag)
+        etag = blob.write_json("a.json", {"n": 2}, etag=etag)
+        blob.write_json("a.json", {"n": 2}, etag=etag)
+
+        self.assertEqual(self.container.uploads, 1)
+        self.assertEqual(blob.get_write_stats()["skipped"], before + 2)
+
+    def test_unconditional_write_is_never_skipped(self) -> None:
+        blob.write_json("a.json", {"a": 1})
+        self.container.put("a.json", {"a": 2})  # another instance writes
+
+        blob.write_json("a.json", {"a": 1})
+
+        self.assertEqual(self.container.doc("a.json"), {"a": 1})
+
+    def test_conditional_write_with_other_etag_is_not_skipped(self) -> None:
+        self.container.put("a.json", {"n": 1})
+        blob.read_json("a.json")
+        with self.assertRaises(blob.BlobConflictError):
+            blob.write_json("a.json", {"n": 1}, etag='"stale"')
+
+    def test_sale_state_turn_without_changes_does_not_write(self) -> None:
+        path = "sessions/s1/sale_state.json"
+        chat._apply_sale_turn("s1", trust_change=0, current_missteps=[], current_stage=1)
+        uploads = self.container.uploads
+
+        chat._apply_sale_turn("s1", trust_change=0, current_missteps=[], current_stage=1)
+
+        self.assertEqual(self.container.uploads, uploads)
+        self.assertEqual(self.container.doc(path)["trust_score"], chat.INITIAL_TRUST)
+
+    @mock.patch.dict(os.environ, {"ALLOW_TEST_SEED": "true"}, clear=False)
+    def test_reseeding_unchanged_admin_data_writes_nothing(self) -> None:
+        req = func.HttpRequest(method="POST", url="/admin/seed", headers={}, params={}, route_params={}, body=b"")
+        with mock.patch.object(seed_admin_data, "publish_prompt_changes"):
+            self.assertEqual(seed_admin_data.main(req).status_code, 200)
+            uploads = self.container.uploads
+            blob._content_hashes.clear()  # a fresh process only knows what it reads
+            self.assertEqual(seed_admin_data.main(req).status_code, 200)
+
+        self.assertGreater(uploads, 0)
+        self.assertEqual(self.container.uploads, uploads)
+
+
+class CompressionTests(_FakeContainerTestCase):
+    def test_large_session_document_is_gzipped_and_read_back(self) -> None:
+        doc = {"messages": [{"role": "user", "content": f"turn {i} about mattress comfort"} for i in range(200)]}
+        blob.write_json("sessions/s1/conversation.json", doc)
+
+        stored, _ = self.container.blobs["sessions/s1/conversation.json"]
+        self.assertEqual(self.container.encodings["sessions/s1/conversation.json"], "gzip")
+        self.assertTrue(stored.startswith(b"\x1f\x8b"))
+        self.assertLess(len(stored), len(json.dumps(doc)))
+        blob._content_hashes.clear()
+        self.assertEqual(blob.read_json("sessions/s1/conversation.json"), doc)
+
+    def test_small_and_unmatched_documents_are_stored_plain(self) -> None:
+        blob.write_json("sessions/s1/pulse_state.json", {"current_stage": 2})
+        blob.write_json("prompts/p1.json", {"content": "x" * 10000})
+
+        self.assertIsNone(self.container.encodings["sessions/s1/pulse_state.json"])
+        self.assertIsNone(self.container.encodings["prompts/p1.json"])
+        self.assertEqual(blob.read_json("sessions/s1/pulse_state.json"), {"current_stage": 2})
+
+    def test_policies_use_longest_prefix(self) -> None:
+        policies = compression.parse_policies("sessions/=gzip,sessions/archive/=off,bad=lz4")
+        self.assertEqual(policies, [("sessions/archive/", None), ("sessions/", "gzip")])
+
+
+class AdminPromptConcurrencyTests(unittest.TestCase):
+    def _put(self, body: dict) -> func.HttpRequest:
+        return func.HttpRequest(
+            method="PUT",
+            url="/admin/prompts/p1",
+            headers={"Content-Type": "application/json"},
+            params={},
+            route_params={"id": "p1"},
+            body=json.dumps(body).encode("utf-8"),
+        )
+
+    @mock.patch.dict(os.environ, {"ADMIN_EDIT_ENABLED": "true"}, clear=False)
+    def test_stale_client_version_is_rejected(self) -> None:
+        current = {"id": "p1", "version": 3, "content": "x"}
+        with mock.patch.object(
+            admin_prompts_by_id, "read_json_with_etag", return_value=(current, '"e1"')
+        ), mock.patch.object(admin_prompts_by_id, "write_json") as write_mock:
+            resp = admin_prompts_by_id.main(self._put({"version": 2, "content": "y"}))
+
+        self.assertEqual(resp.status_code, 409)
+        write_mock.assert_not_called()
+
+    @mock.patch.dict(os.environ, {"ADMIN_EDIT_ENABLED": "true"}, clear=False)
+    def test_concurrent_modification_returns_409(self) -> None:
+        current = {"id": "p1", "version": 3, "content": "x"}
+        with mock.patch.object(
+            admin_prompts_by_id, "read_json_with_etag", return_value=(current, '"e1"')
+        ), mock.patch.object(
+            admin_prompts_by_id, "write_json", side_effect=blob.BlobConflictError("lost")
+        ) as write_mock, mock.patch.object(admin_prompts_by_id, "write_version") as version_mock:
+            resp = admin_prompts_by_id.main(self._put({"version": 3, "content": "y"}))
+
+        self.assertEqual(resp.status_code, 409)
+        self.assertEqual(write_mock.call_args.kwargs["etag"], '"e1"')
+        version_mock.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+import json
+import unittest
+from unittest import mock
+
+from shared_code import codec
+from shared_code.http import json_ok
+
+
+class CodecTests(unittest.TestCase):
+    DOC = {"transcript": ["Trainee: café ✓", "Customer: 10\" queen"], "score": 0.5, "ok": True, "none": None}
+
+    def test_round_trip_returns_bytes(self) -> None:
+        data = codec.dumps(self.DOC)
+        self.assertIsInstance(data, bytes)
+        self.assertEqual(codec.loads(data), self.DOC)
+        self.assertEqual(codec.loads(memoryview(data)), self.DOC)
+
+    def test_backends_produce_identical_bytes(self) -> None:
+        fast = codec.dumps(self.DOC)
+        with mock.patch.object(codec, "_USE_ORJSON", False):
+            slow = codec.dumps(self.DOC)
+            self.assertEqual(codec.loads(slow), self.DOC)
+        self.assertEqual(fast, slow)
+
+    def test_non_string_keys_match_stdlib(self) -> None:
+        self.assertEqual(json.loads(codec.dumps({1: "a"})), {"1": "a"})
+
+    def test_json_ok_body_is_utf8_json(self) -> None:
+        resp = json_ok({"message": "naïve"})
+        self.assertEqual(json.loads(resp.get_body().decode("utf-8")), {"message": "naïve"})
+
+
+if __name__ == "__main__":
+    unittest.main()
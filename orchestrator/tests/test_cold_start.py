@@ -0,0 +1,44 @@
+import os
+import subprocess
+import sys
+import unittest
+from unittest import mock
+
+from shared_code import warmup
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+HEAVY_MODULES = ("azure.storage.blob", "azure.core", "requests", "psycopg")
+
+
+class LazyImportTests(unittest.TestCase):
+    def _loaded_after_import(self, function: str) -> list:
+        code = (
+            f"import sys, azure.functions, {function}; "
+            f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+        )
+        out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+        return [m for m in out.stdout.strip().split(",") if m]
+
+    def test_entry_points_do_not_import_heavy_sdks(self) -> None:
+        for function in ("session_start", "session_complete", "chat", "feedback_session", "admin_prompts"):
+            with self.subTest(function=function):
+                self.assertEqual(self._loaded_after_import(function), [])
+
+
+class PrewarmTests(unittest.TestCase):
+    def test_failing_step_does_not_stop_the_others(self) -> None:
+        ran = []
+        steps = [
+            ("broken", mock.Mock(side_effect=RuntimeError("no storage"))),
+            ("ok", lambda: ran.append("ok")),
+        ]
+        with mock.patch.object(warmup, "_STEPS", steps):
+            timings = warmup.prewarm()
+
+        self.assertEqual(ran, ["ok"])
+        self.assertEqual(set(timings), {"broken", "ok"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import os
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+from shared_code import hedged_stt
+
+
+def _slow(seconds: float, result, started: list = None):
+    def call(*_args, **_kwargs):
+        if started is not None:
+            started.append(time.perf_counter())
+        time.sleep(seconds)
+        if isinstance(result, BaseException):
+            raise result
+        return result
+    return call
+
+
+def _throttled() -> requests.HTTPError:
+    return requests.HTTPError(response=mock.Mock(status_code=429))
+
+
+@mock.patch.dict(
+    os.environ,
+    {"STT_HEDGE_ENABLED": "true", "AZURE_SPEECH_KEY": "k", "STT_HEDGE_DELAY_MS": "100", "STT_HEDGE_MIN_DELAY_MS": "50"},
+)
+class HedgedTranscriptionTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.windows = {name: hedged_stt.LatencyWindow(200) for name in (hedged_stt.WHISPER, hedged_stt.SPEECH)}
+        patcher = mock.patch.object(hedged_stt, "_windows", self.windows)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def patch_providers(self, whisper, speech):
+        w = mock.patch("shared_code.openai_client.transcribe_audio", side_effect=whisper)
+        s = mock.patch("shared_code.avatar_service.transcribe_audio_speech_services", side_effect=speech)
+        whisper_mock, speech_mock = w.start(), s.start()
+        self.addCleanup(w.stop)
+        self.addCleanup(s.stop)
+        return whisper_mock, speech_mock
+
+    def test_fast_whisper_is_not_hedged(self) -> None:
+        _, speech = self.patch_providers(_slow(0.0, "Hello."), _slow(0.0, "Hi."))
+
+        self.assertEqual(hedged_stt.transcribe(b"audio"), "Hello.")
+        speech.assert_not_called()
+
+    def test_slow_whisper_loses_to_speech_services(self) -> None:
+        speech_started = []
+        self.patch_providers(_slow(0.6, "Hello from Whisper."), _slow(0.0, "Hello from Speech.", speech_started))
+
+        start = time.perf_counter()
+        self.assertEqual(hedged_stt.transcribe(b"audio"), "Hello from Speech.")
+        elapsed = time.perf_counter() - start
+
+        self.assertLess(elapsed, 0.4)
+        self.assertGreaterEqual(speech_started[0] - start, 0.09)  # waited out the hedge delay first
+
+    def test_throttled_whisper_hedges_immediately(self) -> None:
+        self.patch_providers(_slow(0.0, _throttled()), _slow(0.0, "Hello."))
+
+        start = time.perf_counter()
+        self.assertEqual(hedged_stt.transcribe(b"audio"), "Hello.")
+        self.assertLess(time.perf_counter() - start, 0.09)
+
+    def test_empty_hedge_waits_for_whisper(self) -> None:
+        self.patch_providers(_slow(0.3, "Late but right."), _slow(0.0, ""))
+
+        self.assertEqual(hedged_stt.transcribe(b"audio"), "Late but right.")
+
+    def test_both_failing_returns_none_and_both_empty_returns_empty(self) -> None:
+        self.patch_providers(_slow(0.0, RuntimeError("down")), _slow(0.0, None))
+        self.assertIsNone(hedged_stt.transcribe(b"audio"))
+
+        self.patch_providers(_slow(0.0, ""), _slow(0.0, ""))
+        self.assertEqual(hedged_stt.transcribe(b"audio"), "")
+
+    def test_delay_follows_observed_whisper_p90(self) -> None:
+        self.assertAlmostEqual(hedged_stt.hedge_delay_s(), 0.1)
+        for ms in range(100, 1100, 25):  # 40 samples, 100..1075 ms
+            self.windows[hedged_stt.WHISPER].add(ms / 1000.0)
+
+        self.assertAlmostEqual(hedged_stt.hedge_delay_s(), 1.0)
+        with mock.patch.dict(os.environ, {"STT_HEDGE_MAX_DELAY_MS": "800"}):
+            self.assertAlmostEqual(hedged_stt.hedge_delay_s(), 0.8)
+
+    def test_latency_is_recorded_per_provider(self) -> None:
+        self.patch_providers(_slow(0.3, "Hello."), _slow(0.0, "Hi."))
+
+        hedged_stt.transcribe(b"audio")
+        deadline = time.time() + 2
+        while len(self.windows[hedged_stt.WHISPER]) == 0 and time.time() < deadline:
+            time.sleep(0.02)  # the abandoned Whisper call still lands and is measured
+
+        self.assertEqual(len(self.windows[hedged_stt.SPEECH]), 1)
+        self.assertEqual(len(self.windows[hedged_stt.WHISPER]), 1)
+
+    @mock.patch.dict(os.environ, {"STT_HEDGE_ENABLED": "false"})
+    def test_disabled_is_plain_whisper(self) -> None:
+        _, speech = self.patch_providers(_slow(0.0, _throttled()), _slow(0.0, "Hi."))
+
+        with self.assertRaises(requests.HTTPError):
+            hedged_stt.transcribe(b"audio")
+        speech.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import unittest
+from unittest import mock
+
+from shared_code import blob, media_cache, openai_client
+from shared_code.memory_blob import memory_container
+
+
+def _response(text: str = "", content: bytes = b"") -> mock.Mock:
+    resp = mock.Mock(text=text, content=content)
+    resp.raise_for_status.return_value = None
+    return resp
+
+
+@mock.patch.dict(
+    os.environ,
+    {
+        "OPENAI_ENDPOINT": "https://example.invalid",
+        "AZURE_OPENAI_API_KEY": "test",
+        "OPENAI_DEPLOYMENT_PULSE_AUDIO_REALTIME": "audio",
+    },
+)
+class SpeechCacheTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.container = self.enterContext(memory_container())
+        media_cache.transcripts.memory.clear()
+        media_cache.speech.memory.clear()
+        self.session = mock.Mock()
+        for patcher in (
+            mock.patch("shared_code.openai_client.get_session", return_value=self.session),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_retried_upload_is_transcribed_once(self) -> None:
+        self.session.post.return_value = _response(text=" Hello there. ")
+
+        first = openai_client.transcribe_audio(b"chunk-bytes")
+        second = openai_client.transcribe_audio(b"chunk-bytes")
+
+        self.assertEqual((first, second), ("Hello there.", "Hello there."))
+        self.assertEqual(self.session.post.call_count, 1)
+
+        openai_client.transcribe_audio(b"chunk-bytes", language="es")
+        self.assertEqual(self.session.post.call_count, 2)
+
+    def test_blob_tier_serves_other_instances(self) -> None:
+        self.session.post.return_value = _response(content=b"\xff\xfbmp3")
+        openai_client.generate_speech("Hi there!", voice="alloy")
+        media_cache.speech.memory.clear()  # as seen from a fresh instance
+
+        with mock.patch.object(media_cache.LOOKUPS, "labels", wraps=media_cache.LOOKUPS.labels) as labels:
+            audio = openai_client.generate_speech("Hi there!", voice="alloy")
+
+        self.assertEqual(audio, b"\xff\xfbmp3")
+        self.assertEqual(self.session.post.call_count, 1)
+        labels.assert_called_once_with("tts_audio", "blob")
+        self.assertIn(media_cache.speech_key("Hi there!", "alloy", 1.0, "audio"), media_cache.speech.memory)
+
+    def test_transcripts_stay_out_of_blob_unless_enabled(self) -> None:
+        self.session.post.return_value = _response(text="Hello.")
+        path = media_cache.transcripts._path(media_cache.transcript_key(b"chunk-bytes", "en", "PULSE-Whisper"))
+
+        openai_client.transcribe_audio(b"chunk-bytes", language="en")
+        self.assertIsNone(blob.read_bytes(path))
+
+        media_cache.transcripts.memory.clear()
+        with mock.patch.dict(os.environ, {"STT_CACHE_BLOB_ENABLED": "true"}):
+            openai_client.transcribe_audio(b"chunk-bytes", language="en")
+        self.assertEqual(blob.read_bytes(path), b"Hello.")
+
+    def test_voice_and_speed_are_part_of_the_key(self) -> None:
+        self.session.post.return_value = _response(content=b"\xff\xfbmp3")
+
+        openai_client.generate_speech("Hi there!", voice="alloy")
+        openai_client.generate_speech("Hi there!", voice="nova")
+        openai_client.generate_speech("Hi there!", voice="alloy", speed=1.25)
+
+        self.assertEqual(self.session.post.call_count, 3)
+
+    def test_storage_failure_is_a_miss(self) -> None:
+        self.session.post.return_value = _response(text="Hello.")
+        with mock.patch.object(blob, "get_container_client", side_effect=RuntimeError("no storage")):
+            self.assertEqual(openai_client.transcribe_audio(b"other-bytes"), "Hello.")
+            self.assertEqual(openai_client.transcribe_audio(b"other-bytes"), "Hello.")
+
+        self.assertEqual(self.session.post.call_count, 1)  # served from the in-process tier
+
+    def test_empty_transcript_is_not_cached(self) -> None:
+        self.session.post.return_value = _response(text="  ")
+
+        openai_client.transcribe_audio(b"silence")
+        openai_client.transcribe_audio(b"silence")
+
+        self.assertEqual(self.session.post.call_count, 2)
+
+    @mock.patch.dict(os.environ, {"MEDIA_CACHE_ENABLED": "false"})
+    def test_cache_can_be_disabled(self) -> None:
+        self.session.post.return_value = _response(content=b"\xff\xfbmp3")
+
+        openai_client.generate_speech("Hi there!")
+        openai_client.generate_speech("Hi there!")
+
+        self.assertEqual(self.session.post.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
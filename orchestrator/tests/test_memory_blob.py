@@ -0,0 +1,50 @@
+import unittest
+from unittest import mock
+
+from shared_code import blob
+from shared_code.memory_blob import memory_container
+
+
+class MemoryBackendTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.container = self.enterContext(memory_container())
+
+    def test_round_trip_with_metadata_and_listing(self) -> None:
+        etag = blob.write_json("sessions/a/session.json", {"status": "active"}, metadata={"persona": "Thinker"})
+
+        self.assertEqual(blob.read_json("sessions/a/session.json"), {"status": "active"})
+        self.assertEqual(blob.get_blob_etag("sessions/a/session.json"), etag)
+        self.assertEqual(blob.list_blobs_with_metadata("sessions/"), [("sessions/a/session.json", {"persona": "Thinker"})])
+        self.assertIsNone(blob.read_json("sessions/missing.json"))
+
+    def test_preconditions_raise_conflicts(self) -> None:
+        blob.write_json("prompts/p.json", {"v": 1}, create_only=True)
+        with self.assertRaises(blob.BlobConflictError):
+            blob.write_json("prompts/p.json", {"v": 2}, create_only=True)
+        with self.assertRaises(blob.BlobConflictError):
+            blob.write_json("prompts/p.json", {"v": 2}, etag='"stale"')
+
+    def test_update_json_retries_against_interleaved_writer(self) -> None:
+        blob.write_json("sessions/a/conversation.json", {"messages": ["a"]})
+        interleaved = []
+
+        def mutate(doc):
+            if not interleaved:
+                # Another request appends between our read and our conditional write.
+                interleaved.append(True)
+                other = blob.read_json("sessions/a/conversation.json")
+                self.container.get_blob_client("sessions/a/conversation.json").upload_blob(
+                    blob.codec.dumps({"messages": other["messages"] + ["b"]}), overwrite=True
+                )
+            doc["messages"].append("c")
+            return doc
+
+        with mock.patch.object(blob.time, "sleep"):
+            result = blob.update_json("sessions/a/conversation.json", mutate)
+
+        self.assertEqual(result["messages"], ["a", "b", "c"])
+        self.assertEqual(blob.read_json("sessions/a/conversation.json")["messages"], ["a", "b", "c"])
+
+
+if __name__ == "__main__":
+    unittest.main()
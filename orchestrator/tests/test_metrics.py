@@ -0,0 +1,84 @@
+import unittest
+from unittest import mock
+
+import azure.functions as func
+
+import metrics as metrics_endpoint
+from shared_code import blob, metrics
+from shared_code.tracing import traced
+from tests.test_blob import _FakeContainer
+
+
+def _request() -> func.HttpRequest:
+    return func.HttpRequest(method="GET", url="/api/metrics", headers={}, params={}, route_params={}, body=b"")
+
+
+def _lines(prefix: str) -> list:
+    return [line for line in metrics.render().splitlines() if line.startswith(prefix)]
+
+
+class HistogramTests(unittest.TestCase):
+    def test_buckets_render_cumulative_counts(self) -> None:
+        registry = metrics.Registry()
+        hist = registry.register(metrics.Histogram("t_seconds", "test", ("op",), buckets=(0.1, 1.0)))
+        child = hist.labels("read")
+        for value in (0.05, 0.1, 0.5, 2.0):
+            child.observe(value)
+
+        out = registry.render().splitlines()
+        self.assertIn("# TYPE t_seconds histogram", out)
+        self.assertIn('t_seconds_bucket{op="read",le="0.1"} 2', out)  # upper bounds are inclusive
+        self.assertIn('t_seconds_bucket{op="read",le="1"} 3', out)
+        self.assertIn('t_seconds_bucket{op="read",le="+Inf"} 4', out)
+        self.assertIn('t_seconds_count{op="read"} 4', out)
+        self.assertIn('t_seconds_sum{op="read"} 2.65', out)
+
+    def test_label_children_are_cached_and_arity_checked(self) -> None:
+        counter = metrics.Counter("t_total", "test", ("a", "b"))
+        self.assertIs(counter.labels("x", "y"), counter.labels("x", "y"))
+        with self.assertRaises(ValueError):
+            counter.labels("x")
+
+    def test_label_values_are_escaped(self) -> None:
+        registry = metrics.Registry()
+        registry.register(metrics.Counter("t_total", "test", ("path",))).labels('a"b\\c').inc()
+        self.assertIn('t_total{path="a\\"b\\\\c"} 1', registry.render())
+
+
+class InstrumentationTests(unittest.TestCase):
+    def test_traced_request_is_recorded_by_route_and_status(self) -> None:
+        @traced("metrics-test/route")
+        def main(req: func.HttpRequest) -> func.HttpResponse:
+            return func.HttpResponse("ok", status_code=201)
+
+        before = metrics.REQUEST_LATENCY.labels("metrics-test/route", "GET", "201").count
+        main(_request())
+        self.assertEqual(metrics.REQUEST_LATENCY.labels("metrics-test/route", "GET", "201").count, before + 1)
+
+    def test_blob_operations_and_skipped_writes_are_exported(self) -> None:
+        @traced("metrics-test/blob")
+        def main(req: func.HttpRequest) -> func.HttpResponse:
+            etag = blob.write_json("sessions/m.json", {"a": 1})
+            blob.write_json("sessions/m.json", {"a": 1}, etag=etag)
+            return func.HttpResponse("ok", status_code=200)
+
+        skipped_before = blob.get_write_stats()["skipped"]
+        with blob.use_container(_FakeContainer()):
+            main(_request())
+
+        self.assertIn(f'pulse_blob_writes_total{{result="skipped"}} {skipped_before + 1}', _lines("pulse_blob_writes"))
+        # The skipped write never reaches storage, so only one round trip is counted.
+        self.assertIn('pulse_blob_operations_total{route="metrics-test/blob",op="write"} 1', _lines("pulse_blob_op"))
+        self.assertTrue(_lines('pulse_cache_entries{cache="blob_content_hash"}'))
+
+
+class MetricsEndpointTests(unittest.TestCase):
+    def test_endpoint_serves_prometheus_text(self) -> None:
+        resp = metrics_endpoint.main(_request())
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.headers["Content-Type"].startswith("text/plain; version=0.0.4"))
+        body = resp.get_body().decode("utf-8")
+        self.assertIn("# TYPE pulse_http_request_duration_seconds histogram", body)
+        self.assertIn("pulse_worker_info{", body)
+        self.assertTrue(body.endswith("\n"))
@@ -0,0 +1,115 @@
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+from mock_openai_server import MockConfig, start_in_thread  # noqa: E402
+from shared_code import openai_client  # noqa: E402
+
+
+class _MockServerTestCase(unittest.TestCase):
+    config = MockConfig()
+
+    def setUp(self) -> None:
+        self.server, self.url = start_in_thread(self.config)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        env = mock.patch.dict(
+            os.environ,
+            {
+                "OPENAI_ENDPOINT": self.url,
+                "AZURE_OPENAI_API_KEY": "mock",
+                "OPENAI_DEPLOYMENT_PERSONA_CORE_CHAT": "core-chat",
+                "OPENAI_DEPLOYMENT_PULSE_AUDIO_REALTIME": "audio",
+            },
+        )
+        env.start()
+        self.addCleanup(env.stop)
+
+    def chat_url(self, deployment: str = "core-chat") -> str:
+        return f"{self.url}/openai/deployments/{deployment}/chat/completions?api-version=2024-12-01-preview"
+
+
+class MockServerTests(_MockServerTestCase):
+    def test_persona_replies_are_deterministic_and_in_character(self) -> None:
+        first = openai_client.generate_conversation_response("What brings you in?", "Thinker", [])
+        second = openai_client.generate_conversation_response("What brings you in?", "Thinker", [])
+
+        self.assertEqual(first, second)
+        self.assertTrue(any(word in first for word in ("warranty", "data", "density", "trial")))
+
+    def test_streaming_matches_non_streaming_content(self) -> None:
+        payload = {"messages": [{"role": "user", "content": "Hello"}]}
+        whole = requests.post(self.chat_url(), json=payload, timeout=5).json()
+
+        resp = requests.post(
+            self.chat_url(),
+            json={**payload, "stream": True, "stream_options": {"include_usage": True}},
+            stream=True,
+            timeout=5,
+        )
+        events = [line[len(b"data: "):] for line in resp.iter_lines() if line.startswith(b"data: ")]
+
+        self.assertEqual(resp.headers["Content-Type"], "text/event-stream")
+        self.assertEqual(events[-1], b"[DONE]")
+        chunks = [json.loads(e) for e in events[:-1]]
+        text = "".join(c["choices"][0]["delta"].get("content", "") for c in chunks if c["choices"])
+        self.assertEqual(text, whole["choices"][0]["message"]["content"])
+        self.assertEqual(chunks[-1]["usage"], whole["usage"])
+
+    def test_client_stream_yields_the_same_reply(self) -> None:
+        whole = openai_client.generate_conversation_response("What brings you in?", "Relater", [])
+
+        deltas = list(openai_client.stream_conversation_response("What brings you in?", "Relater", []))
+
+        self.assertGreater(len(deltas), 1)
+        self.assertEqual("".join(deltas).strip(), whole)
+
+    def test_json_mode_returns_a_parseable_document(self) -> None:
+        resp = requests.post(
+            self.chat_url(),
+            json={
+                "messages": [{"role": "system", "content": "You are the PULSE Training Coach."}],
+                "response_format": {"type": "json_object"},
+            },
+            timeout=5,
+        )
+        self.assertEqual(json.loads(resp.json()["choices"][0]["message"]["content"])["mode"], "ask_followup")
+
+    def test_audio_routes(self) -> None:
+        self.assertTrue(openai_client.transcribe_audio(b"\x1a\x45\xdf\xa3" * 100))
+        self.assertTrue(openai_client.generate_speech("Hello there, how can I help?").startswith(b"\xff\xfb"))
+
+
+class InjectedThrottlingTests(_MockServerTestCase):
+    config = MockConfig(rate_429=1.0, retry_after_s=3)
+
+    def test_429_carries_retry_after(self) -> None:
+        resp = requests.post(self.chat_url(), json={"messages": []}, timeout=5)
+
+        self.assertEqual(resp.status_code, 429)
+        self.assertEqual(resp.headers["Retry-After"], "3")
+        self.assertEqual(resp.headers["retry-after-ms"], "3000")
+        self.assertEqual(requests.get(f"{self.url}/stats", timeout=5).json()["throttled"], 1)
+
+
+class TokenBudgetTests(_MockServerTestCase):
+    config = MockConfig(tpm=600)
+
+    def test_budget_is_per_deployment_and_reports_the_wait(self) -> None:
+        big = {"messages": [{"role": "user", "content": "x" * 2000}]}  # ~500 prompt tokens
+
+        self.assertEqual(requests.post(self.chat_url(), json=big, timeout=5).status_code, 200)
+        throttled = requests.post(self.chat_url(), json=big, timeout=5)
+        self.assertEqual(throttled.status_code, 429)
+        self.assertGreater(int(throttled.headers["retry-after-ms"]), 1000)
+        self.assertEqual(requests.post(self.chat_url("other"), json=big, timeout=5).status_code, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from shared_code import prompt_registry
+from shared_code.prompt_registry import PromptRegistry, PromptTemplate
+
+
+class PromptTemplateTests(unittest.TestCase):
+    def test_render_substitutes_placeholders_and_keeps_json_braces(self) -> None:
+        tmpl = PromptTemplate("p", 'Persona: $persona_type\nReturn {"mode": "x"}', version=None, source="default")
+        self.assertEqual(tmpl.render(persona_type="Thinker"), 'Persona: Thinker\nReturn {"mode": "x"}')
+        self.assertGreater(tmpl.token_count, 0)
+
+    def test_static_template_returns_text(self) -> None:
+        tmpl = PromptTemplate("p", "No placeholders here", version=3, source="blob")
+        self.assertEqual(tmpl.render(persona_type="ignored"), "No placeholders here")
+
+
+class PromptRegistryTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.store: dict = {}
+        self.etag = None
+        patches = [
+            mock.patch.object(prompt_registry, "read_json", side_effect=self._read),
+            mock.patch.object(prompt_registry, "get_blob_etag", side_effect=lambda path: self.etag),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.reads = 0
+        self.registry = PromptRegistry(poll_seconds=0)
+        self.registry.register_default("persona", "Default $persona_type")
+
+    def _read(self, path: str):
+        self.reads += 1
+        return self.store.get(path)
+
+    def test_default_is_served_when_no_blob_prompt_exists(self) -> None:
+        self.assertEqual(self.registry.render("persona", persona_type="Director"), "Default Director")
+        self.assertIsNone(self.registry.get("unknown"))
+
+    def test_blob_prompt_is_loaded_once_then_served_from_memory(self) -> None:
+        self.store["prompts/persona.json"] = {"content": "Admin $persona_type", "version": 2}
+
+        self.assertEqual(self.registry.render("persona", persona_type="Relater"), "Admin Relater")
+        reads_after_first = self.reads
+        for _ in range(5):
+            self.registry.render("persona", persona_type="Relater")
+        self.assertEqual(self.reads, reads_after_first)
+
+    def test_refresh_reloads_only_changed_versions(self) -> None:
+        self.store["prompts/persona.json"] = {"content": "v1 $persona_type", "version": 1}
+        self.registry.get("persona")
+
+        self.etag = "etag-1"
+        self.store[prompt_registry.MANIFEST_PATH] = {"prompts": {"persona": 1}}
+        self.assertTrue(self.registry.refresh())
+        self.assertEqual(self.registry.render("persona", persona_type="X"), "v1 X")
+
+        # Unchanged ETag: no storage reads beyond the ETag check.
+        reads = self.reads
+        self.assertFalse(self.registry.refresh())
+        self.assertEqual(self.reads, reads)
+
+        self.etag = "etag-2"
+        self.store[prompt_registry.MANIFEST_PATH] = {"prompts": {"persona": 2}}
+        self.store["prompts/persona.json"] = {"content": "v2 $persona_type", "version": 2}
+        self.assertTrue(self.registry.refresh())
+        self.assertEqual(self.registry.render("persona", persona_type="X"), "v2 X")
+
+    def test_deleted_prompt_falls_back_to_default(self) -> None:
+        self.store["prompts/persona.json"] = {"content": "gone", "version": 4, "deleted": True}
+        self.assertEqual(self.registry.render("persona", persona_type="Thinker"), "Default Thinker")
+
+
+    def test_failed_first_read_is_retried(self) -> None:
+        self.store["prompts/evaluator.json"] = {"content": "Evaluate", "version": 1}
+        with mock.patch.object(prompt_registry, "read_json", side_effect=ConnectionError("storage down")):
+            self.assertIsNone(self.registry.get("evaluator"))
+
+        self.assertEqual(self.registry.render("evaluator"), "Evaluate")
+
+    def test_concurrent_first_callers_wait_for_the_load(self) -> None:
+        self.store["prompts/evaluator.json"] = {"content": "Evaluate", "version": 1}
+        reading = threading.Event()
+        release = threading.Event()
+
+        def slow_read(path: str):
+            reading.set()
+            release.wait(2)
+            return self._read(path)
+
+        results = []
+        with mock.patch.object(prompt_registry, "read_json", side_effect=slow_read):
+            first = threading.Thread(target=lambda: results.append(self.registry.get("evaluator")))
+            first.start()
+            reading.wait(2)
+            second = threading.Thread(target=lambda: results.append(self.registry.get("evaluator")))
+            second.start()
+            time.sleep(0.05)
+            release.set()
+            first.join(2)
+            second.join(2)
+
+        self.assertEqual([t.text if t else None for t in results], ["Evaluate", "Evaluate"])
+        self.assertEqual(self.reads, 1)
+
+class PublishPromptChangesTests(unittest.TestCase):
+    def test_merges_versions_into_manifest(self) -> None:
+        existing = {"prompts": {"a": 1}}
+        with mock.patch.object(prompt_registry, "update_json") as update_mock:
+            prompt_registry.publish_prompt_changes({"b": 2})
+
+        path, merge = update_mock.call_args.args
+        self.assertEqual(path, prompt_registry.MANIFEST_PATH)
+        self.assertEqual(merge(existing)["prompts"], {"a": 1, "b": 2})
+        self.assertEqual(merge(None)["prompts"], {"b": 2})
+        self.assertIsNone(merge({"prompts": {"a": 1, "b": 2}}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import json
+import unittest
+from unittest import mock
+
+import azure.functions as func
+
+import admin_prompt_versions
+from shared_code import prompt_versions
+
+
+def _listing(count: int):
+    return [
+        (
+            f"prompts/p1/versions/{v}.json",
+            {"version": str(v), "updatedat": f"2025-01-{v:02d}T00%3A00%3A00Z", "updatedby": "dev-operator"},
+        )
+        for v in range(1, count + 1)
+    ]
+
+
+class ListVersionsTests(unittest.TestCase):
+    def test_lists_from_metadata_without_downloads(self) -> None:
+        with mock.patch.object(prompt_versions, "list_blobs_with_metadata", return_value=_listing(3)), mock.patch.object(
+            prompt_versions, "read_json"
+        ) as read_mock:
+            items, next_before = prompt_versions.list_versions("p1")
+
+        read_mock.assert_not_called()
+        self.assertIsNone(next_before)
+        self.assertEqual([i["version"] for i in items], [3, 2, 1])
+        self.assertEqual(items[0]["updatedAt"], "2025-01-03T00:00:00Z")
+        self.assertEqual(items[0]["updatedBy"], "dev-operator")
+
+    def test_pagination_with_limit_and_before(self) -> None:
+        with mock.patch.object(prompt_versions, "list_blobs_with_metadata", return_value=_listing(10)):
+            first, cursor = prompt_versions.list_versions("p1", limit=4)
+            second, last_cursor = prompt_versions.list_versions("p1", limit=4, before=cursor)
+
+        self.assertEqual([i["version"] for i in first], [10, 9, 8, 7])
+        self.assertEqual(cursor, 7)
+        self.assertEqual([i["version"] for i in second], [6, 5, 4, 3])
+        self.assertEqual(last_cursor, 3)
+
+    def test_legacy_version_is_read_once_and_backfilled(self) -> None:
+        listing = [("prompts/p1/versions/1.json", {}), ("prompts/p1/versions/index.txt", {})]
+        doc = {"version": 1, "updatedAt": "2025-01-01T00:00:00Z", "updatedBy": "seed"}
+        with mock.patch.object(prompt_versions, "list_blobs_with_metadata", return_value=listing), mock.patch.object(
+            prompt_versions, "read_json", return_value=doc
+        ), mock.patch.object(prompt_versions, "set_blob_metadata") as meta_mock:
+            items, _ = prompt_versions.list_versions("p1")
+
+        self.assertEqual(items, [{"version": 1, "updatedAt": "2025-01-01T00:00:00Z", "updatedBy": "seed"}])
+        path, meta = meta_mock.call_args.args
+        self.assertEqual(path, "prompts/p1/versions/1.json")
+        self.assertEqual(meta["version"], "1")
+
+
+class DeltaVersionStorageTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.store: dict = {}
+        prompt_versions._version_cache.clear()
+        patches = [
+            mock.patch.object(prompt_versions, "read_json", side_effect=lambda path: self.store.get(path)),
+            mock.patch.object(
+                prompt_versions,
+                "write_json",
+                side_effect=lambda path, obj, metadata=None: self.store.__setitem__(path, json.loads(json.dumps(obj))),
+            ),
+            mock.patch.object(prompt_versions, "_SNAPSHOT_INTERVAL", 4),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def _doc(self, version: int, content: str) -> dict:
+        return {"id": "p1", "title": "Persona", "version": version, "updatedBy": "dev-operator", "content": content}
+
+    def test_round_trip_with_periodic_snapshots(self) -> None:
+        base = "".join(f"Line {i} of a long persona system prompt.\n" for i in range(40))
+        contents = [base]
+        for v in range(2, 10):
+            contents.append(contents[-1].replace(f"Line {v} ", f"Edited line {v} ") + f"Appendix {v}\n")
+
+        for v, content in enumerate(contents, start=1):
+            prompt_versions.write_version("p1", self._doc(v, content))
+
+        # Versions 1, 5 and 9 are snapshots; the rest are deltas against them.
+        self.assertNotIn("delta", self.store["prompts/p1/versions/1.json"])
+        self.assertEqual(self.store["prompts/p1/versions/3.json"]["delta"]["base"], 1)
+        self.assertNotIn("content", self.store["prompts/p1/versions/3.json"])
+        self.assertNotIn("delta", self.store["prompts/p1/versions/5.json"])
+        self.assertEqual(self.store["prompts/p1/versions/8.json"]["delta"]["base"], 5)
+
+        prompt_versions._version_cache.clear()
+        for v, content in enumerate(contents, start=1):
+            doc = prompt_versions.read_version("p1", v)
+            assert doc is not None
+            self.assertEqual(doc["content"], content)
+            self.assertEqual(doc["version"], v)
+            self.assertNotIn("delta", doc)
+
+    def test_reconstructed_versions_are_served_from_lru(self) -> None:
+        prompt_versions.write_version("p1", self._doc(1, "a\nb\nc\n" * 20))
+        prompt_versions.write_version("p1", self._doc(2, "a\nb\nc\n" * 20 + "d\n"))
+        prompt_versions._version_cache.clear()
+
+        first = prompt_versions.read_version("p1", 2)
+        with mock.patch.object(prompt_versions, "read_json") as read_mock:
+            second = prompt_versions.read_version("p1", 2)
+
+        read_mock.assert_not_called()
+        self.assertEqual(first, second)
+
+    def test_legacy_full_versions_are_read_as_is(self) -> None:
+        self.store["prompts/p1/versions/7.json"] = self._doc(7, "legacy content")
+        doc = prompt_versions.read_version("p1", 7)
+        assert doc is not None
+        self.assertEqual(doc["content"], "legacy content")
+
+
+class AdminPromptVersionsEndpointTests(unittest.TestCase):
+    def _request(self, params: dict) -> func.HttpRequest:
+        return func.HttpRequest(
+            method="GET",
+            url="/admin/prompt/p1/versions",
+            headers={},
+            params=params,
+            route_params={"id": "p1"},
+            body=b"",
+        )
+
+    def test_invalid_limit_returns_400(self) -> None:
+        resp = admin_prompt_versions.main(self._request({"limit": "abc"}))
+        self.assertEqual(resp.status_code, 400)
+
+    def test_returns_next_before_cursor(self) -> None:
+        with mock.patch.object(admin_prompt_versions, "list_versions", return_value=([{"version": 5}], 5)) as list_mock:
+            resp = admin_prompt_versions.main(self._request({"limit": "1"}))
+
+        self.assertEqual(resp.status_code, 200)
+        data = json.loads(resp.get_body())
+        self.assertEqual(data["nextBefore"], 5)
+        list_mock.assert_called_once_with("p1", limit=1, before=None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+
+from shared_code import avatar_service
+from shared_code.refresh_cache import RefreshAheadCache
+
+
+class RefreshAheadCacheTests(unittest.TestCase):
+    def test_concurrent_misses_share_one_fetch(self) -> None:
+        calls = []
+
+        def fetch(key):
+            calls.append(key)
+            time.sleep(0.05)
+            return f"token-{len(calls)}", 60
+
+        cache = RefreshAheadCache("test", fetch, refresh_ahead_s=10)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get("eastus2"))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(calls, ["eastus2"])
+        self.assertEqual({value for value, _ in results}, {"token-1"})
+
+    def test_value_near_expiry_is_served_while_one_background_refresh_runs(self) -> None:
+        released = threading.Event()
+        calls = []
+
+        def fetch(key):
+            calls.append(key)
+            if len(calls) > 1:
+                released.wait(2)
+            return f"token-{len(calls)}", 5
+
+        cache = RefreshAheadCache("test", fetch, refresh_ahead_s=10)  # every value is already "near expiry"
+        self.assertEqual(cache.get("k")[0], "token-1")
+
+        served = [cache.get("k")[0] for _ in range(5)]
+        fetches_while_refreshing = len(calls)
+        released.set()
+        deadline = time.time() + 2
+        while cache.get("k")[0] != "token-2" and time.time() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(served, ["token-1"] * 5)
+        self.assertEqual(fetches_while_refreshing, 2)
+
+    def test_failures_are_not_cached(self) -> None:
+        results = iter([None, ("token", 60)])
+        cache = RefreshAheadCache("test", lambda key: next(results), refresh_ahead_s=10)
+
+        self.assertIsNone(cache.get("k"))
+        self.assertEqual(cache.get("k")[0], "token")
+
+    def test_unexpired_value_survives_a_failed_refresh(self) -> None:
+        results = iter([("token", 5), None])
+        cache = RefreshAheadCache("test", lambda key: next(results, None), refresh_ahead_s=10)
+        cache.get("k")
+
+        time.sleep(0.05)  # background refresh fails
+
+        value, remaining = cache.get("k")
+        self.assertEqual(value, "token")
+        self.assertGreater(remaining, 4)
+
+
+@mock.patch.dict(os.environ, {"AZURE_SPEECH_KEY": "key", "AZURE_SPEECH_REGION": "eastus2"})
+class AvatarTokenCacheTests(unittest.TestCase):
+    def setUp(self) -> None:
+        avatar_service._speech_tokens.clear()
+        avatar_service._ice_servers.clear()
+        self.addCleanup(avatar_service._speech_tokens.clear)
+        self.addCleanup(avatar_service._ice_servers.clear)
+        self.session = mock.Mock()
+        self.session.post.return_value = mock.Mock(text="sts-token")
+        self.session.get.return_value = mock.Mock(json=mock.Mock(return_value={"Urls": ["turn:relay"]}))
+        patcher = mock.patch.object(avatar_service, "get_session", return_value=self.session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_token_and_ice_servers_are_fetched_once_per_region(self) -> None:
+        first = avatar_service.get_avatar_token()
+        second = avatar_service.get_avatar_token()
+
+        self.assertEqual((first["token"], first["ice_servers"]), ("sts-token", {"Urls": ["turn:relay"]}))
+        self.assertEqual(second["token"], "sts-token")
+        self.assertLessEqual(second["expires_in"], 600)
+        self.assertEqual((self.session.post.call_count, self.session.get.call_count), (1, 1))
+
+        with mock.patch.dict(os.environ, {"AZURE_SPEECH_REGION": "westus2"}):
+            avatar_service.get_avatar_token()
+        self.assertEqual(self.session.post.call_count, 2)
+
+    def test_failed_token_request_returns_none(self) -> None:
+        self.session.post.side_effect = ConnectionError("sts down")
+
+        self.assertIsNone(avatar_service.get_avatar_token())
+        self.session.get.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
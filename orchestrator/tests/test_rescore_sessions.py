@@ -0,0 +1,106 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import azure.functions as func
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+import chat  # noqa: E402
+import rescore_sessions  # noqa: E402
+from shared_code import blob  # noqa: E402
+from shared_code.memory_blob import memory_container  # noqa: E402
+
+TRAINEE_TURNS = [
+    "What brings you in today?",
+    "So you're saying your back gets stiff by the morning?",
+    "Since you mentioned the stiffness, the adjustable base will help with that.",
+    "I'd recommend the split king with the adjustable base.",
+    "Would you like to try it for a few minutes?",
+    "Are you ready to set up delivery?",
+]
+
+
+def _chat(session_id: str, message: str) -> dict:
+    req = func.HttpRequest(
+        method="POST",
+        url="/api/chat",
+        headers={},
+        params={},
+        route_params={},
+        body=json.dumps({"sessionId": session_id, "message": message, "persona": "Relater"}).encode("utf-8"),
+    )
+    return json.loads(chat.main(req).get_body())
+
+
+class _MemoryStorageTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.container = self.enterContext(memory_container())
+
+
+class ReplayTests(_MemoryStorageTestCase):
+    def test_replay_reproduces_the_scorecard_chat_saved(self) -> None:
+        with mock.patch(
+            "shared_code.openai_client.generate_conversation_response", return_value="I see. Tell me more."
+        ):
+            for message in TRAINEE_TURNS:
+                outcome = _chat("s1", message)["saleOutcome"]["status"]
+                if outcome in ("won", "lost"):
+                    break
+
+        stored = blob.read_json("sessions/s1/scorecard.json")
+        self.assertIsNotNone(stored)
+        messages = blob.read_json("sessions/s1/conversation.json")["messages"]
+
+        replay = chat._replay_conversation("s1", messages)
+
+        self.assertEqual(replay["scorecard"], stored)
+
+    def test_replay_without_conclusion_has_no_scorecard(self) -> None:
+        replay = chat._replay_conversation("s2", [{"role": "user", "content": "Hello there."}])
+
+        self.assertIsNone(replay["scorecard"])
+        self.assertEqual(replay["sale_state"]["outcome"], "in_progress")
+
+
+class RescoreRunTests(_MemoryStorageTestCase):
+    def _store_session(self, session_id: str, messages: list, scorecard=None) -> None:
+        blob.write_json(f"sessions/{session_id}/conversation.json", {"messages": messages})
+        if scorecard is not None:
+            blob.write_json(f"sessions/{session_id}/scorecard.json", scorecard)
+
+    def test_reports_changed_sessions_and_writes_under_run_prefix(self) -> None:
+        messages = []
+        for turn in TRAINEE_TURNS:
+            messages += [{"role": "user", "content": turn}, {"role": "assistant", "content": "Okay."}]
+        current = chat._replay_conversation("same", messages)["scorecard"]
+        stale = json.loads(json.dumps(current))
+        stale["overall"]["score"] = 10
+        self._store_session("same", messages, current)
+        self._store_session("stale", messages, stale)
+        self._store_session("open", messages[:2])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            report_path = os.path.join(tmp, "report.jsonl")
+            summary = rescore_sessions.run("blob", workers=1, write=True, report_path=report_path, run_id="t1")
+            with open(report_path, encoding="utf-8") as fh:
+                report = [json.loads(line) for line in fh]
+
+        self.assertEqual(summary["counts"], {"changed": 1, "not_concluded": 1, "unchanged": 1})
+        self.assertEqual([r["session_id"] for r in report], ["stale"])
+        self.assertEqual(report[0]["changes"]["overall.score"], [10, current["overall"]["score"]])
+        self.assertEqual(blob.read_json("rescoring/t1/sessions/stale/scorecard.json"), current)
+        self.assertEqual(blob.read_json("sessions/stale/scorecard.json"), stale)  # not applied
+
+    def test_transcript_lines_become_messages(self) -> None:
+        self.assertEqual(
+            rescore_sessions.transcript_to_messages(["Trainee: Hi: there", "Customer: Hello", "noise"]),
+            [{"role": "user", "content": "Hi: there"}, {"role": "assistant", "content": "Hello"}],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
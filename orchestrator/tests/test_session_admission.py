@@ -0,0 +1,157 @@
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+
+from azure.core.exceptions import ResourceExistsError
+
+from shared_code import blob, session_admission
+from shared_code.memory_blob import MemoryContainerClient, memory_container
+
+
+@mock.patch.dict(os.environ, {"AUDIO_ADMISSION_POLL_MS": "10", "AUDIO_ADMISSION_WAIT_MS": "2000"})
+class SessionAdmissionTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.container = self.enterContext(memory_container())
+
+    def admit_in_thread(self, transcript: str, results: dict) -> threading.Thread:
+        thread = threading.Thread(target=lambda: results.__setitem__(transcript, session_admission.admit("s1", transcript)))
+        thread.start()
+        return thread
+
+    def wait_for_waiters(self, count: int) -> None:
+        deadline = time.time() + 2
+        while time.time() < deadline:
+            doc = blob.read_json("sessions/s1/admission.json") or {}
+            if len(doc.get("waiting") or []) >= count:
+                return
+            time.sleep(0.005)
+        self.fail(f"expected {count} waiter(s)")
+
+    def test_uncontended_turn_is_admitted_at_once(self) -> None:
+        first = session_admission.admit("s1", "hello")
+
+        self.assertEqual((first["status"], first["transcript"]), (session_admission.ADMITTED, "hello"))
+        session_admission.release(first)
+        session_admission.release(first)  # idempotent
+        self.assertEqual(session_admission.admit("s1", "again")["status"], session_admission.ADMITTED)
+
+    def test_queue_admits_waiters_in_arrival_order(self) -> None:
+        holder = session_admission.admit("s1", "first")
+        results: dict = {}
+        second = self.admit_in_thread("second", results)
+        self.wait_for_waiters(1)
+        third = self.admit_in_thread("third", results)
+        self.wait_for_waiters(2)
+
+        session_admission.release(holder)
+        second.join(2)
+        self.assertNotIn("third", results)
+        self.assertEqual(results["second"]["status"], session_admission.ADMITTED)
+        self.assertGreater(results["second"]["waited_ms"], 0)
+        session_admission.release(results["second"])
+        third.join(2)
+
+        self.assertEqual(results["third"]["status"], session_admission.ADMITTED)
+        session_admission.release(results["third"])
+
+    @mock.patch.dict(os.environ, {"AUDIO_ADMISSION_MAX_QUEUE": "1"})
+    def test_queue_depth_is_bounded(self) -> None:
+        holder = session_admission.admit("s1", "first")
+        results: dict = {}
+        waiter = self.admit_in_thread("second", results)
+        self.wait_for_waiters(1)
+
+        rejected = session_admission.admit("s1", "third")
+
+        self.assertEqual((rejected["status"], rejected["reason"]), (session_admission.REJECTED, "queue_full"))
+        session_admission.release(holder)
+        waiter.join(2)
+        session_admission.release(results["second"])
+
+    @mock.patch.dict(os.environ, {"AUDIO_ADMISSION_WAIT_MS": "100"})
+    def test_waiting_too_long_is_rejected(self) -> None:
+        holder = session_admission.admit("s1", "first")
+
+        late = session_admission.admit("s1", "second")
+
+        self.assertEqual((late["status"], late["reason"]), (session_admission.REJECTED, "timeout"))
+        self.assertEqual(blob.read_json("sessions/s1/admission.json")["waiting"], [])
+        session_admission.release(holder)
+
+    @mock.patch.dict(os.environ, {"AUDIO_ADMISSION_MODE": "reject"})
+    def test_reject_mode_fails_fast(self) -> None:
+        holder = session_admission.admit("s1", "first")
+
+        busy = session_admission.admit("s1", "second")
+
+        self.assertEqual((busy["status"], busy["reason"]), (session_admission.REJECTED, "busy"))
+        session_admission.release(holder)
+
+    @mock.patch.dict(os.environ, {"AUDIO_ADMISSION_MODE": "coalesce"})
+    def test_coalesce_answers_queued_transcripts_in_one_turn(self) -> None:
+        holder = session_admission.admit("s1", "I need a mattress.")
+        results: dict = {}
+        threads = [self.admit_in_thread("My back hurts.", results)]
+        self.wait_for_waiters(1)
+        threads.append(self.admit_in_thread("Something firm.", results))
+        self.wait_for_waiters(2)
+
+        session_admission.release(holder)
+        for thread in threads:
+            thread.join(2)
+
+        statuses = sorted(r["status"] for r in results.values())
+        self.assertEqual(statuses, [session_admission.ADMITTED, session_admission.COALESCED])
+        winner = next(r for r in results.values() if r["status"] == session_admission.ADMITTED)
+        self.assertEqual((winner["transcript"], winner["merged"]), ("My back hurts. Something firm.", 2))
+        session_admission.release(winner)
+
+    @mock.patch.dict(os.environ, {"AUDIO_ADMISSION_MODE": "reject"})
+    def test_lease_is_renewed_while_the_turn_runs(self) -> None:
+        with mock.patch.object(session_admission.BlobLeaseBackend, "_lease_seconds", return_value=0.15):
+            holder = session_admission.admit("s1", "slow turn")
+            time.sleep(0.5)  # several lease lengths
+
+            self.assertEqual(session_admission.admit("s1", "second")["reason"], "busy")
+            session_admission.release(holder)
+            third = session_admission.admit("s1", "third")
+
+        self.assertEqual(third["status"], session_admission.ADMITTED)
+        session_admission.release(third)
+
+    @mock.patch.dict(os.environ, {"AUDIO_ADMISSION_MODE": "reject", "AUDIO_ADMISSION_MAX_HOLD_SECONDS": "0"})
+    def test_hung_turn_stops_renewing_after_the_hold_cap(self) -> None:
+        with mock.patch.object(session_admission.BlobLeaseBackend, "_lease_seconds", return_value=0.15):
+            holder = session_admission.admit("s1", "hung turn")
+            time.sleep(0.3)
+            after_cap = session_admission.admit("s1", "next")
+
+        self.assertEqual(after_cap["status"], session_admission.ADMITTED)
+        session_admission.release(after_cap)
+        session_admission.release(holder)
+
+    @mock.patch.dict(os.environ, {"AUDIO_ADMISSION_MODE": "off"})
+    def test_off_never_waits(self) -> None:
+        session_admission.admit("s1", "first")
+        self.assertEqual(session_admission.admit("s1", "second")["status"], session_admission.ADMITTED)
+
+
+class MemoryLeaseTests(unittest.TestCase):
+    def test_lease_excludes_until_released_or_expired(self) -> None:
+        container = MemoryContainerClient()
+        bc = container.get_blob_client("lock")
+        bc.upload_blob(b"")
+
+        lease = bc.acquire_lease(lease_duration=15)
+        with self.assertRaises(ResourceExistsError):
+            bc.acquire_lease(lease_duration=15)
+        lease.release()
+        short = bc.acquire_lease(lease_duration=0)
+
+        self.assertNotEqual(bc.acquire_lease(lease_duration=15).id, short.id)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -53,6 +53,17 @@ class SessionStartTests(unittest.TestCase):
         assert isinstance(doc, dict)
         self.assertEqual(doc.get("user_id"), "11111111-1111-1111-1111-111111111111")
 
+    @mock.patch.dict(
+        os.environ, {"TRAINING_ORCHESTRATOR_ENABLED": "true", "SESSION_TOKEN_SECRET": "s3cret"}, clear=False
+    )
+    @mock.patch.object(session_start, "write_json")
+    def test_session_start_issues_a_token_carrying_the_persona(self, _write_mock: mock.Mock) -> None:
+        from shared_code import session_meta
+
+        data = json.loads(session_start.main(make_json_request("/session/start", {"persona": "Director"})).get_body())
+
+        self.assertEqual(session_meta.verify_token(data["sessionToken"], data["sessionId"]), {"persona": "Director"})
+
     @mock.patch.dict(os.environ, {"TRAINING_ORCHESTRATOR_ENABLED": "false"}, clear=False)
     def test_session_start_disabled_returns_503(self) -> None:
         body = {"persona": "Thinker"}
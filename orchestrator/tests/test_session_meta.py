@@ -0,0 +1,86 @@
+import hashlib
+import hmac
+import os
+import unittest
+from unittest import mock
+
+from shared_code import session_meta
+
+
+@mock.patch.dict(os.environ, {"SESSION_TOKEN_SECRET": "s3cret"})
+class SessionTokenTests(unittest.TestCase):
+    def test_token_round_trips_for_its_session_only(self) -> None:
+        token = session_meta.issue_token("s1", {"persona": "Thinker"})
+
+        self.assertEqual(session_meta.verify_token(token, "s1"), {"persona": "Thinker"})
+        self.assertIsNone(session_meta.verify_token(token, "s2"))
+
+    def test_tampered_or_expired_tokens_are_ignored(self) -> None:
+        token = session_meta.issue_token("s1", {"persona": "Thinker"})
+        forged = session_meta.issue_token("s1", {"persona": "Director"}).split(".")[0] + "." + token.split(".")[1]
+        with mock.patch.dict(os.environ, {"SESSION_TOKEN_TTL_SECONDS": "-1"}):
+            expired = session_meta.issue_token("s1", {"persona": "Thinker"})
+
+        self.assertIsNone(session_meta.verify_token(forged, "s1"))
+        self.assertIsNone(session_meta.verify_token(expired, "s1"))
+        self.assertIsNone(session_meta.verify_token("garbage", "s1"))
+        with mock.patch.dict(os.environ, {"SESSION_TOKEN_SECRET": "rotated"}):
+            self.assertIsNone(session_meta.verify_token(token, "s1"))
+
+    def test_malformed_tokens_are_invalid_not_errors(self) -> None:
+        token = session_meta.issue_token("s1", {"persona": "Thinker"})
+        body, signature = token.split(".")
+
+        def signed(payload: bytes) -> str:
+            raw = session_meta._b64(payload)
+            digest = hmac.new(b"s3cret", raw.encode("ascii"), hashlib.sha256).digest()
+            return f"{raw}.{session_meta._b64(digest)}"
+
+        for bad in (f"bödy.{signature}", f"{body}.sïg", signed(b"[1, 2]"), signed(b"\xff\xfe"), signed(b'{"sid": "s1", "exp": "x"}')):
+            with self.subTest(token=bad):
+                self.assertIsNone(session_meta.verify_token(bad, "s1"))
+
+    @mock.patch.dict(os.environ, {"SESSION_TOKEN_SECRET": ""})
+    def test_no_secret_means_no_tokens(self) -> None:
+        self.assertIsNone(session_meta.issue_token("s1", {"persona": "Thinker"}))
+
+
+class SessionMetaLookupTests(unittest.TestCase):
+    def setUp(self) -> None:
+        session_meta._cache.clear()
+        patcher = mock.patch("shared_code.blob.read_json", return_value={"persona": "Relater", "status": "active"})
+        self.read_json = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_storage_is_read_once_per_session(self) -> None:
+        first = session_meta.get_session_meta("s1")
+        second = session_meta.get_session_meta("s1")
+
+        self.assertEqual(first, second)
+        self.assertEqual(first["persona"], "Relater")
+        self.read_json.assert_called_once_with("sessions/s1/session.json")
+
+    def test_remembered_sessions_skip_storage(self) -> None:
+        session_meta.remember("s2", {"session_id": "s2", "persona": "Socializer", "request": {"big": "body"}})
+
+        self.assertEqual(session_meta.get_session_meta("s2"), {"persona": "Socializer"})
+        self.read_json.assert_not_called()
+
+    @mock.patch.dict(os.environ, {"SESSION_TOKEN_SECRET": "s3cret"})
+    def test_valid_token_skips_cache_and_storage(self) -> None:
+        token = session_meta.issue_token("s3", {"persona": "Director"})
+
+        self.assertEqual(session_meta.get_session_meta("s3", token), {"persona": "Director"})
+        self.assertNotIn("s3", session_meta._cache)
+        self.read_json.assert_not_called()
+
+    def test_missing_session_is_not_cached(self) -> None:
+        self.read_json.return_value = None
+
+        self.assertIsNone(session_meta.get_session_meta("nope"))
+        self.assertIsNone(session_meta.get_session_meta("nope"))
+        self.assertEqual(self.read_json.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
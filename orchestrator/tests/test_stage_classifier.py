@@ -0,0 +1,113 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import chat
+from shared_code import stage_classifier as sc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+import train_stage_classifier  # noqa: E402
+
+
+class FeaturizeTests(unittest.TestCase):
+    def test_buckets_are_stable_and_include_bias(self) -> None:
+        first = sc.featurize("So it sounds like your back hurts?")
+
+        self.assertEqual(first, sc.featurize("so IT sounds like your back hurts ?"))
+        self.assertEqual(first[0], 0)
+        self.assertTrue(all(0 < b < sc.N_FEATURES for b in first[1:]))
+        self.assertEqual(sc.featurize(""), [0])
+
+
+@unittest.skipUnless(sc.available(), "numpy not installed")
+class StageClassifierTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        corpus = train_stage_classifier.seed_corpus(per_template=3)
+        cls.model = sc.StageClassifier.fit([t for t, _ in corpus], [s for _, s in corpus], epochs=150)
+
+    def test_batch_scores_match_single_scores(self) -> None:
+        texts = ["What brings you in today?", "", "I'd recommend the split king. Would you like to try it?"]
+
+        batch = self.model.scores_batch(texts)
+
+        self.assertEqual(batch.shape, (3, 5))
+        for row, text in zip(batch, texts):
+            self.assertTrue(sc.np.allclose(row, self.model.scores(text), atol=1e-5))
+
+    def test_predicts_template_stages(self) -> None:
+        self.assertEqual(self.model.predict("How long have you had your bed?"), [1])
+        self.assertEqual(self.model.predict("I'd recommend the queen set."), [4])
+        self.assertEqual(self.model.predict("Thanks for coming by."), [])
+
+    def test_score_transcript_covers_user_messages_only(self) -> None:
+        messages = [
+            {"role": "user", "content": "What brings you in today?"},
+            {"role": "assistant", "content": "My back hurts."},
+            {"role": "user", "content": "It sounds like your back is the issue."},
+        ]
+
+        scored = self.model.score_transcript(messages)
+
+        self.assertEqual([s["index"] for s in scored], [0, 2])
+        self.assertEqual(set(scored[0]["scores"]), set(sc.STAGES))
+
+    def test_save_and_load_round_trip(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "model.npz")
+            self.model.save(path)
+            loaded = sc.StageClassifier.load(path)
+
+        text = "Since you mentioned your shoulder, this pillow supports your lower back."
+        self.assertTrue(sc.np.allclose(loaded.scores(text), self.model.scores(text), atol=1e-2))
+        self.assertEqual(loaded.meta["examples"], self.model.meta["examples"])
+
+    def test_shipped_model_loads(self) -> None:
+        model = sc.StageClassifier.load(sc.DEFAULT_MODEL_PATH)
+
+        self.assertEqual(model.predict("Are you ready to set up delivery?"), [5])
+
+
+class GetClassifierTests(unittest.TestCase):
+    def setUp(self) -> None:
+        patcher = mock.patch.multiple(sc, _classifier=None, _classifier_loaded=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_missing_artifact_falls_back_to_none(self) -> None:
+        with mock.patch.dict(os.environ, {"STAGE_CLASSIFIER_MODEL": "/nonexistent/model.npz"}):
+            self.assertIsNone(sc.get_classifier())
+
+    def test_without_numpy_returns_none(self) -> None:
+        with mock.patch.object(sc, "np", None):
+            self.assertIsNone(sc.get_classifier())
+
+
+class HybridDetectorTests(unittest.TestCase):
+    def test_classifier_advances_when_regex_does_not(self) -> None:
+        classifier = mock.Mock()
+        classifier.predict.return_value = [2]
+        message = "So basically the old bed just isn't supporting your hips anymore."
+
+        self.assertEqual(chat._analyze_pulse_stage_quick([message], 1), (1, []))
+        with mock.patch.object(chat, "STAGE_DETECTOR", "hybrid"), \
+                mock.patch("shared_code.stage_classifier.get_classifier", return_value=classifier):
+            stage, behaviors = chat._analyze_pulse_stage_quick([message], 1)
+
+        self.assertEqual(stage, 2)
+        self.assertEqual(behaviors, ["demonstrates active listening"])
+
+    def test_classifier_is_not_consulted_for_other_stages(self) -> None:
+        classifier = mock.Mock()
+        classifier.predict.return_value = [4]
+
+        with mock.patch.object(chat, "STAGE_DETECTOR", "hybrid"), \
+                mock.patch("shared_code.stage_classifier.get_classifier", return_value=classifier):
+            self.assertEqual(chat._analyze_pulse_stage_quick(["The price is the price."], 1), (1, []))
+
+
+if __name__ == "__main__":
+    unittest.main()
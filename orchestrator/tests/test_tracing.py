@@ -0,0 +1,125 @@
+import contextvars
+import inspect
+import json
+import threading
+import unittest
+
+import azure.functions as func
+
+import session_start
+from shared_code import tracing
+from shared_code.tracing import span, traced
+
+
+def _request(headers=None) -> func.HttpRequest:
+    return func.HttpRequest(method="POST", url="/x", headers=headers or {}, params={}, route_params={}, body=b"")
+
+
+class TracingTests(unittest.TestCase):
+    def test_nested_spans_record_parents_and_server_timing(self) -> None:
+        @traced("test/route")
+        def main(req: func.HttpRequest) -> func.HttpResponse:
+            with span("blob_read", path="a.json"):
+                with span("decode"):
+                    pass
+            with span("blob_read", path="b.json"):
+                pass
+            with span("openai_chat") as sp:
+                sp.set(completion_tokens=12)
+            return func.HttpResponse("ok", status_code=200)
+
+        with self.assertLogs(tracing._logger, level="INFO") as logs:
+            resp = main(_request({"X-Correlation-Id": "abc-123"}))
+
+        timing = resp.headers["Server-Timing"]
+        self.assertIn("blob_read;dur=", timing)
+        self.assertIn("openai_chat;dur=", timing)
+        self.assertRegex(timing, r"total;dur=\d+\.\d$")
+        self.assertEqual(timing.count("blob_read"), 1)  # aggregated per name
+        self.assertEqual(resp.headers["X-Correlation-Id"], "abc-123")
+
+        self.assertEqual(len(logs.records), 1)
+        record = json.loads(logs.records[0].getMessage().split(" ", 1)[1])
+        self.assertEqual(record["route"], "test/route")
+        self.assertEqual(record["status"], 200)
+        spans = {(s["name"], s.get("path")): s for s in record["spans"]}
+        decode = spans[("decode", None)]
+        self.assertEqual(decode["parent"], spans[("blob_read", "a.json")]["id"])
+        self.assertIsNone(spans[("blob_read", "b.json")]["parent"])
+        self.assertEqual(spans[("openai_chat", None)]["completion_tokens"], 12)
+
+    def test_invalid_correlation_header_is_replaced(self) -> None:
+        @traced("r")
+        def main(req: func.HttpRequest) -> func.HttpResponse:
+            return func.HttpResponse("ok")
+
+        resp = main(_request({"X-Request-Id": "bad id\nwith newline"}))
+        self.assertRegex(resp.headers["X-Correlation-Id"], r"^[0-9a-f]{32}$")
+
+    def test_span_outside_trace_is_noop_and_errors_propagate(self) -> None:
+        with span("anything") as sp:
+            sp.set(x=1)
+        self.assertIsNone(tracing.current_correlation_id())
+
+        @traced("r")
+        def main(req: func.HttpRequest) -> func.HttpResponse:
+            with span("boom"):
+                raise ValueError("bad")
+
+        with self.assertLogs(tracing._logger, level="INFO") as logs, self.assertRaises(ValueError):
+            main(_request())
+        self.assertIn('"error":"ValueError"', logs.records[0].getMessage())
+
+    def _record(self, main) -> dict:
+        with self.assertLogs(tracing._logger, level="INFO") as logs:
+            main(_request())
+        return json.loads(logs.records[0].getMessage().split(" ", 1)[1])
+
+    def test_span_held_open_by_a_suspended_generator_is_not_the_parent(self) -> None:
+        def stream():
+            with span("openai_chat_stream", current=False):
+                yield "a"
+                yield "b"
+
+        def tts() -> None:
+            with span("tts"):
+                pass
+
+        @traced("r")
+        def main(req: func.HttpRequest) -> func.HttpResponse:
+            with span("voice_turn"):
+                for _ in stream():
+                    # What voice_pipeline does when it submits a sentence to the TTS pool.
+                    contextvars.copy_context().run(tts)
+            return func.HttpResponse("ok")
+
+        spans = self._record(main)["spans"]
+        ids = {s["name"]: s["id"] for s in spans}
+        self.assertEqual({s["parent"] for s in spans if s["name"] != "voice_turn"}, {ids["voice_turn"]})
+
+    def test_spans_opened_from_worker_threads_get_distinct_ids(self) -> None:
+        @traced("r")
+        def main(req: func.HttpRequest) -> func.HttpResponse:
+            def work() -> None:
+                for _ in range(200):
+                    with span("tts"):
+                        pass
+
+            threads = [threading.Thread(target=contextvars.copy_context().run, args=(work,)) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            return func.HttpResponse("ok")
+
+        ids = [s["id"] for s in self._record(main)["spans"]]
+        self.assertEqual(len(ids), 1600)
+        self.assertEqual(len(set(ids)), 1600)
+
+    def test_endpoint_signature_is_preserved_for_the_functions_worker(self) -> None:
+        self.assertEqual(list(inspect.signature(session_start.main).parameters), ["req"])
+        self.assertIs(inspect.signature(session_start.main).return_annotation, func.HttpResponse)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+import io
+import math
+import os
+import unittest
+import wave
+from unittest import mock
+
+from shared_code import blob, utterance
+from shared_code.memory_blob import memory_container
+
+RATE = 16000
+CLUSTER = b"\x1f\x43\xb6\x75"
+WEBM_HEADER = b"\x1a\x45\xdf\xa3" + b"\x01" * 200
+
+
+def _wav(seconds: float, tone: bool) -> bytes:
+    samples = [int(6000 * math.sin(2 * math.pi * 220 * i / RATE)) if tone else 0 for i in range(int(seconds * RATE))]
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(RATE)
+        out.writeframes(b"".join(s.to_bytes(2, "little", signed=True) for s in samples))
+    return buf.getvalue()
+
+
+def _seconds(data: bytes) -> float:
+    with wave.open(io.BytesIO(data), "rb") as wav:
+        return wav.getnframes() / wav.getframerate()
+
+
+class UtteranceAssemblyTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.store = utterance.MemoryUtteranceStore()
+
+    def submit(self, data: bytes, **kwargs) -> dict:
+        return utterance.submit("s1", data, store=self.store, **kwargs)
+
+    def test_wav_chunks_are_joined_when_trailing_silence_ends_the_utterance(self) -> None:
+        results = [self.submit(_wav(0.5, tone=True)), self.submit(_wav(0.5, tone=True)), self.submit(_wav(0.5, tone=False))]
+        self.assertEqual([r["ready"] for r in results], [False, False, False])
+        self.assertEqual(results[-1]["state"]["trailingSilenceMs"], 500)
+
+        done = self.submit(_wav(0.4, tone=False))
+
+        self.assertTrue(done["ready"])
+        self.assertEqual((done["reason"], done["format"]), ("silence", "wav"))
+        self.assertAlmostEqual(_seconds(done["audio"]), 1.9, places=2)
+        self.assertIsNone(self.store.peek("s1"))
+
+    def test_final_flag_releases_with_an_empty_chunk(self) -> None:
+        self.submit(_wav(0.5, tone=True))
+
+        done = self.submit(b"", final=True)
+
+        self.assertEqual((done["ready"], done["reason"]), (True, "final"))
+        self.assertEqual(done["state"]["chunks"], 1)
+
+    def test_silence_only_buffer_is_never_released(self) -> None:
+        self.assertEqual(self.submit(_wav(0.5, tone=False))["reason"], "buffered")
+        self.assertEqual(self.submit(_wav(0.5, tone=False))["reason"], "buffered")
+        self.assertIsNone(self.store.peek("s1"))
+
+        self.submit(_wav(0.5, tone=False))
+        done = self.submit(b"", final=True)
+
+        self.assertEqual((done["ready"], done["reason"]), (False, "no_speech"))
+
+    def test_webm_header_is_prepended_to_later_utterances(self) -> None:
+        first = WEBM_HEADER + CLUSTER + b"\x02" * 3000
+        self.submit(first, declared_format="webm")
+        self.assertEqual(self.submit(b"", final=True)["audio"], first)
+
+        fragment = CLUSTER + b"\x03" * 3000
+        self.submit(fragment, declared_format="webm")
+        done = self.submit(b"", final=True)
+
+        self.assertEqual(done["format"], "webm")
+        self.assertEqual(done["audio"], WEBM_HEADER + fragment)
+
+    def test_small_webm_timeslices_are_kept_until_final(self) -> None:
+        fragments = [WEBM_HEADER + CLUSTER + b"\x02" * 500] + [CLUSTER + b"\x03" * 550 for _ in range(7)]
+        results = [self.submit(f, declared_format="webm", duration_ms=250) for f in fragments]
+        self.assertEqual({r["reason"] for r in results}, {"buffered"})
+
+        done = self.submit(b"", final=True)
+
+        self.assertEqual((done["ready"], done["reason"], done["state"]["chunks"]), (True, "final", 8))
+        self.assertEqual(done["audio"], b"".join(fragments))
+
+    def test_small_webm_timeslices_without_duration_are_not_dropped(self) -> None:
+        self.submit(WEBM_HEADER + CLUSTER + b"\x02" * 500, declared_format="webm")
+        self.submit(CLUSTER + b"\x03" * 550, declared_format="webm")
+
+        done = self.submit(b"", final=True)
+
+        self.assertEqual((done["ready"], done["reason"]), (True, "final"))
+
+    @mock.patch.dict(os.environ, {"AUDIO_UTTERANCE_HEADER_CACHE_SIZE": "2"})
+    def test_memory_store_keeps_headers_for_recent_sessions_only(self) -> None:
+        store = utterance.MemoryUtteranceStore()
+        for session_id in ("a", "b", "c"):
+            store.set_header(session_id, WEBM_HEADER)
+
+        self.assertIsNone(store.get_header("a"))
+        self.assertEqual(store.get_header("c"), WEBM_HEADER)
+
+    def test_stale_buffer_is_released_and_the_new_chunk_starts_over(self) -> None:
+        with mock.patch("shared_code.utterance.time.time", return_value=1000.0):
+            self.submit(_wav(0.5, tone=True))
+        with mock.patch("shared_code.utterance.time.time", return_value=1020.0):
+            stale = self.submit(_wav(0.3, tone=True))
+
+        self.assertEqual((stale["ready"], stale["reason"]), (True, "stale"))
+        self.assertAlmostEqual(_seconds(stale["audio"]), 0.5, places=2)
+        self.assertEqual(len(self.store.peek("s1")["chunks"]), 1)
+
+    @mock.patch.dict(os.environ, {"AUDIO_UTTERANCE_MAX_MS": "1000"})
+    def test_long_utterance_is_cut_at_the_cap(self) -> None:
+        self.assertFalse(self.submit(_wav(0.6, tone=True))["ready"])
+        self.assertEqual(self.submit(_wav(0.6, tone=True))["reason"], "max_length")
+
+    def test_mismatched_wav_chunk_is_dropped(self) -> None:
+        other = io.BytesIO()
+        with wave.open(other, "wb") as out:
+            out.setnchannels(1)
+            out.setsampwidth(2)
+            out.setframerate(8000)
+            out.writeframes(b"\x00\x10" * 8000)
+        audio, audio_format = utterance.assemble(
+            [_wav(0.5, tone=True), other.getvalue()], [{"format": "wav"}, {"format": "wav"}]
+        )
+
+        self.assertEqual(audio_format, "wav")
+        self.assertAlmostEqual(_seconds(audio), 0.5, places=2)
+
+
+class BlobUtteranceStoreTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.container = self.enterContext(memory_container())
+
+    def test_chunks_round_trip_and_are_cleaned_up(self) -> None:
+        store = utterance.BlobUtteranceStore()
+        utterance.submit("s1", _wav(0.5, tone=True), store=store)
+        utterance.submit("s1", _wav(0.5, tone=True), store=store)
+        self.assertEqual(len(blob.list_blob_names("sessions/s1/utterance/")), 2)
+
+        done = utterance.submit("s1", b"", final=True, store=store)
+
+        self.assertTrue(done["ready"])
+        self.assertAlmostEqual(_seconds(done["audio"]), 1.0, places=2)
+        self.assertEqual(blob.list_blob_names("sessions/s1/utterance/"), [])
+        self.assertIsNone(store.peek("s1"))
+
+    def test_second_take_gets_nothing(self) -> None:
+        store = utterance.BlobUtteranceStore()
+        utterance.submit("s1", _wav(0.5, tone=True), store=store)
+
+        state, chunks = store.take("s1")
+        again, none = store.take("s1")
+
+        self.assertEqual((len(state["chunks"]), len(chunks)), (1, 1))
+        self.assertEqual((again, none), (None, []))
+
+
+if __name__ == "__main__":
+    unittest.main()
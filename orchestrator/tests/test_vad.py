@@ -0,0 +1,97 @@
+import io
+import math
+import os
+import random
+import unittest
+import wave
+from unittest import mock
+
+from shared_code import vad
+
+RATE = 16000
+
+
+def _pcm(*pieces: tuple) -> bytes:
+    """pieces: (seconds, kind) with kind "silence", "hiss" or a tone frequency in Hz."""
+    rng = random.Random(3)
+    samples = []
+    for seconds, kind in pieces:
+        for i in range(int(seconds * RATE)):
+            if kind == "silence":
+                samples.append(rng.randint(-20, 20))
+            elif kind == "hiss":
+                samples.append(rng.randint(-250, 250))
+            else:
+                samples.append(int(6000 * math.sin(2 * math.pi * kind * i / RATE)) + rng.randint(-20, 20))
+    return b"".join(s.to_bytes(2, "little", signed=True) for s in samples)
+
+
+def _wav(pcm: bytes) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(RATE)
+        out.writeframes(pcm)
+    return buf.getvalue()
+
+
+class PcmVadTests(unittest.TestCase):
+    def test_speech_is_kept_and_silence_trimmed(self) -> None:
+        data = _wav(_pcm((0.8, "silence"), (0.6, 220), (0.8, "silence")))
+
+        result = vad.gate(data)
+
+        self.assertTrue(result["speech"])
+        self.assertEqual((result["reason"], result["format"]), ("wav_vad", "wav"))
+        with wave.open(io.BytesIO(result["audio"]), "rb") as out:
+            seconds = out.getnframes() / out.getframerate()
+        # 0.6 s of tone plus 200 ms of padding each side
+        self.assertAlmostEqual(seconds, 1.0, delta=0.05)
+        self.assertAlmostEqual(result["trimmed_ms"], 1200, delta=50)
+
+    def test_silence_and_hiss_are_skipped(self) -> None:
+        for kind in ("silence", "hiss"):
+            with self.subTest(kind=kind):
+                result = vad.gate(_wav(_pcm((1.5, kind))))
+                self.assertFalse(result["speech"])
+                self.assertEqual(result["reason"], "silence")
+
+    def test_click_shorter_than_min_speech_is_skipped(self) -> None:
+        self.assertFalse(vad.gate(_wav(_pcm((0.5, "silence"), (0.06, 440), (0.5, "silence"))))["speech"])
+
+    def test_chunk_cut_from_continuous_speech_is_speech(self) -> None:
+        self.assertTrue(vad.gate(_wav(_pcm((0.4, 220))))["speech"])
+
+    def test_raw_pcm_is_wrapped_as_wav(self) -> None:
+        result = vad.gate(_pcm((0.3, "silence"), (0.5, 300)), declared_format="pcm")
+
+        self.assertTrue(result["speech"])
+        self.assertEqual(result["audio"][:4], b"RIFF")
+
+
+class ContainerHeuristicTests(unittest.TestCase):
+    webm = b"\x1a\x45\xdf\xa3"
+
+    def test_size_and_duration_heuristics(self) -> None:
+        cases = [
+            (self.webm + b"\x00" * 500, None, False, "too_small"),
+            (self.webm + b"\x00" * 3000, 200, False, "too_short"),
+            (self.webm + b"\x00" * 3000, 5000, False, "low_bitrate"),
+            (self.webm + b"\x00" * 3000, 1000, True, "size_ok"),
+            (self.webm + b"\x00" * 3000, None, True, "size_ok"),
+        ]
+        for data, duration_ms, speech, reason in cases:
+            with self.subTest(reason=reason, duration_ms=duration_ms):
+                result = vad.gate(data, duration_ms=duration_ms)
+                self.assertEqual((result["speech"], result["reason"]), (speech, reason))
+
+    def test_disabled_gate_passes_everything(self) -> None:
+        with mock.patch.dict(os.environ, {"AUDIO_VAD_ENABLED": "false"}):
+            result = vad.gate(self.webm)
+
+        self.assertEqual((result["speech"], result["audio"]), (True, self.webm))
+
+
+if __name__ == "__main__":
+    unittest.main()
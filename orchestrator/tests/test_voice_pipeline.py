@@ -0,0 +1,330 @@
+import email.parser
+import json
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+
+import azure.functions as func
+
+import audio_chunk
+import audio_segments
+from shared_code import audio_delivery, blob
+from shared_code.http import multipart_mixed
+from shared_code.memory_blob import memory_container
+from shared_code.voice_pipeline import SentenceSplitter, run_voice_turn
+
+
+def _stream(text: str, size: int = 3):
+    for i in range(0, len(text), size):
+        yield text[i:i + size]
+
+
+class SentenceSplitterTests(unittest.TestCase):
+    def _split(self, text: str, size: int = 3) -> list:
+        splitter = SentenceSplitter()
+        out = []
+        for delta in _stream(text, size):
+            out += splitter.feed(delta)
+        return out + splitter.flush()
+
+    def test_splits_streamed_text_on_sentence_boundaries(self) -> None:
+        text = "Hmm. I'm not sure about that. Dr. Smith said 3.5 inches is fine! Would it help my back?"
+
+        self.assertEqual(
+            self._split(text),
+            ["Hmm. I'm not sure about that.", "Dr. Smith said 3.5 inches is fine!", "Would it help my back?"],
+        )
+
+    def test_sentence_is_emitted_once_the_next_one_starts(self) -> None:
+        splitter = SentenceSplitter()
+
+        self.assertEqual(splitter.feed("That sounds really good."), [])
+        self.assertEqual(splitter.feed(" What"), ["That sounds really good."])
+
+    def test_long_run_on_text_is_cut_at_a_pause(self) -> None:
+        text = "well, " * 50
+
+        pieces = self._split(text, size=10)
+
+        self.assertGreater(len(pieces), 1)
+        self.assertTrue(all(len(p) <= 220 for p in pieces))
+        self.assertEqual(" ".join(pieces), text.strip())
+
+
+class RunVoiceTurnTests(unittest.TestCase):
+    def test_segments_are_published_in_order_while_synthesis_overlaps(self) -> None:
+        published = []
+        active, peak = [0], [0]
+        lock = threading.Lock()
+
+        def synthesize(text: str) -> bytes:
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            # Earlier sentences take longer, so they finish out of order.
+            time.sleep(0.05 if text.startswith("First") else 0.01)
+            with lock:
+                active[0] -= 1
+            return text.encode("utf-8")
+
+        turn = run_voice_turn(
+            _stream("First one is slow. Second is quick. Third is quick too."),
+            synthesize,
+            on_segment=lambda seg: published.append(seg["seq"]),
+        )
+
+        self.assertEqual(published, [0, 1, 2])
+        self.assertGreater(peak[0], 1)
+        self.assertEqual(turn["text"], "First one is slow. Second is quick. Third is quick too.")
+        self.assertIsNotNone(turn["first_audio_at"])
+
+    def test_failed_sentence_and_broken_stream_do_not_lose_the_rest(self) -> None:
+        def deltas():
+            yield "This part arrives fine. "
+            yield "And this part too. Then"
+            raise ConnectionError("stream reset")
+
+        def synthesize(text: str) -> bytes:
+            if text.startswith("And"):
+                raise RuntimeError("tts down")
+            return b"mp3"
+
+        turn = run_voice_turn(deltas(), synthesize)
+
+        self.assertIn("ConnectionError", turn["error"])
+        self.assertEqual([s["text"] for s in turn["segments"]], ["This part arrives fine.", "And this part too.", "Then"])
+        self.assertEqual([s["audio"] for s in turn["segments"]], [b"mp3", None, b"mp3"])
+
+
+# EBML magic plus enough bytes to pass the VAD size heuristic.
+WEBM_CHUNK = b"\x1a\x45\xdf\xa3" + b"\x00" * 4096
+
+
+def _chunk_request(turn_id: str = "", audio: bytes = WEBM_CHUNK, **extra: str) -> func.HttpRequest:
+    boundary = "b0undary"
+    fields = [("sessionId", "s1")] + ([("turnId", turn_id)] if turn_id else []) + list(extra.items())
+    body = b"".join(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{k}"\r\n\r\n{v}\r\n'.encode() for k, v in fields
+    )
+    body += (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="chunk"; filename="a.webm"\r\n'
+        "Content-Type: audio/webm\r\n\r\n"
+    ).encode() + audio + b"\r\n" + f"--{boundary}--\r\n".encode()
+    return func.HttpRequest(
+        method="POST",
+        url="/api/audio/chunk",
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+        params={},
+        route_params={},
+        body=body,
+    )
+
+
+@mock.patch.dict(os.environ, {"TRAINING_ORCHESTRATOR_ENABLED": "true", "AUDIO_STREAMING_ENABLED": "true"})
+class AudioChunkPipelineTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.container = self.enterContext(memory_container())
+        for patcher in (
+            mock.patch("shared_code.openai_client.transcribe_audio", return_value="What brings you in today?"),
+            mock.patch(
+                "shared_code.openai_client.stream_conversation_response",
+                side_effect=lambda **_: _stream("My back has been sore. I want something firmer."),
+            ),
+            mock.patch("shared_code.openai_client.generate_speech", side_effect=lambda text, voice: text.encode()),
+            mock.patch("shared_code.avatar_service.is_avatar_service_available", return_value=False),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        blob.write_json("sessions/s1/session.json", {"persona": "Relater"})
+
+    def test_reply_is_synthesized_per_sentence(self) -> None:
+        resp = audio_chunk.main(_chunk_request())
+
+        data = json.loads(resp.get_body())
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(data["aiResponse"], "My back has been sore. I want something firmer.")
+        self.assertEqual([s["text"] for s in data["audioSegments"]], ["My back has been sore.", "I want something firmer."])
+        self.assertEqual(data["avatarState"], "speaking")
+        self.assertFalse(data["interrupted"])
+        messages = blob.read_json("sessions/s1/conversation.json")["messages"]
+        self.assertEqual([m["role"] for m in messages], ["user", "assistant"])
+
+    def test_reply_stream_failing_midway_is_stored_as_interrupted(self) -> None:
+        def broken_stream(**_):
+            yield from _stream("My back has been sore. I want")
+            raise ConnectionError("stream reset")
+
+        with mock.patch("shared_code.openai_client.stream_conversation_response", side_effect=broken_stream):
+            resp = audio_chunk.main(_chunk_request(turn_id="t1"))
+
+        data = json.loads(resp.get_body())
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual((data["aiResponse"], data["interrupted"]), ("My back has been sore. I want", True))
+        manifest = blob.read_json("sessions/s1/turns/t1/manifest.json")
+        self.assertEqual((manifest["done"], manifest["interrupted"]), (True, True))
+        assistant = blob.read_json("sessions/s1/conversation.json")["messages"][-1]
+        self.assertEqual((assistant["content"], assistant["interrupted"]), ("My back has been sore. I want", True))
+
+    def test_silent_chunk_skips_transcription(self) -> None:
+        import shared_code.openai_client as openai_client
+
+        resp = audio_chunk.main(_chunk_request(audio=WEBM_CHUNK[:600]))
+
+        data = json.loads(resp.get_body())
+        self.assertEqual((data["partialTranscript"], data["vad"]), (None, "too_small"))
+        openai_client.transcribe_audio.assert_not_called()
+
+    def test_streamed_chunks_are_transcribed_once_as_an_utterance(self) -> None:
+        import shared_code.openai_client as openai_client
+
+        first = json.loads(audio_chunk.main(_chunk_request(final="false")).get_body())
+        second = json.loads(audio_chunk.main(_chunk_request(audio=b"\x00" * 3000, final="false")).get_body())
+        done = json.loads(audio_chunk.main(_chunk_request(audio=b"", final="true")).get_body())
+
+        self.assertEqual((first["buffered"], second["utterance"]["chunks"]), (True, 2))
+        self.assertEqual(done["partialTranscript"], "What brings you in today?")
+        openai_client.transcribe_audio.assert_called_once()
+        self.assertEqual(openai_client.transcribe_audio.call_args.args[0], WEBM_CHUNK + b"\x00" * 3000)
+
+    @mock.patch.dict(os.environ, {"AUDIO_ADMISSION_MODE": "reject"})
+    def test_overlapping_chunk_is_refused_while_a_turn_runs(self) -> None:
+        import shared_code.openai_client as openai_client
+        from shared_code import session_admission
+
+        holder = session_admission.admit("s1", "first")
+        resp = audio_chunk.main(_chunk_request())
+        session_admission.release(holder)
+
+        self.assertEqual((resp.status_code, resp.headers["Retry-After"]), (429, "1"))
+        openai_client.stream_conversation_response.assert_not_called()
+        self.assertEqual(audio_chunk.main(_chunk_request()).status_code, 200)
+
+    def test_turn_segments_are_served_by_audio_segments(self) -> None:
+        audio_chunk.main(_chunk_request("turn-1"))
+
+        req = func.HttpRequest(
+            method="GET",
+            url="/api/audio/segments/s1/turn-1",
+            headers={},
+            params={"after": "1"},
+            route_params={"sessionId": "s1", "turnId": "turn-1"},
+            body=b"",
+        )
+        data = json.loads(audio_segments.main(req).get_body())
+
+        self.assertTrue(data["done"])
+        self.assertEqual(data["next"], 2)
+        self.assertEqual([s["seq"] for s in data["segments"]], [1])
+        self.assertEqual(data["segments"][0]["text"], "I want something firmer.")
+
+    def _segments_request(self, session_id: str = "s1", **headers: str) -> func.HttpRequest:
+        return func.HttpRequest(
+            method="GET",
+            url=f"/api/audio/segments/{session_id}/turn-1",
+            headers=headers,
+            params={},
+            route_params={"sessionId": session_id, "turnId": "turn-1"},
+            body=b"",
+        )
+
+    def test_segments_require_the_session_token_when_tokens_are_issued(self) -> None:
+        audio_chunk.main(_chunk_request("turn-1"))
+        with mock.patch.dict(os.environ, {"SESSION_TOKEN_SECRET": "s3cret"}):
+            from shared_code import session_meta
+
+            token = session_meta.issue_token("s1", {"persona": "Relater"})
+            anonymous = audio_segments.main(self._segments_request())
+            forged = audio_segments.main(self._segments_request(**{"X-Session-Token": token + "x"}))
+            ok = audio_segments.main(self._segments_request(**{"X-Session-Token": token}))
+
+        self.assertEqual((anonymous.status_code, forged.status_code, ok.status_code), (401, 401, 200))
+        self.assertTrue(json.loads(ok.get_body())["done"])
+
+    def test_segments_of_an_unknown_session_are_not_found(self) -> None:
+        self.assertEqual(audio_segments.main(self._segments_request("ghost")).status_code, 404)
+
+    def test_unknown_turn_is_not_found_yet(self) -> None:
+        req = func.HttpRequest(
+            method="GET",
+            url="/api/audio/segments/s1/nope",
+            headers={},
+            params={},
+            route_params={"sessionId": "s1", "turnId": "nope"},
+            body=b"",
+        )
+        data = json.loads(audio_segments.main(req).get_body())
+
+        self.assertEqual((data["found"], data["segments"], data["next"]), (False, [], 0))
+
+
+
+def _parse_multipart(resp: func.HttpResponse) -> list:
+    head = f"Content-Type: {resp.headers['Content-Type']}\r\n\r\n".encode()
+    message = email.parser.BytesParser().parsebytes(head + resp.get_body())
+    return message.get_payload()
+
+
+class AudioDeliveryTests(AudioChunkPipelineTests.__base__):
+    def test_multipart_mixed_round_trips_binary_parts(self) -> None:
+        audio = bytes(range(256)) * 4
+
+        parts = _parse_multipart(multipart_mixed([({"Content-Type": "audio/mpeg"}, memoryview(audio))]))
+
+        self.assertEqual(parts[0].get_content_type(), "audio/mpeg")
+        self.assertEqual(parts[0].get_payload(decode=True), audio)
+
+    def test_signed_url_for_blob(self) -> None:
+        from azure.storage.blob import BlobServiceClient
+
+        service = BlobServiceClient.from_connection_string(
+            "DefaultEndpointsProtocol=https;AccountName=acct;AccountKey=a2V5a2V5a2V5;EndpointSuffix=core.windows.net"
+        )
+        entries = [{"seq": 0, "bytes": 10}, {"seq": 1, "bytes": 0}]
+        with mock.patch.object(blob, "_BACKEND", "azure"), \
+                mock.patch.object(blob, "_get_service", return_value=service), \
+                mock.patch.object(blob, "get_container_client", return_value=service.get_container_client("prompts")):
+            self.assertTrue(audio_delivery.attach_urls(entries, "sessions/s1/turns/t1"))
+
+        self.assertTrue(entries[0]["url"].startswith("https://acct.blob.core.windows.net/prompts/sessions/s1/turns/t1/0.mp3?"))
+        self.assertIn("sp=r", entries[0]["url"])
+        self.assertNotIn("url", entries[1])
+
+
+@mock.patch.dict(os.environ, {"TRAINING_ORCHESTRATOR_ENABLED": "true", "AUDIO_STREAMING_ENABLED": "true"})
+class AudioChunkDeliveryTests(AudioChunkPipelineTests):
+    def test_multipart_delivery_returns_raw_audio_parts(self) -> None:
+        resp = audio_chunk.main(_chunk_request(audioDelivery="multipart"))
+
+        parts = _parse_multipart(resp)
+        body = json.loads(parts[0].get_payload(decode=True))
+        self.assertEqual(body["audioDelivery"], "multipart")
+        self.assertIsNone(body["audioBase64"])
+        self.assertEqual([s["part"] for s in body["audioSegments"]], [1, 2])
+        self.assertEqual(parts[1].get_payload(decode=True), b"My back has been sore.")
+        self.assertEqual(parts[2]["X-Segment-Seq"], "1")
+
+    def test_url_delivery_falls_back_to_base64_without_signing_key(self) -> None:
+        with mock.patch.object(blob, "_BACKEND", "memory"):
+            data = json.loads(audio_chunk.main(_chunk_request(audioDelivery="url")).get_body())
+
+        self.assertEqual(data["audioDelivery"], "base64")
+        self.assertTrue(data["audioBase64"])
+        self.assertTrue(data["turnId"])
+        self.assertIsNotNone(blob.read_json(f"sessions/s1/turns/{data['turnId']}/manifest.json"))
+
+    def test_url_delivery_returns_segment_urls(self) -> None:
+        with mock.patch("shared_code.blob.get_read_url", side_effect=lambda path, ttl_seconds: f"https://x/{path}?sig"):
+            data = json.loads(audio_chunk.main(_chunk_request("turn-9", audioDelivery="url")).get_body())
+
+        self.assertEqual(data["audioDelivery"], "url")
+        self.assertIsNone(data["audioBase64"])
+        self.assertEqual(
+            [s["url"] for s in data["audioSegments"]],
+            ["https://x/sessions/s1/turns/turn-9/0.mp3?sig", "https://x/sessions/s1/turns/turn-9/1.mp3?sig"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
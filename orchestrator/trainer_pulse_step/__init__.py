@@ -4,10 +4,11 @@ import os
 from typing import Any, Dict
 
 import azure.functions as func
-import requests
-
 from shared_code.blob import write_json, now_iso
 from shared_code.http import json_ok, no_content, text_error
+from shared_code.openai_client import post_chat
+from shared_code.prompt_registry import get_registry
+from shared_code.tracing import traced
 
 CORS_HEADERS = {
     "Access-Control-Allow-Origin": "*",
@@ -87,6 +88,9 @@ Always return a single JSON object with this exact top-level shape (no extra key
 
 Respond with STRICT JSON only. Do not include Markdown, comments, or any text outside the JSON object."""
 
+TRAINER_PROMPT_ID = os.getenv("PULSE_TRAINER_PROMPT_ID", "pulse-trainer-coach")
+get_registry().register_default(TRAINER_PROMPT_ID, PULSE_TRAINER_SYSTEM_PROMPT)
+
 
 def _call_openai_trainer(config: Dict[str, Any], session: Dict[str, Any]) -> Dict[str, Any]:
     """Call Azure OpenAI chat completion for the PULSE Trainer.
@@ -113,7 +117,7 @@ def _call_openai_trainer(config: Dict[str, Any], session: Dict[str, Any]) -> Dic
     url = f"{endpoint}/openai/deployments/{deployment}/chat/completions?api-version={api_version}"
 
     messages = [
-        {"role": "system", "content": PULSE_TRAINER_SYSTEM_PROMPT},
+        {"role": "system", "content": get_registry().render(TRAINER_PROMPT_ID) or PULSE_TRAINER_SYSTEM_PROMPT},
         {
             "role": "user",
             "content": json.dumps({"CONFIG": config, "SESSION": session}, ensure_ascii=False),
@@ -131,10 +135,8 @@ def _call_openai_trainer(config: Dict[str, Any], session: Dict[str, Any]) -> Dic
         "api-key": api_key,
     }
 
-    resp = requests.post(url, headers=headers, json=payload, timeout=30)
-    resp.raise_for_status()
+    data = post_chat(url, headers, payload, deployment, timeout=30)
 
-    data = resp.json()
     choices = data.get("choices") or []
     if not choices:
         raise RuntimeError("No choices returned from Azure OpenAI")
@@ -185,6 +187,7 @@ def _maybe_log_trainer_change(config: Dict[str, Any], session: Dict[str, Any], o
         logging.exception("trainer_pulse_step logging failed: %s", log_exc)
 
 
+@traced("trainer/pulse/step")
 def main(req: func.HttpRequest) -> func.HttpResponse:
     logging.info("trainer_pulse_step request: %s", req.method)
 
@@ -0,0 +1,11 @@
+import logging
+
+import azure.functions as func
+
+from shared_code.warmup import prewarm
+
+
+def main(warmupContext: func.Context) -> None:
+    # Runs when the platform adds an instance (Premium/Dedicated plans), before it receives traffic.
+    logging.info("warmup: instance warming up")
+    prewarm()